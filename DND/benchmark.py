@@ -0,0 +1,210 @@
+"""Usage: python benchmark.py [--scales 1,10,100] [--repeat 5] [--output results.json]"""
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import compendium
+from compendium import (DATA_DIR, SPELL_FILE_SUFFIX, BESTIARY_SORT_KEYS, ITEM_SORT_KEYS, SpellCompendium,
+                        BrowseTable, IncrementalSearch, load_csv_rows, load_damage_table, clear_parse_caches)
+from damage import DamageTable, BESTIARY_DAMAGE_FIELDS, parse_damage
+from character_model import CharacterModel, STATS
+from character_store import CharacterStore
+
+COMPENDIUM_FILES = ["Bestiary.csv", "Items.csv"]
+SEARCHES = 50  # names typed one letter at a time per search case
+
+
+# --- generators ---------------------------------------------------------------
+
+def scale_csv(src, dest, scale):
+    """Writes src to dest with every row repeated `scale` times; copy n of a
+    row is renamed "<Name> #n" so names stay unique."""
+    with open(src, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        fieldnames = reader.fieldnames
+        rows = list(reader)
+    with open(dest, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames, quoting=csv.QUOTE_ALL)
+        writer.writeheader()
+        for copy_number in range(scale):
+            for row in rows:
+                if copy_number:
+                    row = dict(row, Name=f"{row['Name']} #{copy_number}")
+                writer.writerow(row)
+    return len(rows) * scale
+
+
+def generate_compendium(dest_dir, scale, src_dir=DATA_DIR):
+    """Scaled copies of Bestiary.csv, Items.csv and every *_Spells.csv; returns {file: rows}."""
+    names = COMPENDIUM_FILES + sorted(f for f in os.listdir(src_dir) if f.endswith(SPELL_FILE_SUFFIX))
+    return {name: scale_csv(os.path.join(src_dir, name), os.path.join(dest_dir, name), scale) for name in names}
+
+
+def generate_character(spell_rows, item_rows, scale, seed=0):
+    """A CharacterModel with 10 * scale spells and 20 * scale inventory items."""
+    rng = random.Random(seed)
+    model = CharacterModel()
+    for stat in STATS:
+        model.stats[stat] = rng.randint(8, 18)
+    model.resources.update({"Level": 5, "EXP": 0, "HP": 32, "Temp HP": 0, "AC": 12, "Speed": 30,
+                            "Spell Points": 6, "Actions": 2, "Sorcery Points": 6})
+    model.max_values.update({"EXP": 6500, "HP": 32, "Spell Points": 10, "Sorcery Points": 6, "Temp HP": 0, "AC": 12})
+    model.info.update({"Race": "Elf", "Class": "Sorcerer", "Skills": "Arcana, Insight"})
+    for row in rng.sample(spell_rows, min(len(spell_rows), 10 * scale)):
+        model.spells.setdefault(compendium.level_to_int(row["Level"]), []).append(row["Name"])
+    for row in rng.sample(item_rows, min(len(item_rows), 20 * scale)):
+        model.inventory[row["Name"]] = {"quantity": rng.randint(1, 5), "equipped": False}
+    return model
+
+
+# --- timing -------------------------------------------------------------------
+
+def measure(func, repeat, setup=None):
+    """Runs setup() then func() `repeat` times; returns the func() timings."""
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def drop_disk_cache(directory):
+    shutil.rmtree(os.path.join(directory, compendium.CACHE_DIR_NAME), ignore_errors=True)
+
+
+def cold_setup(directory):
+    def setup():
+        clear_parse_caches()
+        drop_disk_cache(directory)
+    return setup
+
+
+def typed_queries(names, count, rng):
+    # Every prefix of a few random names, as if typed into the search box
+    queries = []
+    for name in rng.sample(names, min(count, len(names))):
+        queries.append([name[:end].lower() for end in range(1, len(name) + 1)])
+    return queries
+
+
+def run_cases(directory, scale, rows_by_file, repeat):
+    """Yields (case, n, timings) for every benchmark at one scale."""
+    rng = random.Random(scale)
+    bestiary_path = os.path.join(directory, "Bestiary.csv")
+    items_path = os.path.join(directory, "Items.csv")
+    spell_rows = sum(count for name, count in rows_by_file.items() if name.endswith(SPELL_FILE_SUFFIX))
+
+    # Compendium load: no cache at all, pickled parse cache on disk, already in memory
+    for name, path in (("bestiary", bestiary_path), ("items", items_path)):
+        load = lambda path=path: load_csv_rows(path)
+        yield f"load_{name}_cold", rows_by_file[os.path.basename(path)], measure(load, repeat, cold_setup(directory))
+        load()
+        yield f"load_{name}_disk_cache", rows_by_file[os.path.basename(path)], measure(load, repeat, clear_parse_caches)
+        yield f"load_{name}_memory", rows_by_file[os.path.basename(path)], measure(load, repeat)
+    load_spells = lambda: SpellCompendium(directory).load()
+    yield "load_spells_cold", spell_rows, measure(load_spells, repeat, cold_setup(directory))
+    load_spells()
+    yield "load_spells_disk_cache", spell_rows, measure(load_spells, repeat, clear_parse_caches)
+
+    # Spell lookup as done by show_spell: every known name plus as many misses
+    spells = SpellCompendium(directory).load()
+    names = [row["Name"] for row in spells.spells]
+    lookups = names + [name + " (missing)" for name in names]
+    yield "spell_lookup", len(lookups), measure(lambda: [spells.get(name) for name in lookups], repeat)
+
+    # Search boxes of the bestiary and item panels, and sorting by every column
+    for name, path, sort_keys in (("bestiary", bestiary_path, BESTIARY_SORT_KEYS), ("items", items_path, ITEM_SORT_KEYS)):
+        rows = load_csv_rows(path)
+        table = BrowseTable(rows, sort_keys)
+        yield f"{name}_name_index_build", len(rows), measure(lambda: BrowseTable(rows, sort_keys).name_index, repeat)
+        queries = typed_queries([row["Name"] for row in rows], SEARCHES, rng)
+
+        def type_queries(table=table, queries=queries):
+            for typed in queries:
+                search = IncrementalSearch(table.name_index)
+                for query in typed:
+                    search.search(query)
+        yield f"{name}_search", sum(len(typed) for typed in queries), measure(type_queries, repeat)
+
+        def sort_all(rows=rows, sort_keys=sort_keys):
+            fresh = BrowseTable(rows, sort_keys)
+            for col in sort_keys:
+                fresh.sort_order(col, False)
+                fresh.sort_order(col, True)
+        yield f"{name}_sort_treeview", len(rows), measure(sort_all, repeat)
+
+    # Damage clauses of every spell's text, and of the whole bestiary: parsed,
+    # and read back from the pickled table
+    texts = [row["Text"] for row in spells.spells]
+    yield "extract_damage", len(texts), measure(lambda: [parse_damage(text) for text in texts], repeat)
+    bestiary_rows = load_csv_rows(bestiary_path)
+    yield "bestiary_damage_parse", len(bestiary_rows), measure(
+        lambda: DamageTable(bestiary_rows, BESTIARY_DAMAGE_FIELDS), repeat)
+    load_damage_table(bestiary_path)
+    yield "bestiary_damage_disk_cache", len(bestiary_rows), measure(
+        lambda: load_damage_table(bestiary_path), repeat, clear_parse_caches)
+
+    # save_to_csv / load_from_csv round trip through the character store
+    model = generate_character(spells.spells, load_csv_rows(items_path), scale)
+    store = CharacterStore(os.path.join(directory, "character_data.csv"))
+
+    def round_trip():
+        store.save_snapshot(model.copy())
+        store.load()
+    yield "character_round_trip", len(model.rows()), measure(round_trip, repeat)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks for the compendium and character sheet hot paths.")
+    parser.add_argument("--scales", default="1,10,100", help="comma separated row multipliers (e.g. 1,10,100,1000)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    args = parser.parse_args(argv)
+    scales = [int(scale) for scale in args.scales.split(",")]
+
+    # One record per (case, scale): n is the rows, lookups or typed queries the
+    # case works through, timed on CSV copies with every row repeated `scale` times
+    results = []
+    for scale in scales:
+        with tempfile.TemporaryDirectory(prefix=f"dnd-bench-{scale}x-") as directory:
+            rows_by_file = generate_compendium(directory, scale)
+            for case, n, timings in run_cases(directory, scale, rows_by_file, args.repeat):
+                record = {
+                    "case": case,
+                    "scale": scale,
+                    "n": n,
+                    "repeat": len(timings),
+                    "min_s": min(timings),
+                    "median_s": statistics.median(timings),
+                }
+                results.append(record)
+                print(f"{case:32} {scale:>5}x  n={n:<9} {record['min_s'] * 1000:10.2f} ms", file=sys.stderr)
+            clear_parse_caches()
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,350 @@
+import copy
+import csv
+
+import perf
+
+STATS = ["Strength", "Dexterity", "Constitution", "Intelligence", "Wisdom", "Charisma"]
+# Rows written after the ability scores, in file order
+RESOURCES = ["Level", "EXP", "HP", "Temp HP", "AC", "Speed", "Spell Points", "Actions", "Sorcery Points"]
+MAX_VALUES = ["EXP", "HP", "Spell Points", "Sorcery Points", "Temp HP", "AC"]
+
+# Skills rolled with each ability
+CHECKS = {
+    "Strength": ["Athletics"],
+    "Dexterity": ["Acrobatics", "Sleight of Hand", "Stealth"],
+    "Constitution": [],
+    "Intelligence": ["Arcana", "History", "Investigation", "Nature", "Religion"],
+    "Wisdom": ["Animal Handling", "Insight", "Medicine", "Perception", "Survival"],
+    "Charisma": ["Deception", "Intimidation", "Performance", "Persuasion"]
+}
+
+# Parts of the sheet, in CSV order ("values" = stats, resources and max values)
+SECTIONS = ("values", "info", "spells", "inventory")
+
+# Spell points spent per spell slot level
+SPELL_POINT_COSTS = {
+    "Cantrip": 0,
+    "1st": 2,
+    "2nd": 3,
+    "3rd": 5,
+    "4th": 6,
+    "5th": 7,
+    "6th": 9,
+    "7th": 10,
+    "8th": 11,
+    "9th": 13,
+}
+
+# Spellcasting ability per class (lowercase, as in the Class info field)
+SPELLCASTING_ABILITIES = {
+    "artificer": "Intelligence", "bard": "Charisma", "cleric": "Wisdom", "druid": "Wisdom",
+    "paladin": "Charisma", "ranger": "Wisdom", "sorcerer": "Charisma", "warlock": "Charisma",
+    "wizard": "Intelligence",
+}
+
+
+def parse_equipped(text):
+    return text.strip().lower() in ("true", "1", "yes")
+
+
+def ability_modifier(score):
+    return (score - 10) // 2
+
+
+def proficiency_bonus_for(level):
+    return 2 + (max(level, 1) - 1) // 4
+
+
+class CharacterModel:
+    """Everything stored in character_data.csv, as plain Python data.
+
+    No Tk is involved: the UI copies values into its IntVars and sends edits
+    back through CharacterStore, so the model can be loaded, inspected and
+    timed on its own.
+    """
+
+    __slots__ = ("stats", "resources", "max_values", "info", "spells", "inventory")
+
+    def __init__(self):
+        self.stats = {}       # "Strength" ... -> int
+        self.resources = {}   # "Level" / "HP" / "Spell Points" ... -> int
+        self.max_values = {}  # "HP" ... -> int (the "Max HP" rows)
+        self.info = {}        # "Race" / "Class" / "Skills" ... -> str
+        self.spells = {}      # level -> [spell name, ...]
+        self.inventory = {}   # item name -> {"quantity": int, "equipped": bool}
+
+    # --- parsing ----------------------------------------------------------------
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Builds a model from csv rows in one pass; the first cell of each
+        row picks its parser from _ROW_PARSERS."""
+        model = cls()
+        parsers = _ROW_PARSERS
+        for row in rows:
+            if not row:
+                continue
+            key = row[0].strip()
+            parser = parsers.get(key)
+            if parser is None and key.isdigit():
+                parser = _parse_spell
+            if parser is not None:
+                parser(model, key, row)
+        return model
+
+    @classmethod
+    @perf.timed()
+    def from_csv(cls, path):
+        with open(path, newline='', encoding='utf-8') as csvfile:
+            return cls.from_rows(csv.reader(csvfile))
+
+    # --- values by CSV key ("Strength", "HP", "Max HP" ...) ---------------------
+
+    def get_value(self, key, default=None):
+        slot, name = _VALUE_SLOTS[key]
+        return getattr(self, slot).get(name, default)
+
+    def set_value(self, key, value):
+        slot, name = _VALUE_SLOTS[key]
+        getattr(self, slot)[name] = value
+
+    def values(self):
+        """All stats, resources and max values keyed as in the CSV."""
+        values = dict(self.stats)
+        values.update(self.resources)
+        values.update({f"Max {key}": value for key, value in self.max_values.items()})
+        return values
+
+    # --- derived ----------------------------------------------------------------
+
+    def modifier(self, stat):
+        return ability_modifier(self.stats.get(stat, 10))
+
+    def proficiency_bonus(self):
+        return proficiency_bonus_for(self.resources.get("Level", 1))
+
+    def info_set(self, field):
+        """A comma separated info field ("Skills", "Saving Throws") as a set of lowercase names."""
+        return {part.strip().lower() for part in self.info.get(field, "").split(",") if part.strip()}
+
+    def max_spell_level(self):
+        # Highest slot a full caster of this level has (spell points follow the slot table)
+        return min(9, (max(self.resources.get("Level", 1), 1) + 1) // 2)
+
+    def spellcasting_ability(self):
+        # The sheet's own "Spellcasting Ability", else the class's; Charisma
+        # when neither says, as the sheet is a sorcerer's
+        ability = self.info.get("Spellcasting Ability", "").strip().capitalize()
+        if ability in STATS:
+            return ability
+        return SPELLCASTING_ABILITIES.get(self.info.get("Class", "").strip().lower(), "Charisma")
+
+    def spell_attack_bonus(self):
+        return self.proficiency_bonus() + self.modifier(self.spellcasting_ability())
+
+    def spell_save_dc(self):
+        return 8 + self.spell_attack_bonus()
+
+    def save_bonuses(self, proficiency_bonus=None):
+        """{stat: saving throw bonus}; proficient saves add the proficiency bonus."""
+        if proficiency_bonus is None:
+            proficiency_bonus = self.proficiency_bonus()
+        proficient = self.info_set("Saving Throws")
+        return {stat: self.modifier(stat) + (proficiency_bonus if stat.lower() in proficient else 0)
+                for stat in STATS}
+
+    def skill_bonuses(self, proficiency_bonus=None):
+        """{skill: check bonus} for every skill in CHECKS."""
+        if proficiency_bonus is None:
+            proficiency_bonus = self.proficiency_bonus()
+        proficient = self.info_set("Skills")
+        return {skill: self.modifier(stat) + (proficiency_bonus if skill.lower() in proficient else 0)
+                for stat, skills in CHECKS.items() for skill in skills}
+
+    # --- serializing ------------------------------------------------------------
+
+    def section_data(self, section):
+        """The data behind one of SECTIONS, for comparing two models."""
+        if section == "values":
+            return (self.stats, self.resources, self.max_values)
+        return getattr(self, section)
+
+    def section_rows(self, section):
+        """Rows of one section of the character_data.csv layout."""
+        rows = []
+        if section == "values":
+            for key in STATS:
+                if key in self.stats:
+                    rows.append([key, self.stats[key]])
+            for key in RESOURCES:
+                if key in self.resources:
+                    rows.append([key, self.resources[key]])
+            for key in MAX_VALUES:
+                if key in self.max_values:
+                    rows.append([f"Max {key}", self.max_values[key]])
+        elif section == "info":
+            for key, value in self.info.items():
+                rows.append(["Info", key, value])
+        elif section == "spells":
+            for level in sorted(self.spells):
+                for spell in sorted(self.spells[level], key=str.lower):
+                    rows.append([f"{level}", spell])
+        elif section == "inventory":
+            for item, data in self.inventory.items():
+                rows.append(["Inventory", item, data["quantity"], data.get("equipped", False)])
+        return rows
+
+    def rows(self):
+        return [row for section in SECTIONS for row in self.section_rows(section)]
+
+    def to_dict(self):
+        """JSON-friendly form, as stored in "replace" journal entries."""
+        return {
+            "values": self.values(),
+            "info": dict(self.info),
+            "spells": {level: list(spells) for level, spells in self.spells.items()},
+            "inventory": copy.deepcopy(self.inventory),
+        }
+
+    def assign(self, data):
+        """Replaces the contents with a to_dict() style dict. The dicts are
+        updated in place, so references held by the UI stay valid."""
+        for slot in self.__slots__:
+            getattr(self, slot).clear()
+        for key, value in data["values"].items():
+            if key in _VALUE_SLOTS:
+                self.set_value(key, value)
+        self.info.update(data["info"])
+        # JSON turns the level keys into strings
+        self.spells.update({int(level): list(spells) for level, spells in data["spells"].items()})
+        self.inventory.update(copy.deepcopy(data["inventory"]))
+
+    def copy(self):
+        model = CharacterModel()
+        model.assign(self.to_dict())
+        return model
+
+
+class CheckTable:
+    """Saving throw, skill and spellcasting bonuses, kept up to date one change at a time.
+
+    Every line shown has a key: ("stat", ability) for the modifier of an
+    ability with skills (the skill list's header; Constitution has none),
+    ("save", ability) and ("skill", skill) for a bonus, ("spell", "Spell
+    Save DC") and ("spell", "Spell Attack Bonus"), each with a (bonus,
+    proficient) value in `lines`. The set_* methods recompute only what the
+    change touches and return the keys whose value changed, so windows
+    redraw just those lines.
+    """
+
+    __slots__ = ("modifiers", "proficiency_bonus", "proficient_saves", "proficient_skills", "spell_ability", "lines")
+
+    def __init__(self, model):
+        self.modifiers = {stat: model.modifier(stat) for stat in STATS}
+        self.proficiency_bonus = model.proficiency_bonus()
+        self.proficient_saves = model.info_set("Saving Throws")
+        self.proficient_skills = model.info_set("Skills")
+        self.spell_ability = model.spellcasting_ability()
+        self.lines = {}  # key -> (bonus, proficient)
+        for stat in STATS:
+            self._update(stat)
+        self._update_spellcasting([])
+
+    def _set(self, key, bonus, proficient, changed):
+        value = (bonus, proficient)
+        if self.lines.get(key) != value:
+            self.lines[key] = value
+            changed.append(key)
+
+    def _update(self, stat):
+        # The modifier, save and skills of one ability
+        changed = []
+        modifier = self.modifiers[stat]
+        if CHECKS[stat]:
+            self._set(("stat", stat), modifier, False, changed)
+        proficient = stat.lower() in self.proficient_saves
+        self._set(("save", stat), modifier + (self.proficiency_bonus if proficient else 0), proficient, changed)
+        for skill in CHECKS[stat]:
+            proficient = skill.lower() in self.proficient_skills
+            self._set(("skill", skill), modifier + (self.proficiency_bonus if proficient else 0), proficient, changed)
+        return changed
+
+    def _update_spellcasting(self, changed):
+        # As CharacterModel.spell_attack_bonus() and spell_save_dc()
+        attack = self.proficiency_bonus + self.modifiers[self.spell_ability]
+        self._set(("spell", "Spell Save DC"), 8 + attack, False, changed)
+        self._set(("spell", "Spell Attack Bonus"), attack, False, changed)
+        return changed
+
+    def set_score(self, stat, score):
+        modifier = ability_modifier(score)
+        if modifier == self.modifiers[stat]:
+            return []
+        self.modifiers[stat] = modifier
+        changed = self._update(stat)
+        if stat == self.spell_ability:
+            self._update_spellcasting(changed)
+        return changed
+
+    def set_level(self, level):
+        bonus = proficiency_bonus_for(level)
+        if bonus == self.proficiency_bonus:
+            return []
+        self.proficiency_bonus = bonus
+        return self._update_spellcasting([key for stat in STATS for key in self._update(stat)])
+
+    def set_spellcasting_ability(self, ability):
+        """Takes the ability as spellcasting_ability() returns it."""
+        if ability == self.spell_ability:
+            return []
+        self.spell_ability = ability
+        return self._update_spellcasting([])
+
+    def set_proficiencies(self, saving_throws, skills):
+        """Takes the proficient saves and skills as info_set() returns them."""
+        if (saving_throws, skills) == (self.proficient_saves, self.proficient_skills):
+            return []
+        self.proficient_saves, self.proficient_skills = saving_throws, skills
+        return [key for stat in STATS for key in self._update(stat)]
+
+
+# CSV key -> (model slot, key inside that slot)
+_VALUE_SLOTS = {key: ("stats", key) for key in STATS}
+_VALUE_SLOTS.update({key: ("resources", key) for key in RESOURCES})
+_VALUE_SLOTS.update({f"Max {key}": ("max_values", key) for key in MAX_VALUES})
+
+
+def _value_parser(slot, name):
+    def parse(model, key, row):
+        if len(row) == 2:
+            try:
+                getattr(model, slot)[name] = int(row[1])
+            except ValueError:
+                pass
+    return parse
+
+
+def _parse_info(model, key, row):
+    if len(row) >= 3:
+        model.info[row[1]] = row[2]
+
+
+def _parse_spell(model, key, row):
+    if len(row) >= 2:
+        model.spells.setdefault(int(key), []).append(row[1].strip())
+
+
+def _parse_inventory(model, key, row):
+    if len(row) >= 3:
+        try:
+            qty = int(row[2].strip())
+        except ValueError:
+            qty = 1
+        equipped = parse_equipped(row[3]) if len(row) >= 4 else False
+        model.inventory[row[1].strip()] = {"quantity": qty, "equipped": equipped}
+
+
+# First cell of a row -> parser; numeric spell levels fall back to _parse_spell
+_ROW_PARSERS = {key: _value_parser(slot, name) for key, (slot, name) in _VALUE_SLOTS.items()}
+_ROW_PARSERS.update({"Info": _parse_info, "Inventory": _parse_inventory})
+_ROW_PARSERS.update({str(level): _parse_spell for level in range(10)})
@@ -0,0 +1,143 @@
+"""Usage: python character_report.py CAMPAIGN_DIR [--format jsonl|csv] [--output FILE]"""
+import argparse
+import csv
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from cli import discard_stdout
+from character_model import CharacterModel, STATS, CHECKS
+from compendium import DATA_DIR, SpellCompendium, load_csv_rows, load_armor_table
+
+SKILLS = [skill for skills in CHECKS.values() for skill in skills]
+CSV_FIELDS = (["file", "class", "level", "proficiency_bonus", "ac", "computed_ac"]
+              + [f"{stat} mod" for stat in STATS]
+              + [f"{stat} save" for stat in STATS]
+              + SKILLS
+              + ["warnings", "error"])
+
+# Compendium data for the current process, filled in by init_worker
+_spells = None
+_item_names = None
+_armor = None
+
+
+def init_worker(data_dir):
+    """Loads the compendium once per process (the parsed CSVs come from the disk cache)."""
+    global _spells, _item_names, _armor
+    items_path = os.path.join(data_dir, "Items.csv")
+    _spells = SpellCompendium(data_dir).load()
+    _item_names = {row["Name"] for row in load_csv_rows(items_path)}
+    _armor = load_armor_table(items_path)
+
+
+def check_sheet(model):
+    """Derived values and compendium warnings for one CharacterModel."""
+    proficiency_bonus = model.proficiency_bonus()
+    equipped = [item for item, data in model.inventory.items() if data.get("equipped")]
+    # Same rule as the app's Recompute AC: best armor, else the base AC, plus shields
+    computed_ac = _armor.compute_ac(equipped, model.modifier("Dexterity"), model.max_values.get("AC", 10))
+
+    warnings = []
+    missing = [stat for stat in STATS if stat not in model.stats]
+    if missing:
+        warnings.append("missing ability scores: " + ", ".join(missing))
+    for level, spells in sorted(model.spells.items()):
+        for spell in spells:
+            if spell not in _spells:
+                warnings.append(f"unknown spell '{spell}' (level {level})")
+    for item in model.inventory:
+        if item not in _item_names:
+            warnings.append(f"unknown item '{item}'")
+    known = {name.lower() for name in SKILLS + STATS}
+    for skill in sorted(model.info_set("Skills") - known):
+        warnings.append(f"unknown skill proficiency '{skill}'")
+    for stat in sorted(model.info_set("Saving Throws") - {stat.lower() for stat in STATS}):
+        warnings.append(f"unknown saving throw proficiency '{stat}'")
+    if "AC" in model.resources and model.resources["AC"] != computed_ac:
+        warnings.append(f"AC is {model.resources['AC']} but equipped armor gives {computed_ac}")
+
+    return {
+        "class": model.info.get("Class", ""),
+        "level": model.resources.get("Level"),
+        "proficiency_bonus": proficiency_bonus,
+        "ac": model.resources.get("AC"),
+        "computed_ac": computed_ac,
+        "modifiers": {stat: model.modifier(stat) for stat in STATS},
+        "saves": model.save_bonuses(proficiency_bonus),
+        "skills": model.skill_bonuses(proficiency_bonus),
+        "warnings": warnings,
+    }
+
+
+def report_file(path):
+    try:
+        report = check_sheet(CharacterModel.from_csv(path))
+    except (OSError, ValueError, csv.Error) as e:
+        return {"file": path, "error": str(e)}
+    return {"file": path, **report}
+
+
+def csv_record(report):
+    record = {field: report.get(field, "") for field in CSV_FIELDS}
+    for stat in STATS:
+        record[f"{stat} mod"] = report.get("modifiers", {}).get(stat, "")
+        record[f"{stat} save"] = report.get("saves", {}).get(stat, "")
+    record.update(report.get("skills", {}))
+    record["warnings"] = "; ".join(report.get("warnings", []))
+    return record
+
+
+def character_files(directory):
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                  if name.lower().endswith(".csv"))
+
+
+def iter_reports(paths, data_dir=DATA_DIR, workers=None):
+    """Yields one report per path, in order, as they complete."""
+    # Each line is written as soon as its sheet is done, so big campaigns stream
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(paths) < 2:
+        init_worker(data_dir)
+        yield from map(report_file, paths)
+        return
+    # Several sheets per task keep the inter-process traffic small
+    chunksize = max(1, len(paths) // (workers * 8))
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(data_dir,)) as pool:
+        yield from pool.map(report_file, paths, chunksize=chunksize)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Derived values and compendium checks for character sheets.")
+    parser.add_argument("directory", help="folder of character_data.csv-style files")
+    parser.add_argument("--format", choices=("jsonl", "csv"), default="jsonl")
+    parser.add_argument("--output", help="write the report here instead of stdout")
+    parser.add_argument("--workers", type=int, default=None, help="processes to use (default: one per CPU)")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="folder with Items.csv and the *_Spells.csv files")
+    args = parser.parse_args(argv)
+
+    paths = character_files(args.directory)
+    out = open(args.output, 'w', newline='', encoding='utf-8') if args.output else sys.stdout
+    try:
+        writer = None
+        if args.format == "csv":
+            writer = csv.DictWriter(out, fieldnames=CSV_FIELDS)
+            writer.writeheader()
+        for report in iter_reports(paths, args.data_dir, args.workers):
+            if writer:
+                writer.writerow(csv_record(report))
+            else:
+                out.write(json.dumps(report) + "\n")
+            out.flush()
+    except BrokenPipeError:
+        discard_stdout()
+        return 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
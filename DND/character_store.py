@@ -0,0 +1,350 @@
+import csv
+import json
+import os
+import threading
+import time
+
+import perf
+from character_model import CharacterModel, SECTIONS
+
+JOURNAL_SUFFIX = ".journal"
+COMPACT_EVERY = 200  # journal entries before they are folded into the CSV snapshot
+SAVE_DELAY = 0.5     # seconds of quiet before a background save is written
+
+# Section of the sheet each journal op touches ("replace" touches all of them)
+OP_SECTIONS = {
+    "value": "values",
+    "info": "info",
+    "spell_add": "spells",
+    "spell_remove": "spells",
+    "item": "inventory",
+    "item_remove": "inventory",
+}
+
+
+def read_character_csv(path):
+    """Parses a character_data.csv into a CharacterModel."""
+    return CharacterModel.from_csv(path)
+
+
+@perf.timed()
+def write_csv_rows(path, rows):
+    """Writes rows to path atomically: a temp file is written and synced, then
+    renamed over the old file, so a crash leaves either the old or the new file."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', newline='', encoding='utf-8') as file:
+        csv.writer(file).writerows(rows)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+
+def write_character_csv(path, model):
+    """Writes a CharacterModel in the character_data.csv layout, atomically."""
+    write_csv_rows(path, model.rows())
+
+
+def apply_edit(model, edit):
+    """Applies one journal entry to a CharacterModel. Every edit sets an absolute
+    value, so replaying an entry that is already in the snapshot is harmless."""
+    op = edit["op"]
+    if op == "value":
+        model.set_value(edit["key"], edit["value"])
+    elif op == "info":
+        model.info[edit["key"]] = edit["value"]
+    elif op == "spell_add":
+        spells = model.spells.setdefault(edit["level"], [])
+        if edit["name"] not in spells:
+            spells.append(edit["name"])
+    elif op == "spell_remove":
+        spells = model.spells.get(edit["level"], [])
+        if edit["name"] in spells:
+            spells.remove(edit["name"])
+        if not spells:
+            model.spells.pop(edit["level"], None)
+    elif op == "item":
+        model.inventory[edit["name"]] = {"quantity": edit["quantity"], "equipped": edit["equipped"]}
+    elif op == "item_remove":
+        model.inventory.pop(edit["name"], None)
+    elif op == "replace":
+        model.assign(edit["state"])
+
+
+class CharacterStore:
+    """character_data.csv plus an append-only journal of edits.
+
+    The CSV is the snapshot; each edit is one JSON line appended to
+    <csv>.journal. Opening the store replays the journal over the snapshot,
+    which is also how an interrupted session is recovered (a torn last line
+    is ignored). compact() writes the current state back to the CSV and
+    empties the journal; it also runs on its own every COMPACT_EVERY edits.
+
+    A snapshot is taken in two steps so the file write can happen off the
+    UI thread (see WriteBehindSaver): prepare_snapshot() serializes the
+    sections that changed since the last snapshot and moves the journal
+    aside to <csv>.journal.N, then write_snapshot() writes the CSV and
+    deletes the moved journals. Until that finishes the moved journals are
+    still replayed on load, so nothing is lost if the write never happens.
+    """
+
+    def __init__(self, csv_path):
+        self.csv_path = csv_path
+        self.journal_path = csv_path + JOURNAL_SUFFIX
+        self.model = CharacterModel()
+        self.journal_entries = 0
+        self.saver = None         # WriteBehindSaver that takes over compaction, if any
+        self.unsaved = False      # edits not yet folded into a CSV snapshot
+        self._journal = None
+        self._dirty = set(SECTIONS)  # sections whose cached rows are stale
+        self._rows = {}              # section -> rows as of the last snapshot
+        self._rotations = 0
+
+    def _rotated_journals(self):
+        """Journals moved aside by prepare_snapshot() and not yet folded into the CSV, oldest first."""
+        directory, prefix = os.path.split(self.journal_path)
+        found = []
+        for name in os.listdir(directory or "."):
+            suffix = name[len(prefix) + 1:]
+            if name.startswith(prefix + ".") and suffix.isdigit():
+                found.append((int(suffix), os.path.join(directory, name)))
+        return sorted(found)
+
+    def _replay(self, path):
+        good_size = 0
+        with open(path, 'rb') as journal:
+            for line in journal:
+                try:
+                    edit = json.loads(line)
+                except ValueError:
+                    break  # torn write at the end of the journal
+                if not line.endswith(b"\n"):
+                    break
+                apply_edit(self.model, edit)
+                self.journal_entries += 1
+                good_size += len(line)
+        if good_size != os.path.getsize(path):
+            # Drop the torn tail so new entries start on a clean line
+            with open(path, 'r+b') as journal:
+                journal.truncate(good_size)
+
+    @perf.timed()
+    def load(self):
+        self.close()
+        self.model = read_character_csv(self.csv_path) if os.path.exists(self.csv_path) else CharacterModel()
+        self.journal_entries = 0
+        rotated = self._rotated_journals()
+        for _, path in rotated:
+            self._replay(path)
+        if os.path.exists(self.journal_path):
+            self._replay(self.journal_path)
+        self._rotations = rotated[-1][0] if rotated else 0
+        self._dirty = set(SECTIONS)
+        self.unsaved = self.journal_entries > 0
+        return self.model
+
+    def close(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    @perf.timed()
+    def record(self, op, **fields):
+        edit = dict(op=op, **fields)
+        apply_edit(self.model, edit)
+        if self._journal is None:
+            self._journal = open(self.journal_path, 'a', encoding='utf-8')
+        self._journal.write(json.dumps(edit) + "\n")
+        self._journal.flush()
+        self._dirty.update([OP_SECTIONS[op]] if op in OP_SECTIONS else SECTIONS)
+        self.unsaved = True
+        self.journal_entries += 1
+        if self.journal_entries >= COMPACT_EVERY:
+            if self.saver is not None:
+                self.saver.request()
+            else:
+                self.compact()
+
+    # Edits -------------------------------------------------------------------
+
+    def set_value(self, key, value):
+        if self.model.get_value(key) != value:
+            self.record("value", key=key, value=value)
+
+    def set_info(self, key, value):
+        if self.model.info.get(key) != value:
+            self.record("info", key=key, value=value)
+
+    def add_spell(self, level, name):
+        self.record("spell_add", level=level, name=name)
+
+    def remove_spell(self, level, name):
+        if name not in self.model.spells.get(level, []):
+            raise ValueError(f"Spell '{name}' not found at level {level}.")
+        self.record("spell_remove", level=level, name=name)
+
+    def set_item(self, name, quantity, equipped=False):
+        self.record("item", name=name, quantity=quantity, equipped=bool(equipped))
+
+    def remove_item(self, name):
+        self.record("item_remove", name=name)
+
+    def replace_model(self, model):
+        self.record("replace", state=model.to_dict())
+
+    # Snapshot ----------------------------------------------------------------
+
+    def prepare_snapshot(self):
+        """Serializes the current state and moves the live journal aside.
+
+        Only sections edited since the last snapshot are turned into rows
+        again. Returns (rows, moved journal paths) for write_snapshot(), or
+        None when the CSV and journals already hold the current state as a
+        snapshot. Cheap enough to call on the UI thread.
+        """
+        if not self.unsaved:
+            return None
+        for section in self._dirty:
+            self._rows[section] = self.model.section_rows(section)
+        self._dirty.clear()
+        rows = [row for section in SECTIONS for row in self._rows[section]]
+
+        self.close()
+        moved = []
+        if os.path.exists(self.journal_path):
+            self._rotations += 1
+            moved_path = f"{self.journal_path}.{self._rotations}"
+            os.replace(self.journal_path, moved_path)
+            moved.append(moved_path)
+        self.journal_entries = 0
+        self.unsaved = False
+        return rows, moved
+
+    def write_snapshot(self, rows, moved_journals):
+        """Writes rows from prepare_snapshot() as the new CSV, then deletes the
+        journals it covers. Safe to run on a worker thread."""
+        write_csv_rows(self.csv_path, rows)
+        for path in moved_journals:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def compact(self):
+        """Folds the journal into character_data.csv and empties it, waiting
+        for the write to finish."""
+        if self.saver is not None:
+            # Go through the saver so an older queued snapshot can't land last
+            self.saver.request()
+            self.saver.flush()
+            return
+        snapshot = self.prepare_snapshot()
+        if snapshot is not None:
+            # Also covers journals left behind by a save that never finished
+            self.write_snapshot(snapshot[0], [path for _, path in self._rotated_journals()])
+
+    def update_model(self, model):
+        """Adopts a whole CharacterModel, marking the sections that differ."""
+        for section in SECTIONS:
+            if model.section_data(section) != self.model.section_data(section):
+                self._dirty.add(section)
+                self.unsaved = True
+        self.model = model
+
+    def save_snapshot(self, model):
+        """Replaces the whole model and writes it out as the new snapshot."""
+        self.update_model(model)
+        self.compact()
+
+    def export_csv(self, path):
+        write_character_csv(path, self.model)
+
+    def import_csv(self, path):
+        self.replace_model(read_character_csv(path))
+
+
+class WriteBehindSaver:
+    """Writes CharacterStore snapshots on a background thread.
+
+    request() is called from the UI thread: it takes a snapshot with
+    prepare_snapshot() (no disk writes beyond a rename) and hands it to the
+    worker. Requests that arrive within SAVE_DELAY of each other are
+    coalesced, only the newest rows are written, and the write is atomic
+    (temp file + rename), so the UI never waits on the disk and an
+    interrupted save leaves the previous character_data.csv intact.
+    """
+
+    def __init__(self, store, delay=SAVE_DELAY):
+        self.store = store
+        self.delay = delay
+        self.error = None          # last exception raised by a background write
+        self._cond = threading.Condition()
+        self._rows = None          # newest rows waiting to be written
+        self._moved = []           # journals covered by those rows
+        self._due = 0.0
+        self._writing = False
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="character-saver", daemon=True)
+        self._thread.start()
+        store.saver = self
+
+    def request(self, delay=None):
+        """Queues the current state of the store to be written."""
+        snapshot = self.store.prepare_snapshot()
+        if snapshot is None:
+            return False
+        rows, moved = snapshot
+        with self._cond:
+            self._rows = rows
+            self._moved.extend(moved)
+            self._due = time.monotonic() + (self.delay if delay is None else delay)
+            self._cond.notify()
+        return True
+
+    def pending(self):
+        with self._cond:
+            return self._rows is not None or self._writing
+
+    def flush(self, timeout=None):
+        """Writes anything queued right away and waits for it to finish."""
+        with self._cond:
+            self._due = 0.0
+            self._cond.notify()
+            return self._cond.wait_for(lambda: self._rows is None and not self._writing, timeout)
+
+    def stop(self, timeout=None):
+        """Flushes and ends the worker thread."""
+        self.flush(timeout)
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        self._thread.join(timeout)
+        if self.store.saver is self:
+            self.store.saver = None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopped:
+                    if self._rows is not None:
+                        wait = self._due - time.monotonic()
+                        if wait <= 0:
+                            break
+                        self._cond.wait(wait)
+                    else:
+                        self._cond.wait()
+                if self._rows is None:
+                    return  # stopped with nothing left to write
+                rows, moved = self._rows, self._moved
+                self._rows, self._moved = None, []
+                self._writing = True
+            try:
+                self.store.write_snapshot(rows, moved)
+            except OSError as e:
+                # The moved journals stay on disk and are replayed on the next
+                # load; keep them for the next write so it removes them
+                print(f"Error saving {self.store.csv_path}: {e}")
+                self.error = e
+                self.store.unsaved = True
+                with self._cond:
+                    self._moved[:0] = moved
+            with self._cond:
+                self._writing = False
+                self._cond.notify_all()
@@ -0,0 +1,8 @@
+import os
+import sys
+
+
+def discard_stdout():
+    """Points stdout at devnull once the reader has gone away (`| head`), so the
+    interpreter's final flush can't raise BrokenPipeError again."""
+    os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
@@ -0,0 +1,595 @@
+import bisect
+import csv
+import hashlib
+import math
+import os
+import pickle
+import re
+
+import perf
+from damage import DamageTable, BESTIARY_DAMAGE_FIELDS, SPELL_DAMAGE_FIELDS, upcast_table
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Parsed copies of the CSV files live here, next to the data they mirror
+CACHE_DIR_NAME = ".csv_cache"
+CACHE_VERSION = 1
+
+_parsed_tables = {}  # path -> (signature, rows), shared by every caller in the process
+
+SPELL_FILE_SUFFIX = "_Spells.csv"
+
+# Spell level labels as they appear in the "Level" column of the spell files
+SPELL_LEVELS = ["Cantrip", "1st", "2nd", "3rd", "4th", "5th", "6th", "7th", "8th", "9th"]
+
+
+def normalize_name(name):
+    """Key used by every name index: case-insensitive, whitespace collapsed."""
+    return " ".join(name.split()).lower()
+
+
+def level_to_int(level_str):
+    """Converts level like '1st', '2nd', '3rd', etc. to int, Cantrip -> 0"""
+    level_str = level_str.strip().lower()
+    if level_str == "cantrip" or level_str == "0":
+        return 0
+    match = re.match(r"(\d+)(st|nd|rd|th)?", level_str)
+    return int(match.group(1)) if match else 99  # fallback for unknowns
+
+
+# --- typed sort keys --------------------------------------------------------
+# The compendium CSVs write numbers European style: "1.100" is one thousand
+# one hundred and "0,5" is one half.
+
+_NUMBER_RE = re.compile(r"\d[\d.]*(?:,\d+)?")
+_FRACTIONS = {"½": 0.5, "¼": 0.25, "¾": 0.75, "⅓": 1 / 3, "⅕": 0.2}
+COPPER_PER_COIN = {"cp": 1, "sp": 10, "ep": 50, "gp": 100, "pp": 1000}
+RARITY_ORDER = ["none", "common", "uncommon", "rare", "very rare", "legendary", "artifact",
+                "varies", "unknown (magic)", "unknown"]
+
+
+def parse_number(text):
+    """First number in text as a float, or None. Understands 1.100 and 0,5."""
+    match = _NUMBER_RE.search(text)
+    if not match:
+        return None
+    return float(match.group().replace(".", "").replace(",", "."))
+
+
+def text_key(value):
+    return value.strip().lower()
+
+
+def leading_number_key(value):
+    # "17 (natural armor)" -> 17, "66 (12d8 + 12)" -> 66 (average HP); blanks sort last
+    number = parse_number(value)
+    return math.inf if number is None else number
+
+
+def cr_key(value):
+    # "4 (XP 1.100; PB +2)" -> 4, "1/8 (XP 25; PB +2)" -> 0.125
+    match = re.match(r"\s*(\d+)(?:/(\d+))?", value)
+    if not match:
+        return math.inf
+    numerator, denominator = match.groups()
+    return int(numerator) / int(denominator) if denominator else float(numerator)
+
+
+# XP per challenge rating (Dungeon Master's Guide), for rows that don't print theirs
+CR_XP = {0: 10, 0.125: 25, 0.25: 50, 0.5: 100, 1: 200, 2: 450, 3: 700, 4: 1100, 5: 1800, 6: 2300,
+         7: 2900, 8: 3900, 9: 5000, 10: 5900, 11: 7200, 12: 8400, 13: 10000, 14: 11500, 15: 13000,
+         16: 15000, 17: 18000, 18: 20000, 19: 22000, 20: 25000, 21: 33000, 22: 41000, 23: 50000,
+         24: 62000, 25: 75000, 26: 90000, 27: 105000, 28: 120000, 29: 135000, 30: 155000}
+# "XP 1.100", "XP 1.800, or 2.300 in lair", "XP 0 or 10"
+_XP_RE = re.compile(r"XP\s*([\d.,]+)(?:\s*or\s+([\d.,]+)(?=\s*[;)]))?")
+
+
+def parse_challenge(value):
+    """("4 (XP 1.100; PB +2)") -> (4.0, 1100). CR is None for "None" / "Unknown";
+    the XP is the base one (not "in lair"; 10 for "XP 0 or 10"), else taken
+    from CR_XP, else 0."""
+    cr = cr_key(value)
+    cr = None if cr == math.inf else cr
+    match = _XP_RE.search(value)
+    if match:
+        xp = int(parse_number(match.group(1)))
+        if not xp and match.group(2):
+            xp = int(parse_number(match.group(2)))
+        return cr, xp
+    return cr, CR_XP.get(cr, 0)
+
+
+def value_in_copper(value):
+    # "200 gp" -> 20000, "0,1 cp" -> 0.1; no price sorts last
+    match = re.search(r"([\d.,]+)\s*(cp|sp|ep|gp|pp)", value.lower())
+    if not match:
+        return math.inf
+    return parse_number(match.group(1)) * COPPER_PER_COIN[match.group(2)]
+
+
+def weight_in_pounds(value):
+    # "65 lb.", "½ lb.", "2½ lb.", "1,6 oz."
+    value = value.strip()
+    number = parse_number(value) or 0
+    number += sum(amount for symbol, amount in _FRACTIONS.items() if symbol in value)
+    if not number:
+        return math.inf
+    return number / 16 if "oz" in value else number
+
+
+def rarity_key(value):
+    value = text_key(value)
+    return RARITY_ORDER.index(value) if value in RARITY_ORDER else len(RARITY_ORDER)
+
+
+BESTIARY_SORT_KEYS = {"Name": text_key, "Type": text_key, "CR": cr_key, "AC": leading_number_key, "HP": leading_number_key}
+ITEM_SORT_KEYS = {"Name": text_key, "Rarity": rarity_key, "Type": text_key, "Value": value_in_copper, "Weight": weight_in_pounds}
+
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _file_digest(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _cache_path(path, table_name=None):
+    directory, filename = os.path.split(path)
+    if table_name:
+        filename += "." + table_name
+    return os.path.join(directory, CACHE_DIR_NAME, filename + ".pickle")
+
+
+def _read_cache(cache_path):
+    try:
+        with open(cache_path, 'rb') as f:
+            entry = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+        return None
+    if not isinstance(entry, dict) or entry.get("version") != CACHE_VERSION:
+        return None
+    return entry
+
+
+def _write_cache(cache_path, entry):
+    # Write to a temp file and swap it in so a crash never leaves half a cache behind
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = cache_path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"Could not write parse cache {cache_path}: {e}")
+
+
+@perf.timed()
+def load_csv_rows(path):
+    """Returns the rows of a compendium CSV as a list of dicts.
+
+    Rows are parsed once per process and also pickled into .csv_cache/ next
+    to the source file. The on-disk copy is reused while the file's mtime and
+    size are unchanged; if they differ but the content hash still matches
+    (e.g. the file was only touched) the cache is re-stamped instead of
+    re-parsed. Callers share the returned list and must not modify it.
+    """
+    path = os.path.abspath(path)
+    signature = _file_signature(path)
+
+    cached = _parsed_tables.get(path)
+    if cached and cached[0] == signature:
+        return cached[1]
+
+    cache_path = _cache_path(path)
+    entry = _read_cache(cache_path)
+    digest = None
+    if entry is None or entry["signature"] != signature:
+        digest = _file_digest(path)
+        if entry is not None and entry["digest"] == digest:
+            entry["signature"] = signature
+            _write_cache(cache_path, entry)
+        else:
+            entry = None
+
+    if entry is None:
+        with open(path, newline='', encoding='utf-8') as csvfile:
+            rows = list(csv.DictReader(csvfile))
+        entry = {"version": CACHE_VERSION, "signature": signature, "digest": digest, "rows": rows}
+        _write_cache(cache_path, entry)
+
+    _parsed_tables[path] = (signature, entry["rows"])
+    return entry["rows"]
+
+
+class SpellCompendium:
+    """All *_Spells.csv files, loaded once and indexed by spell name.
+
+    The same spell usually appears in several class files; it is stored once
+    and every class list points at that single row.
+    """
+
+    def __init__(self, directory=DATA_DIR):
+        self.directory = directory
+        self.spells = []     # unique spell rows, in file order
+        self.by_name = {}    # normalized name -> row
+        self.by_class = {}   # lowercase class name -> [row, ...]
+        self._loaded = False
+        self._damage = None
+        self._upcast = {}    # spell name -> UpcastTable
+
+    @perf.timed()
+    def load(self):
+        if self._loaded:
+            return self
+        class_files = sorted(f for f in os.listdir(self.directory) if f.endswith(SPELL_FILE_SUFFIX))
+        for filename in class_files:
+            class_name = filename[:-len(SPELL_FILE_SUFFIX)].lower()
+            class_rows = self.by_class.setdefault(class_name, [])
+            for row in load_csv_rows(os.path.join(self.directory, filename)):
+                key = normalize_name(row["Name"])
+                spell = self.by_name.get(key)
+                if spell is None:
+                    spell = row
+                    self.by_name[key] = spell
+                    self.spells.append(spell)
+                class_rows.append(spell)
+        self._loaded = True
+        return self
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    @property
+    def damage(self):
+        """DamageTable of every spell's Text, built on first use."""
+        if self._damage is None:
+            self._damage = DamageTable(self.load().spells, SPELL_DAMAGE_FIELDS)
+        return self._damage
+
+    def upcast(self, spell_name):
+        """UpcastTable of a spell (damage per slot level), built once per spell; None if unknown."""
+        spell = self.get(spell_name)
+        if spell is None:
+            return None
+        table = self._upcast.get(spell["Name"])
+        if table is None:
+            table = upcast_table(level_to_int(spell["Level"]), self.damage.get(spell["Name"]),
+                                 spell.get("At Higher Levels", ""), spell.get("Text", ""))
+            self._upcast[spell["Name"]] = table
+        return table
+
+    def get(self, spell_name):
+        """Returns the spell row for a name, or None if it is unknown."""
+        self.load()
+        return self.by_name.get(normalize_name(spell_name))
+
+    def __contains__(self, spell_name):
+        return self.get(spell_name) is not None
+
+    def class_spells(self, class_name):
+        self.load()
+        return self.by_class.get(class_name.lower(), [])
+
+    def class_spells_by_level(self, class_name):
+        """Groups a class's spell names as {0: [...], 1: [...], ...}."""
+        spells_by_level = {}
+        for row in self.class_spells(class_name):
+            level = level_to_int(row["Level"])
+            spells_by_level.setdefault(level, []).append(row["Name"].strip())
+        return spells_by_level
+
+
+class BrowseTable:
+    """Rows of a compendium CSV prepared for the browser panels.
+
+    Typed sort keys for each browsable column are computed once when the
+    table is built; the row order for a column is sorted once per
+    direction and cached, so sorting again just reuses the permutation.
+    """
+
+    def __init__(self, rows, sort_key_funcs):
+        self.rows = rows
+        self.sort_keys = {col: [func(row[col]) for row in rows] for col, func in sort_key_funcs.items()}
+        self._permutations = {}
+        self._name_index = None
+        self._autocomplete = None
+        self._by_name = None
+
+    def sort_order(self, col, reverse=False):
+        if (col, reverse) not in self._permutations:
+            keys = self.sort_keys.get(col)
+            if keys is None:
+                keys = self.sort_keys[col] = [text_key(row[col]) for row in self.rows]
+            # Reversing the other direction would flip the order of equal keys;
+            # a stable sort keeps them in row order. Starting from the other
+            # direction's permutation (ties already in row order) gives the
+            # sort long presorted runs.
+            order = self._permutations.get((col, not reverse), range(len(self.rows)))
+            self._permutations[(col, reverse)] = sorted(order, key=keys.__getitem__, reverse=reverse)
+        return self._permutations[(col, reverse)]
+
+    @property
+    def name_index(self):
+        if self._name_index is None:
+            self._name_index = NameIndex([row["Name"] for row in self.rows])
+        return self._name_index
+
+    @property
+    def autocomplete(self):
+        if self._autocomplete is None:
+            self._autocomplete = Autocomplete([row["Name"] for row in self.rows], self.name_index)
+        return self._autocomplete
+
+    @property
+    def by_name(self):
+        if self._by_name is None:
+            self._by_name = {row["Name"]: row for row in self.rows}
+        return self._by_name
+
+
+_derived_tables = {}  # (path, table class) -> (rows, table)
+
+
+def _load_derived(path, table_class, *args, persist=False):
+    # Tables built from a CSV are rebuilt only when load_csv_rows returns new
+    # rows. With persist=True the table is also pickled into .csv_cache/, for
+    # tables that are slow to build, and reused while the CSV is unchanged.
+    path = os.path.abspath(path)
+    rows = load_csv_rows(path)
+    cached = _derived_tables.get((path, table_class))
+    if cached is None or cached[0] is not rows:
+        table = _load_persisted(path, table_class, args) if persist else None
+        if table is None:
+            table = table_class(rows, *args)
+            if persist:
+                _write_cache(_cache_path(path, table_class.__name__),
+                             {"version": CACHE_VERSION, "signature": _parsed_tables[path][0],
+                              "table_version": getattr(table_class, "CACHE_VERSION", 0), "args": args,
+                              "table": table})
+        cached = (rows, table)
+        _derived_tables[(path, table_class)] = cached
+    return cached[1]
+
+
+def _load_persisted(path, table_class, args):
+    entry = _read_cache(_cache_path(path, table_class.__name__))
+    if (entry is None or entry["signature"] != _parsed_tables[path][0] or entry["args"] != args
+            or entry.get("table_version") != getattr(table_class, "CACHE_VERSION", 0)):
+        return None
+    return entry["table"]
+
+
+def load_browse_table(path, sort_key_funcs):
+    return _load_derived(path, BrowseTable, sort_key_funcs)
+
+
+def clear_parse_caches():
+    """Forgets every CSV and table built from one in this process; the
+    on-disk parse cache is left alone."""
+    _parsed_tables.clear()
+    _derived_tables.clear()
+
+
+def parse_armor_class(text, item_name=""):
+    """Reads an Items.csv "Damage" cell of an armor or shield.
+
+    "AC 14 + Dex (max 2)" -> base 14, adds Dex capped at 2
+    "AC 18"               -> base 18
+    "AC +2"               -> no base, +2 bonus (shields)
+    A "+1 ..." style item name adds to the bonus. Missing numbers never raise.
+    """
+    armor = {'base_ac': None, 'adds_dex': False, 'dex_cap': None, 'bonus': 0}
+    match = re.search(r"AC\s*(\+)?\s*(\d+)", text, re.IGNORECASE)
+    if match:
+        if match.group(1):
+            armor['bonus'] = int(match.group(2))
+        else:
+            armor['base_ac'] = int(match.group(2))
+    if re.search(r'\+\s*Dex', text, re.IGNORECASE):
+        armor['adds_dex'] = True
+        cap = re.search(r"max\s*(\d+)", text, re.IGNORECASE)
+        armor['dex_cap'] = int(cap.group(1)) if cap else None
+    magic = re.match(r"\+(\d+)\s", item_name)
+    if magic:
+        armor['bonus'] += int(magic.group(1))
+    return armor
+
+
+class ArmorTable:
+    """Armor and shield AC data from Items.csv, keyed by item name."""
+
+    def __init__(self, rows):
+        self.by_name = {}
+        for row in rows:
+            item_type = row["Type"].lower()
+            if "armor" in item_type or "shield" in item_type:
+                self.by_name[row["Name"]] = parse_armor_class(row["Damage"], row["Name"])
+
+    def get(self, item_name):
+        return self.by_name.get(item_name)
+
+    def __contains__(self, item_name):
+        return item_name in self.by_name
+
+    def armor_ac(self, armor, dex_mod):
+        ac = armor['base_ac']
+        if armor['adds_dex']:
+            ac += dex_mod if armor['dex_cap'] is None else min(dex_mod, armor['dex_cap'])
+        return ac + armor['bonus']
+
+    def compute_ac(self, equipped_items, dex_mod, unarmored_ac):
+        """AC from every equipped item: the best body armor (or unarmored_ac
+        if none is worn) plus the bonuses of shields and similar items."""
+        best_armor = None
+        bonus = 0
+        for item_name in equipped_items:
+            armor = self.by_name.get(item_name)
+            if armor is None:
+                continue
+            if armor['base_ac'] is None:
+                bonus += armor['bonus']
+            else:
+                ac = self.armor_ac(armor, dex_mod)
+                best_armor = ac if best_armor is None else max(best_armor, ac)
+        return (unarmored_ac if best_armor is None else best_armor) + bonus
+
+
+class ChallengeTable:
+    """CR and XP of every Bestiary row as numbers, parsed once, with the row
+    positions also kept sorted by XP."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.cr = []   # float or None, per row
+        self.xp = []   # int, per row
+        for row in rows:
+            cr, xp = parse_challenge(row.get("CR", ""))
+            self.cr.append(cr)
+            self.xp.append(xp)
+        self.by_xp = sorted(range(len(rows)), key=self.xp.__getitem__)  # row positions, lowest XP first
+        self.sorted_xp = [self.xp[i] for i in self.by_xp]
+
+    def xp_range(self, low, high):
+        """Positions of the rows with low <= XP <= high, lowest XP first."""
+        return self.by_xp[bisect.bisect_left(self.sorted_xp, low):bisect.bisect_right(self.sorted_xp, high)]
+
+
+def load_challenge_table(path):
+    return _load_derived(path, ChallengeTable)
+
+
+def load_armor_table(path):
+    return _load_derived(path, ArmorTable)
+
+
+def load_damage_table(path, fields=BESTIARY_DAMAGE_FIELDS):
+    """Damage clauses of every row of a compendium CSV (the Bestiary by default)."""
+    return _load_derived(path, DamageTable, fields, persist=True)
+
+
+class NameIndex:
+    """Substring index over a list of names, built from 1- to 3-character grams.
+
+    A query is answered by intersecting the postings of its grams and then
+    confirming the candidates with a plain substring test, so only names that
+    share every gram with the query are ever looked at.
+    """
+
+    GRAM_SIZE = 3
+
+    def __init__(self, names):
+        self.names = [normalize_name(name) for name in names]
+        self.postings = {}
+        for idx, name in enumerate(self.names):
+            for gram in self._grams(name, exact_short=False):
+                self.postings.setdefault(gram, set()).add(idx)
+
+    def _grams(self, text, exact_short=True):
+        # Short queries are looked up as a single gram; names are indexed with every gram size
+        if exact_short and len(text) <= self.GRAM_SIZE:
+            return {text}
+        sizes = [self.GRAM_SIZE] if exact_short else range(1, self.GRAM_SIZE + 1)
+        return {text[i:i + n] for n in sizes for i in range(len(text) - n + 1)}
+
+    def search(self, query, candidates=None):
+        """Returns the sorted indices of names containing query.
+
+        If candidates (a sorted list of indices) is given, only those are
+        considered; this is how a longer query narrows an earlier result.
+        """
+        query = normalize_name(query)
+        if not query:
+            return list(range(len(self.names))) if candidates is None else list(candidates)
+
+        if candidates is None:
+            postings = sorted((self.postings.get(gram, set()) for gram in self._grams(query)), key=len)
+            matches = set(postings[0])
+            for posting in postings[1:]:
+                if not matches:
+                    break
+                matches &= posting
+            candidates = sorted(matches)
+
+        names = self.names
+        return [idx for idx in candidates if query in names[idx]]
+
+
+class IncrementalSearch:
+    """Remembers the previous query so that typing more characters only
+    filters the previous result set instead of searching the whole index."""
+
+    def __init__(self, index):
+        self.index = index
+        self.last_query = ""
+        self.last_result = None
+
+    def search(self, query):
+        query = normalize_name(query)
+        candidates = None
+        if self.last_result is not None and self.last_query and self.last_query in query:
+            candidates = self.last_result
+        result = self.index.search(query, candidates)
+        self.last_query, self.last_result = query, result
+        return result
+
+
+class Autocomplete:
+    """Ranked name suggestions: names starting with the query first, then names
+    with a later word starting with it, then names merely containing it.
+
+    The first two tiers are binary searches over sorted keys; the last one
+    uses the gram postings of a NameIndex over the same names.
+    """
+
+    def __init__(self, names, name_index=None):
+        self.names = names
+        self.name_index = name_index or NameIndex(names)
+        keys = self.name_index.names
+        self.sorted_keys = sorted((key, idx) for idx, key in enumerate(keys))
+        # Every word after the first, as the rest of the name from that word on
+        self.word_keys = sorted(
+            (key[match.start():], idx)
+            for idx, key in enumerate(keys)
+            for match in re.finditer(r"(?<=[\s(\-/])\w", key)
+        )
+
+    @staticmethod
+    def _prefix_matches(sorted_pairs, prefix):
+        start = bisect.bisect_left(sorted_pairs, (prefix,))
+        for key, idx in sorted_pairs[start:]:
+            if not key.startswith(prefix):
+                break
+            yield idx
+
+    def _substring_matches(self, query):
+        keys = self.name_index.names
+        yield from sorted(self.name_index.search(query), key=keys.__getitem__)
+
+    def complete(self, query, limit=50):
+        """Returns up to `limit` names ranked for query."""
+        query = normalize_name(query)
+        if not query:
+            return [self.names[idx] for _, idx in self.sorted_keys[:limit]]
+
+        ranked = []
+        seen = set()
+        tiers = (
+            self._prefix_matches(self.sorted_keys, query),
+            self._prefix_matches(self.word_keys, query),
+            self._substring_matches(query),
+        )
+        for tier in tiers:
+            for idx in tier:
+                if idx not in seen:
+                    seen.add(idx)
+                    ranked.append(self.names[idx])
+                    if len(ranked) >= limit:
+                        return ranked
+        return ranked
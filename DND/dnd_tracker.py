@@ -1,78 +1,45 @@
+import time
+START_TIME = time.perf_counter()  # time-to-first-paint is measured from here
 import tkinter as tk
 from tkinter import ttk, messagebox
-import csv
 import os
 from collections import defaultdict
-import re
-import json
-import platform
 import sys
+from compendium import (SpellCompendium, SPELL_LEVELS, load_browse_table, load_armor_table, IncrementalSearch,
+                        load_damage_table, load_challenge_table, level_to_int, BESTIARY_SORT_KEYS, ITEM_SORT_KEYS)
+from damage import parse_damage
+from widgets import VirtualTreeview, KeyedRowTable, DiceChart, show_rendered_text
+from rules import get_rules_store
+from character_store import CharacterStore, WriteBehindSaver
+from character_model import STATS, CHECKS, SPELL_POINT_COSTS, CheckTable
+from metamagic import ALL_METAMAGIC, metamagic_table
+import perf
 
 def print_env_info():
+    import platform
     print("Python version:", sys.version)
     print("Platform:", platform.system())
     print("Platform version:", platform.version())
     print("Architecture:", platform.architecture())
     print("Tkinter version:", tk.TkVersion)
-    
-print_env_info()
 
 SPELL_CLASSES = [
     "bard", "cleric", "druid", "paladin", "ranger",
     "sorcerer", "warlock", "wizard", "artificer"
 ]
 
-STATS = ["Strength", "Dexterity", "Constitution", "Intelligence", "Wisdom", "Charisma"]
-CHECKS = {
-    "Strength": ["Athletics"],
-    "Dexterity": ["Acrobatics", "Sleight of Hand", "Stealth"],
-    "Constitution": [],
-    "Intelligence": ["Arcana", "History", "Investigation", "Nature", "Religion"],
-    "Wisdom": ["Animal Handling", "Insight", "Medicine", "Perception", "Survival"],
-    "Charisma": ["Deception", "Intimidation", "Performance", "Persuasion"]
-}
-
-spell_point_costs = {
-    "Cantrip": 0,
-    "1st": 2,
-    "2nd": 3,
-    "3rd": 5,
-    "4th": 6,
-    "5th": 7,
-    "6th": 9,
-    "7th": 10,
-    "8th": 11,
-    "9th": 13,
-}
-
-ALL_METAMAGIC = {
-    "Careful Spell": ["Protect allies from your area spells.",
-                      "Protect chosen creatures from effects of your area spells, making them auto-succeed on saves and avoid half damage."],
-    "Distant Spell": ["Double spell range or extend touch.",
-                      "Spend 1 point to double range or cast touch spells from 30 feet."],
-    "Empowered Spell": ["Reroll damage dice.",
-                        "Spend 1 point to reroll a number of damage dice equal to your Charisma modifier."],
-    "Extended Spell": ["Double duration.",
-                       "Spend 1 point to double spell duration up to 24 hours."],
-    "Heightened Spell": ["Disadvantage on save.",
-                         "Spend 3 points to give a creature disadvantage on its first saving throw against your spell."],
-    "Quickened Spell": ["Cast as bonus action.",
-                        "Spend 2 points to change a spell's casting time from 1 action to 1 bonus action."],
-    "Seeking Spell": ["Reroll missed spell attack.",
-                      "Spend 2 points to reroll a missed spell attack roll."],
-    "Subtle Spell": ["No components.",
-                     "Spend 1 point to cast a spell without verbal or somatic components."],
-    "Transmuted Spell": ["Change damage type.",
-                         "Spend 1 point to change a spell's elemental damage type (acid, fire, etc.)."],
-    "Twinned Spell": ["Target a second creature.",
-                      "Spend Sorcery Points equal to the spell's level to target a second creature."]
-}
+MAX_ITEM_SUGGESTIONS = 50  # Suggestions shown in the Add Item window
+NO_METAMAGIC = "None"  # Metamagic choice in the cast dialog
 
 class CharacterUI:
-    def __init__(self, root):
+    def __init__(self, root, startup=None):
         self.root = root
+        startup = startup or perf.StartupProfile()
         self.csv_path = os.path.join(os.path.dirname(__file__), 'character_data.csv')
+        self.store = CharacterStore(self.csv_path)  # CSV snapshot + journal of edits
+        self.saver = WriteBehindSaver(self.store)   # writes snapshots off the UI thread
         root.title("D&D Character Spellbook & Sorcery Tracker")
+        root.protocol("WM_DELETE_WINDOW", self.on_close)
 
         # Track resources
         self.stat_vars = {stat: tk.IntVar(value=10) for stat in STATS}
@@ -85,11 +52,17 @@ class CharacterUI:
         self.spell_points = tk.IntVar(value=6)
         self.actions = tk.IntVar(value=2)
         self.sorcery_points = tk.IntVar(value=6)
+        self.resource_vars = {
+            "Level": self.level, "EXP": self.exp, "HP": self.hp, "Temp HP": self.temp_hp,
+            "AC": self.ac, "Speed": self.speed, "Spell Points": self.spell_points,
+            "Actions": self.actions, "Sorcery Points": self.sorcery_points,
+        }
         # D&D 5e XP thresholds (index = level, value = XP to reach that level)
         self.exp_thresholds = [0, 300, 900, 2700, 6500, 14000, 23000,
                             34000, 48000, 64000, 85000, 100000, 120000,
                             140000, 165000, 195000, 225000, 265000, 305000, 355000, float('inf')]
-        self.inventory_items = {}  # Track inventory items
+        self.spell_compendium = SpellCompendium()  # Loaded on first lookup
+        self.rules = get_rules_store()  # data.json, parsed on first use
         self.max_values = {
             "EXP": tk.IntVar(value=self.exp_thresholds[self.level.get()]),
             "HP": tk.IntVar(value=10),
@@ -99,20 +72,77 @@ class CharacterUI:
             "AC": tk.IntVar(value=12),
         }
 
-        # Spells are now loaded from CSV, starting with an empty dictionary
-        self.spells = {0: [], 1: [], 2: [], 3: [], 4: [], 5: []}
-        self.spell_notebook = ttk.Notebook(self.root)
-        self.main_spell_notebook = ttk.Notebook(self.root)
-        self.inventory_notebook = ttk.Notebook(self.root)
-        self.traits_and_feats = ttk.Notebook(self.root)
-        
+        # CSV key ("Strength", "HP", "Max HP" ...) -> the IntVar showing it
+        self.value_vars = dict(self.stat_vars)
+        self.value_vars.update(self.resource_vars)
+        self.value_vars.update({f"Max {key}": var for key, var in self.max_values.items()})
+        # Notebooks of the panels; each is created when its panel is first opened
+        self.spell_notebook = None
+        self.main_spell_notebook = None
+        self.inventory_notebook = None
+        startup.mark("variables")
+
         self.exp.trace_add("write", self.check_level_up)
         self.create_widgets()
+        startup.mark("main sheet widgets")
         self.load_from_csv()  # Load data from CSV when the app starts
-        
+        self.journal_value_changes()
+        self.track_checks()
+        startup.mark("character data")
+
+    def warm_up(self):
+        # Run once the window is up: load the spell compendium so spell
+        # buttons show the compendium's spelling and show_spell opens fast
+        if not self.spell_compendium.loaded:
+            self.spell_compendium.load()
+            self.update_spell_display(self.main_spell_notebook)
+
+    @property
+    def model(self):
+        # The CharacterModel behind the sheet; every edit goes through self.store
+        return self.store.model
+
+    def journal_value_changes(self):
+        # Every stat, resource and max value edit goes to the character journal
+        for key, var in self.value_vars.items():
+            var.trace_add("write", lambda *_, key=key, var=var: self.journal_value(key, var))
+
+    def journal_value(self, key, var):
+        try:
+            value = var.get()
+        except tk.TclError:
+            return  # Entry is mid-edit (empty or not a number)
+        self.store.set_value(key, value)
+
+    def track_checks(self):
+        # One CheckTable for the sheet; open windows listen for the lines that change
+        self.check_table = CheckTable(self.model)
+        self.check_listeners = []
+        for stat, var in self.stat_vars.items():
+            var.trace_add("write", lambda *_, stat=stat, var=var: self.check_value(var, self.check_table.set_score, stat))
+        self.level.trace_add("write", lambda *_: self.check_value(self.level, self.check_table.set_level))
+
+    def check_value(self, var, update, *args):
+        try:
+            value = var.get()
+        except tk.TclError:
+            return  # Entry is mid-edit
+        self.notify_checks(update(*args, value))
+
+    def notify_checks(self, changed):
+        if changed:
+            for listener in list(self.check_listeners):
+                listener(changed)
+
+    def listen_checks(self, widget, listener):
+        # Calls listener(changed keys) until the widget is destroyed
+        self.check_listeners.append(listener)
+        widget.bind("<Destroy>", lambda event: event.widget is widget and self.check_listeners.remove(listener),
+                    add="+")
+
     def check_level_up(self, *_):
         current_exp = self.exp.get()
-        current_level = self.level.get()
+        current_level = self.model.get_value("Level", 1)
         if current_exp >= self.exp_thresholds[current_level]:
             self.level.set(current_level + 1)
             self.exp.set(0)
@@ -122,73 +152,15 @@ class CharacterUI:
     def open_checks_window(self):
         win = tk.Toplevel(self.root)
         win.title("Ability Checks")
-        filename = "character_data.csv"
-        path = os.path.join(os.path.dirname(__file__), filename)
         search_var = tk.StringVar()
 
-        # Load proficient skills and saving throws from CSV
-        proficient_skills = set()
-        proficient_saves = set()
-        try:
-            with open(path, newline='') as csvfile:
-                reader = csv.reader(csvfile)
-                for row in reader:
-                    if row[0] == "Info" and row[1] == "Skills":
-                        proficient_skills = set(skill.strip().lower() for skill in row[2].split(","))
-                    elif row[0] == "Info" and row[1] == "Saving Throws":
-                        proficient_saves = set(stat.strip().lower() for stat in row[2].split(","))
-        except FileNotFoundError:
-            print("character_data.csv not found.")
-
-        proficiency_bonus = 2
+        # The sheet's bonuses; later edits update only the lines they change
+        table = self.check_table
         text_font = ("TkDefaultFont", 10)
         bold_font = ("TkDefaultFont", 10, "bold")
 
-        def update_check_list():
-            target = search_var.get().lower()
-
-            # Clear both columns
-            skill_text.config(state=tk.NORMAL)
-            skill_text.delete("1.0", tk.END)
-            save_text.config(state=tk.NORMAL)
-            save_text.delete("1.0", tk.END)
-
-            # Update saving throws
-            for stat in self.stat_vars:
-                base = (self.stat_vars[stat].get() - 10) // 2
-                is_proficient = stat.lower() in proficient_saves
-                bonus = base + (proficiency_bonus if is_proficient else 0)
-                line = f"{stat}: {bonus:+}\n"
-                tag = "bold" if is_proficient else "normal"
-                save_text.insert(tk.END, line, tag)
-
-            # Update skill checks
-            for stat, skills in CHECKS.items():
-                stat_match = target in stat.lower()
-                stat_bonus = (self.stat_vars[stat].get() - 10) // 2
-                matched_skills = []
-
-                for check in skills:
-                    if stat_match or target in check.lower():
-                        is_proficient = check.lower() in proficient_skills
-                        bonus = stat_bonus + (proficiency_bonus if is_proficient else 0)
-                        line = f"  {check}: {bonus:+}\n"
-                        tag = "bold" if is_proficient else "normal"
-                        matched_skills.append((line, tag))
-
-                if matched_skills:
-                    # Print stat header (not bold)
-                    skill_text.insert(tk.END, f"{stat}: {stat_bonus:+}\n", "normal")
-                    for line, tag in matched_skills:
-                        skill_text.insert(tk.END, line, tag)
-
-            skill_text.config(state=tk.DISABLED)
-            save_text.config(state=tk.DISABLED)
-
-
         # Search bar 
         ttk.Entry(win, textvariable=search_var, width=30).pack(padx=10, pady=5)
-        search_var.trace_add("write", lambda *args: update_check_list())
 
         # Two-column layout
         frame = ttk.Frame(win)
@@ -196,85 +168,117 @@ class CharacterUI:
 
         # Skill list (left)
         skill_text = tk.Text(frame, wrap="word", width=50)
-        skill_text.tag_configure("bold", font=bold_font)
-        skill_text.tag_configure("normal", font=text_font)
         skill_text.grid(row=0, column=0, sticky="nsew", padx=(0, 5))
 
         # Saving throw list (right)
         save_text = tk.Text(frame, wrap="word", width=25)
-        save_text.tag_configure("bold", font=bold_font)
-        save_text.tag_configure("normal", font=text_font)
         save_text.grid(row=0, column=1, sticky="nsew")
 
+        for widget in (skill_text, save_text):
+            widget.tag_configure("bold", font=bold_font)
+            widget.tag_configure("normal", font=text_font)
+
         frame.columnconfigure(0, weight=2)
         frame.columnconfigure(1, weight=1)
 
-        update_check_list()
+        # Each line is written once under its own tag ("save:Strength");
+        # a change rewrites that line and the search only hides lines
+        def line_widget(key):
+            return save_text if key[0] == "save" else skill_text
+
+        def line_text(key):
+            bonus, proficient = table.lines[key]
+            indent = "  " if key[0] == "skill" else ""
+            return f"{indent}{key[1]}: {bonus:+}\n", ("bold" if proficient else "normal")
+
+        def write_line(key):
+            widget, tag = line_widget(key), ":".join(key)
+            line, style = line_text(key)
+            if widget.tag_ranges(tag):
+                start = widget.index(f"{tag}.first")
+                widget.delete(start, f"{tag}.last")
+                widget.insert(start, line, (tag, style))
+            else:
+                widget.insert(tk.END, line, (tag, style))
+
+        for stat in STATS:
+            write_line(("save", stat))
+            # Abilities without skills get no header, as before
+            if ("stat", stat) in table.lines:
+                write_line(("stat", stat))
+                for skill in CHECKS[stat]:
+                    write_line(("skill", skill))
+        skill_text.config(state=tk.DISABLED)
+        save_text.config(state=tk.DISABLED)
+
+        hidden = set()  # tags of the lines the search hides
+
+        def filter_checks(*_):
+            target = search_var.get().lower()
+            for stat, skills in CHECKS.items():
+                stat_match = target in stat.lower()
+                shown = [skill for skill in skills if stat_match or target in skill.lower()]
+                for key, visible in [(("stat", stat), bool(shown))] + [(("skill", skill), skill in shown) for skill in skills]:
+                    tag = ":".join(key)
+                    if visible == (tag in hidden):
+                        skill_text.tag_configure(tag, elide=not visible)
+                        (hidden.discard if visible else hidden.add)(tag)
+
+        def redraw(changed):
+            skill_text.config(state=tk.NORMAL)
+            save_text.config(state=tk.NORMAL)
+            for key in changed:
+                if key[0] != "spell":
+                    write_line(key)
+            skill_text.config(state=tk.DISABLED)
+            save_text.config(state=tk.DISABLED)
+
+        search_var.trace_add("write", filter_checks)
+        self.listen_checks(win, redraw)
 
     
     
     def extract_damage(self, text):
-        # Define patterns to match damage formulas, prioritize xdy + z first
-        patterns = [
-            # Match "1d4 + 1" or similar: xdy + z
-            r"(\d+)d(\d+)\s*\+\s*(\d+)",  # Matches xdy + z
-            # Match "1d4" or similar: xdy
-            r"(\d+)d(\d+)",  # Matches xdy
-        ]
-        
-        # First, check for xdy + z (with a plus)
-        match = re.search(patterns[0], text.strip(), re.IGNORECASE)
-        if match:
-            # Extract the parts of the match
-            num_dice = int(match.group(1))
-            dice_type = int(match.group(2))
-            bonus = int(match.group(3))  # Capture the bonus if it exists
-            
-            # Calculate the damage range (min, max)
-            min_damage = num_dice + bonus
-            max_damage = num_dice * dice_type + bonus
-            
-            # Return the formatted damage string and the calculated potential damage range
-            damage_str = f"{num_dice}d{dice_type} + {bonus}"
-            damage_range = f"{min_damage} to {max_damage}"
-            return damage_str, damage_range
-        
-        # If no match for xdy + z, check for xdy (without a plus)
-        match = re.search(patterns[1], text.strip(), re.IGNORECASE)
-        if match:
-            # Extract the parts of the match
-            num_dice = int(match.group(1))
-            dice_type = int(match.group(2))
-            
-            # Calculate the damage range (min, max)
-            min_damage = num_dice
-            max_damage = num_dice * dice_type
-            
-            # Return the formatted damage string and the calculated potential damage range
-            damage_str = f"{num_dice}d{dice_type}"
-            damage_range = f"{min_damage} to {max_damage}"
-            return damage_str, damage_range
-        
-        # If no valid damage pattern is found, return None
-        return None, None
-
+        # The first damage clause of a text as ("1d4 + 1", "2 to 5"), or (None, None).
+        # Spells and monsters read their clauses from the precomputed tables instead.
+        clauses = parse_damage(text)
+        if not clauses:
+            return None, None
+        clause = clauses[0]
+        return clause.dice or str(clause.bonus), f"{clause.min} to {clause.max}"
+
+
+    def dice_engine(self):
+        # dice.py needs NumPy, imported on first use so startup doesn't pay for it
+        if not hasattr(self, "_dice"):
+            try:
+                import dice
+            except ImportError:
+                print("NumPy is not installed; damage charts are disabled.")
+                dice = None
+            self._dice = dice
+        return self._dice
+
+    def add_damage_chart(self, win, clauses):
+        # Expected damage and distribution of every distinct dice expression
+        dice = self.dice_engine()
+        expressions = []
+        if dice:
+            for clause in clauses:
+                expression = clause.expression()
+                if all(expression.text != seen.text for seen in expressions):
+                    expressions.append(expression)
+        if expressions:
+            DiceChart(win, expressions).pack(padx=10, pady=(0, 10), fill='x')
+        return expressions
+
+    @staticmethod
+    def damage_lines(clauses):
+        return "".join(f"\nDamage: {clause.describe()}, {clause.min} to {clause.max}, average {clause.mean:.1f}"
+                       for clause in clauses)
 
     def show_spell(self, spell_name, level):
-        directory = os.path.dirname(__file__)
-        class_files = [f for f in os.listdir(directory) if f.endswith('_Spells.csv')]
-        spell_data = None
-
-        # Fetch spell data from the CSV
-        for filename in class_files:
-            path = os.path.join(directory, filename)
-            with open(path, newline='', encoding='utf-8') as csvfile:
-                reader = csv.DictReader(csvfile)
-                for row in reader:
-                    if row["Name"].strip().lower() == spell_name.strip().lower():
-                        spell_data = row
-                        break
-            if spell_data:
-                break
+        spell_data = self.spell_compendium.get(spell_name)
 
         if not spell_data:
             full_text = f"Error: Spell '{spell_name}' not found in any spell files."
@@ -291,9 +295,9 @@ class CharacterUI:
             description = spell_data.get("Text", "No description available.")
             higher_levels = spell_data.get("At Higher Levels", "No additional effects at higher levels.")
 
-            # Extract damage info
-            damage_str, damage_range = self.extract_damage(description)
-            damage_text = f"\nDamage: {damage_str} ({damage_range})" if damage_str else ""
+            # Damage clauses were parsed once for every spell
+            clauses = self.spell_compendium.damage.get(spell_data["Name"])
+            damage_text = self.damage_lines(clauses)
 
             header = f"{source}\nLevel: {spell_level}\nCasting Time: {casting_time}\nDuration: {duration}\n"
             header += f"School: {school}\nRange: {range_}\nComponents: {components}\n"
@@ -309,14 +313,20 @@ class CharacterUI:
         text.config(state=tk.DISABLED)
         text.pack(padx=10, pady=10)
 
-        # Spell level options (Cantrip through 9th)
-        spell_level_options = ["Cantrip", "1st", "2nd", "3rd", "4th", "5th", "6th", "7th", "8th", "9th"]
+        if not spell_data:
+            return
+
+        self.add_damage_chart(win, clauses)
 
-        # Ensure the level provided is valid
-        current_level_index = spell_level_options.index(spell_level)  # Get the index of the current spell level
+        # Ensure the level provided is valid; a blank or homebrew level gets no
+        # slot choice, as the compendium gives it no upcast rows
+        current_level_index = level_to_int(spell_level)
+        if current_level_index >= len(SPELL_LEVELS):
+            return
+        spell_level = SPELL_LEVELS[current_level_index]
 
         # Filter valid levels based on the spell's current level
-        valid_levels = spell_level_options[current_level_index:]  # Valid levels should be the current level and higher levels
+        valid_levels = SPELL_LEVELS[current_level_index:]  # Valid levels should be the current level and higher levels
 
         level_var = tk.StringVar(value=spell_level)  # Default to current spell level (or modify if needed)
 
@@ -327,17 +337,70 @@ class CharacterUI:
         level_menu = tk.OptionMenu(win, level_var, *valid_levels)
         level_menu.pack(padx=10, pady=5)
 
+        # Damage at the chosen slot level (cantrips: at the character's level),
+        # read from the spell's precomputed upcast table
+        upcast = self.spell_compendium.upcast(spell_name)
+        if upcast:
+            upcast_label = ttk.Label(win, justify=tk.LEFT)
+            upcast_label.pack(padx=10, pady=5)
+
+            def show_upcast_damage(*_):
+                if upcast.cantrip:
+                    level = self.model.get_value("Level", 1)
+                    at = f"at character level {level}"
+                else:
+                    level = SPELL_LEVELS.index(level_var.get())
+                    at = f"with a {level_var.get()} level slot"
+                upcast_label.config(text="\n".join(f"Damage {at}: {clause.describe()}, average {clause.mean:.1f}"
+                                                   for clause in upcast.at(level)))
+
+            level_var.trace_add("write", show_upcast_damage)
+            show_upcast_damage()
+
+        # Metamagic at the chosen slot level, read from the table built for
+        # the sheet's stats and known spells (rebuilt only when those change)
+        metamagic_var = tk.StringVar(value=NO_METAMAGIC)
+        effects = {}  # metamagic name -> MetamagicEffect at the chosen level
+        if metamagic_table(self.model, self.spell_compendium).effects.get(spell_data["Name"]):
+            metamagic_frame = ttk.Frame(win)
+            metamagic_frame.pack(padx=10, pady=5)
+            ttk.Label(metamagic_frame, text="Metamagic:").pack(side='left', padx=(0, 5))
+            metamagic_menu = ttk.Combobox(metamagic_frame, textvariable=metamagic_var, state="readonly", width=20)
+            metamagic_menu.pack(side='left')
+            metamagic_label = ttk.Label(win, justify=tk.LEFT)
+            metamagic_label.pack(padx=10, pady=(0, 5))
+
+            def show_metamagic(*_):
+                table = metamagic_table(self.model, self.spell_compendium)
+                effects.clear()
+                effects.update(table.get(spell_data["Name"], SPELL_LEVELS.index(level_var.get())))
+                metamagic_menu.config(values=[NO_METAMAGIC, *effects])
+                if metamagic_var.get() not in effects and metamagic_var.get() != NO_METAMAGIC:
+                    metamagic_var.set(NO_METAMAGIC)
+                effect = effects.get(metamagic_var.get())
+                metamagic_label.config(text=effect.describe() if effect else "")
+
+            level_var.trace_add("write", show_metamagic)
+            metamagic_var.trace_add("write", show_metamagic)
+            show_metamagic()
+
         # Function to handle spell casting
         def cast_spell():
             selected_level = level_var.get()  # Retrieve the selected level as a string (e.g., '1st')
-            spell_point_cost = spell_point_costs[selected_level]  # Get the cost from spell_point_costs using the selected level
+            spell_point_cost = SPELL_POINT_COSTS[selected_level]  # Get the cost from SPELL_POINT_COSTS using the selected level
             current_points = self.spell_points.get()  # Get the current spell points
-            
-            if current_points >= spell_point_cost:  # Check if enough points are available
+            effect = effects.get(metamagic_var.get())
+            sorcery_cost = effect.cost if effect else 0
+
+            if current_points < spell_point_cost:
+                print(f"Not enough spell points to cast {spell_name} at level {selected_level}!")
+            elif self.sorcery_points.get() < sorcery_cost:
+                print(f"Not enough sorcery points for {effect.metamagic}!")
+            else:
                 self.spell_points.set(current_points - spell_point_cost)  # Subtract the points
+                if sorcery_cost:
+                    self.sorcery_points.set(self.sorcery_points.get() - sorcery_cost)
                 print(f"Spell cast at level {selected_level}. Remaining spell points: {self.spell_points.get()}")
-            else:
-                print(f"Not enough spell points to cast {spell_name} at level {selected_level}!")
 
         # Always show the "Use Spell" button
         ttk.Button(win, text="Use Spell", command=cast_spell).pack(pady=5)
@@ -369,18 +432,50 @@ class CharacterUI:
         # Add a button to close the window
         ttk.Button(metamagic_window, text="Close", command=metamagic_window.destroy).pack(pady=10)
 
+    def open_casting_planner(self):
+        # Plans the spell point and sorcery point spending for the known spells
+        import spell_planner
+        win = tk.Toplevel(self.root)
+        win.title("Casting Planner")
+
+        form = ttk.Frame(win)
+        form.pack(fill='x', padx=10, pady=10)
+        objective = tk.StringVar(value="damage")
+        turns = tk.StringVar()  # empty: no limit
+        ttk.Label(form, text="Most").grid(row=0, column=0, sticky="w", padx=(0, 5))
+        ttk.Combobox(form, textvariable=objective, state="readonly", width=8,
+                     values=spell_planner.OBJECTIVES).grid(row=0, column=1, sticky="w", padx=(0, 15))
+        ttk.Label(form, text="Turns").grid(row=0, column=2, sticky="w", padx=(0, 5))
+        ttk.Spinbox(form, from_=1, to=100, textvariable=turns, width=5).grid(row=0, column=3, sticky="w")
+
+        summary_label = ttk.Label(win)
+        summary_label.pack(anchor="w", padx=10)
+        results = tk.Listbox(win, width=60, height=20)
+        results.pack(fill='both', expand=True, padx=10, pady=10)
+
+        def plan():
+            try:
+                turn_limit = int(turns.get()) if turns.get().strip() else None
+            except ValueError:
+                return
+            options = spell_planner.cast_options(self.model, self.spell_compendium)
+            result = spell_planner.plan_casting(options, self.spell_points.get(), self.sorcery_points.get(),
+                                                objective.get(), turn_limit)
+            summary_label.config(text=f"{len(result['casts'])} casts, {result['expected_damage']:.1f} expected damage; "
+                                      f"{result['spell_points_left']} spell points and "
+                                      f"{result['sorcery_points_left']} sorcery points left")
+            results.delete(0, tk.END)
+            for spell, level, paid_with in result["casts"]:
+                results.insert(tk.END, f"{spell} ({SPELL_LEVELS[level]}, {paid_with}): "
+                                       f"{options[level].expected:.1f} damage")
+
+        ttk.Button(form, text="Plan", command=plan).grid(row=0, column=4, padx=(15, 0))
+        plan()
+
     def load_spells_from_csv(self):
         spells_by_level = defaultdict(list)
-        try:
-            with open(self.csv_path, newline='', encoding='utf-8') as csvfile:
-                reader = csv.reader(csvfile)
-                for row in reader:
-                    if len(row) >= 2 and row[0].isdigit():
-                        level = int(row[0].strip())
-                        spell = row[1].strip()
-                        spells_by_level[level].append(spell)
-        except FileNotFoundError:
-            print("CSV file not found.")
+        for level, spells in self.model.spells.items():
+            spells_by_level[level] = sorted(spells, key=str.lower)
         return spells_by_level
 
     def create_widgets(self):
@@ -418,6 +513,7 @@ class CharacterUI:
         ttk.Button(info_frame, text="Reset Sorcery Points", command=lambda: self.sorcery_points.set(self.max_values["Sorcery Points"].get()), width=24).grid(row=6, column=4, columnspan=2)
         ttk.Button(info_frame, text="Reset Spell Points", command=lambda: self.spell_points.set(self.max_values["Spell Points"].get()), width=24).grid(row=7, column=4, columnspan=2)
         ttk.Button(info_frame, text="Metamagic Options", command=self.open_metamagic_window).grid(row=8, column=4, columnspan=2)
+        ttk.Button(info_frame, text="Plan Casting", command=self.open_casting_planner).grid(row=9, column=4, columnspan=2)
         ttk.Label(info_frame, text="Level:").grid(row=0, column=2, sticky="e")
         ttk.Label(info_frame, textvariable=self.level).grid(row=0, column=3, sticky="w")
 
@@ -447,8 +543,6 @@ class CharacterUI:
         spells_frame.columnconfigure(0, weight=1)
         spells_frame.columnconfigure(1, weight=1)
 
-        self.update_spell_display(self.main_spell_notebook)
-
         # Inventory Frame (Right side - column 1)
         extras_frame = ttk.LabelFrame(self.root, text="Extras")
         extras_frame.grid(row=0, column=2, rowspan=6, sticky="nsew", padx=10, pady=5)  # Occupies row 0, 1, 2
@@ -468,6 +562,46 @@ class CharacterUI:
         extras_frame.rowconfigure(5, weight=1)  # Add a spacer row to push buttons to the bottom
         ttk.Button(extras_frame, text="Save CSV", command=self.save_to_csv).grid(row=6, column=0, padx=2, sticky="ew")
         ttk.Button(extras_frame, text="Load CSV", command=self.load_from_csv).grid(row=6, column=1, padx=2, sticky="ew")
+        if perf.ENABLED:
+            ttk.Button(extras_frame, text="Performance", command=self.open_performance_window).grid(row=7, column=0, columnspan=2, sticky="ew")
+
+    def open_performance_window(self):
+        # Latency of every Tk callback and file operation (DND_PERF=1 or --perf)
+        win = tk.Toplevel(self.root)
+        win.title("Performance")
+
+        columns = ("Handler", "Calls", "p50 ms", "p95 ms", "Max ms", "Total ms")
+        tree = ttk.Treeview(win, columns=columns, show='headings', height=20)
+        for col in columns:
+            tree.heading(col, text=col)
+            tree.column(col, anchor="w" if col == "Handler" else "e", width=380 if col == "Handler" else 70)
+        scrollbar = ttk.Scrollbar(win, orient='vertical', command=tree.yview)
+        tree.configure(yscrollcommand=scrollbar.set)
+
+        @perf.untimed
+        def refresh():
+            if not win.winfo_exists():
+                return
+            tree.delete(*tree.get_children())
+            for name, stats in perf.snapshot().items():
+                tree.insert("", "end", values=(name, stats["count"], f"{stats['p50_ms']:.2f}", f"{stats['p95_ms']:.2f}",
+                                               f"{stats['max_ms']:.2f}", f"{stats['total_ms']:.1f}"))
+            win.after(1000, refresh)
+
+        def dump():
+            from tkinter import filedialog
+            path = filedialog.asksaveasfilename(parent=win, defaultextension=".json", initialfile="perf.json",
+                                                filetypes=[("JSON", "*.json")])
+            if path:
+                perf.dump(path)
+
+        button_frame = ttk.Frame(win)
+        button_frame.pack(fill='x', padx=5, pady=5)
+        ttk.Button(button_frame, text="Reset", command=perf.reset).pack(side='left')
+        ttk.Button(button_frame, text="Dump to File", command=dump).pack(side='left', padx=5)
+        scrollbar.pack(side='right', fill='y')
+        tree.pack(side='left', fill='both', expand=True)
+        refresh()
     
     def edit_character_info(self):
         edit_win = tk.Toplevel(self.root)
@@ -491,20 +625,20 @@ class CharacterUI:
         # Create entry widgets
         for i, field in enumerate(fields):
             ttk.Label(form_frame, text=field + ":").grid(row=i, column=0, sticky="e", pady=2)
-            var = tk.StringVar(value=self.character_info_data.get(field, ""))
+            var = tk.StringVar(value=self.model.info.get(field, ""))
             entry = ttk.Entry(form_frame, textvariable=var, width=50)
             entry.grid(row=i, column=1, sticky="w", pady=2)
             self.char_info_vars[field] = var
 
         # Save Button
         def save_edited_info():
-            # Update internal data
-            self.character_info_data.clear()
+            # Journal the changed fields
             for field, var in self.char_info_vars.items():
-                self.character_info_data[field] = var.get()
-
-            # Now save to CSV
-            self.save_to_csv()
+                self.store.set_info(field, var.get())
+            table = self.check_table
+            self.notify_checks(
+                table.set_proficiencies(self.model.info_set("Saving Throws"), self.model.info_set("Skills"))
+                + table.set_spellcasting_ability(self.model.spellcasting_ability()))
             edit_win.destroy()
             messagebox.showinfo("Saved", "Character info saved successfully.")
 
@@ -533,7 +667,7 @@ class CharacterUI:
 
 
         # Organize keys into categories
-        raw_info = self.character_info_data
+        raw_info = self.model.info
         sections = {
             "Race & Class": {
                 "Race": raw_info.get("Race", ""),
@@ -607,32 +741,28 @@ class CharacterUI:
                 spellcasting_frame = tk.Frame(text_frame)
                 spellcasting_frame.pack(fill="both", expand=True, padx=10, pady=10)
 
-                ability = content.get("Spellcasting Ability", "")
-                prof_bonus = 2
-
-                ability_score = self.stat_vars.get(ability, tk.StringVar(value="10")).get()
-                try:
-                    ability_score = int(ability_score)
-                except ValueError:
-                    ability_score = 10  # Default if invalid
-
-                ability_mod = (ability_score - 10) // 2
-
-                spell_save_dc = 8 + prof_bonus + ability_mod
-                spell_attack_bonus = prof_bonus + ability_mod
-
-                # Display calculated values
-                labels = [
-                    ("Spellcasting Ability", ability),
-                    ("Spell Save DC", str(spell_save_dc)),
-                    ("Spell Attack Bonus", f"+{spell_attack_bonus}")
-                ]
+                # Save DC and attack bonus follow the level and stats through the sheet's CheckTable
+                def spell_value(label):
+                    if label == "Spellcasting Ability":
+                        return self.model.spellcasting_ability()
+                    bonus = self.check_table.lines[("spell", label)][0]
+                    return str(bonus) if label == "Spell Save DC" else f"{bonus:+}"
 
-                for label, value in labels:
+                value_labels = {}
+                for label in ("Spellcasting Ability", "Spell Save DC", "Spell Attack Bonus"):
                     lbl = tk.Label(spellcasting_frame, text=f"{label}:", font=("Consolas", 12, 'bold'), anchor="w")
                     lbl.pack(anchor="w", pady=(5, 0))
-                    val_lbl = tk.Label(spellcasting_frame, text=value, font=("Consolas", 11), anchor="w")
+                    val_lbl = tk.Label(spellcasting_frame, text=spell_value(label), font=("Consolas", 11), anchor="w")
                     val_lbl.pack(anchor="w", pady=(0, 5))
+                    value_labels[label] = val_lbl
+
+                def update_spellcasting(changed):
+                    for kind, label in changed:
+                        if kind == "spell":
+                            value_labels[label].config(text=spell_value(label))
+                    value_labels["Spellcasting Ability"].config(text=spell_value("Spellcasting Ability"))
+
+                self.listen_checks(spellcasting_frame, update_spellcasting)
 
             
             elif section == "Features & Traits":
@@ -662,17 +792,8 @@ class CharacterUI:
                 scrollable_frame.bind("<Configure>", on_frame_configure)
 
                 # === Load and display race traits ===
-                race_name = self.character_info_data.get("Race", "")
-
-                path = os.path.join(os.path.dirname(__file__), 'data.json')
-                with open(path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-
-                selected_race = None
-                for race in data.get("race", []):
-                    if race_name.lower() in race.get("name", "").lower():
-                        selected_race = race
-                        break
+                race_name = self.model.info.get("Race", "")
+                selected_race = self.rules.get("race", race_name)
 
                 if selected_race and "trait" in selected_race:
                     title_label = tk.Label(scrollable_frame, text=f"Traits of {selected_race['name']}:", font=("Consolas", 12, "bold"))
@@ -693,32 +814,31 @@ class CharacterUI:
                     no_traits_label.pack(anchor="w", padx=10, pady=10)
                 
                 # === Load and display background traits ===
-                background_name = self.character_info_data.get("Background", "")
+                background_name = self.model.info.get("Background", "")
 
                 if background_name:
-                    for bg in data.get("background", []):
-                        if background_name.lower() in bg.get("name", "").lower():
-                            if "trait" in bg:
-                                # Add horizontal separator line
-                                separator = ttk.Separator(scrollable_frame, orient='horizontal')
-                                separator.pack(fill='x', padx=10, pady=15)
+                    for bg in self.rules.find_all("background", background_name):
+                        if "trait" in bg:
+                            # Add horizontal separator line
+                            separator = ttk.Separator(scrollable_frame, orient='horizontal')
+                            separator.pack(fill='x', padx=10, pady=15)
 
-                                bg_title = tk.Label(scrollable_frame, text=f"Traits from {bg['name']}:", font=("Consolas", 12, "bold"))
-                                bg_title.pack(anchor="w", pady=(10, 5), padx=10)
+                            bg_title = tk.Label(scrollable_frame, text=f"Traits from {bg['name']}:", font=("Consolas", 12, "bold"))
+                            bg_title.pack(anchor="w", pady=(10, 5), padx=10)
 
-                                for trait in bg["trait"]:
-                                    name = trait.get("name", "Unnamed Trait")
-                                    text = trait.get("text", "")
+                            for trait in bg["trait"]:
+                                name = trait.get("name", "Unnamed Trait")
+                                text = trait.get("text", "")
 
-                                    name_label = tk.Label(scrollable_frame, text=name, font=("Consolas", 11, "bold"), wraplength=300, justify="left")
-                                    name_label.pack(anchor="w", padx=10, pady=(10, 0))
+                                name_label = tk.Label(scrollable_frame, text=name, font=("Consolas", 11, "bold"), wraplength=300, justify="left")
+                                name_label.pack(anchor="w", padx=10, pady=(10, 0))
 
-                                    text_label = tk.Label(scrollable_frame, text=text, font=("Consolas", 10), wraplength=300, justify="left")
-                                    text_label.pack(anchor="w", padx=(20, 10), pady=(0, 5))
+                                text_label = tk.Label(scrollable_frame, text=text, font=("Consolas", 10), wraplength=300, justify="left")
+                                text_label.pack(anchor="w", padx=(20, 10), pady=(0, 5))
                 # === Load and display class features up to current level ===
                 exclude_words = ["Sorcerous", "Dragon", "Storm:", "Draconic", "Wild Magic","Shadow","Favored Soul","Phoenix Sorcery","Sea Sorcery","Stone Sorcery"]  # Add any other words you want to exclude
-                class_name = self.character_info_data.get("Class", "")
-                level = self.level.get()
+                class_name = self.model.info.get("Class", "")
+                level = self.model.get_value("Level", 1)
 
                 if isinstance(level, str):
                     try:
@@ -727,58 +847,57 @@ class CharacterUI:
                         level = 1  # default if invalid
 
                 if class_name:
-                    for cls in data.get("class", []):
-                        if class_name.lower() in cls.get("name", "").lower():
-                            # Add horizontal separator line before class features
-                            separator = ttk.Separator(scrollable_frame, orient='horizontal')
-                            separator.pack(fill='x', padx=10, pady=15)
-
-                            cls_title = tk.Label(scrollable_frame, text=f"Class Features (up to level {level})\n - {cls['name']}:", font=("Consolas", 12, "bold"))
-                            cls_title.pack(anchor="w", pady=(10, 5), padx=10)
-
-                            features_by_level = {}
-
-                            for entry in cls.get("autolevel", []):
-                                try:
-                                    entry_level = int(entry.get("level", 0))
-                                except ValueError:
-                                    continue
-
-                                if entry_level <= level:
-                                    for feature in entry.get("feature", []):
-                                        feature_name = feature.get("name", "Unnamed Feature")
-                                        feature_texts = feature.get("text", [])
+                    for cls in self.rules.find_all("class", class_name):
+                        # Add horizontal separator line before class features
+                        separator = ttk.Separator(scrollable_frame, orient='horizontal')
+                        separator.pack(fill='x', padx=10, pady=15)
+
+                        cls_title = tk.Label(scrollable_frame, text=f"Class Features (up to level {level})\n - {cls['name']}:", font=("Consolas", 12, "bold"))
+                        cls_title.pack(anchor="w", pady=(10, 5), padx=10)
+
+                        features_by_level = {}
+
+                        for entry in cls.get("autolevel", []):
+                            try:
+                                entry_level = int(entry.get("level", 0))
+                            except ValueError:
+                                continue
+
+                            if entry_level <= level:
+                                for feature in entry.get("feature", []):
+                                    feature_name = feature.get("name", "Unnamed Feature")
+                                    feature_texts = feature.get("text", [])
                                         
-                                        # Check if the feature name contains any excluded words
-                                        if any(exclude_word.lower() in feature_name.lower() for exclude_word in exclude_words):
-                                            continue  # Skip this feature if it matches any exclusion word
+                                    # Check if the feature name contains any excluded words
+                                    if any(exclude_word.lower() in feature_name.lower() for exclude_word in exclude_words):
+                                        continue  # Skip this feature if it matches any exclusion word
 
-                                        # Group features by level
-                                        if entry_level not in features_by_level:
-                                            features_by_level[entry_level] = []
+                                    # Group features by level
+                                    if entry_level not in features_by_level:
+                                        features_by_level[entry_level] = []
 
-                                        features_by_level[entry_level].append({
-                                            "name": feature_name,
-                                            "text": feature_texts
-                                        })
+                                    features_by_level[entry_level].append({
+                                        "name": feature_name,
+                                        "text": feature_texts
+                                    })
 
-                            # Now display features, grouped by level
-                            for lvl in sorted(features_by_level.keys()):
-                                level_label = tk.Label(scrollable_frame, text=f"Level {lvl} Features:", font=("Consolas", 12, "bold"))
-                                level_label.pack(anchor="w", pady=(10, 5), padx=10)
+                        # Now display features, grouped by level
+                        for lvl in sorted(features_by_level.keys()):
+                            level_label = tk.Label(scrollable_frame, text=f"Level {lvl} Features:", font=("Consolas", 12, "bold"))
+                            level_label.pack(anchor="w", pady=(10, 5), padx=10)
 
-                                for feature in features_by_level[lvl]:
-                                    name_label = tk.Label(scrollable_frame, text=feature["name"], font=("Consolas", 11, "bold"), wraplength=300, justify="left")
-                                    name_label.pack(anchor="w", padx=10, pady=(10, 0))
+                            for feature in features_by_level[lvl]:
+                                name_label = tk.Label(scrollable_frame, text=feature["name"], font=("Consolas", 11, "bold"), wraplength=300, justify="left")
+                                name_label.pack(anchor="w", padx=10, pady=(10, 0))
 
-                                    # If text is a list, join with newlines
-                                    if isinstance(feature["text"], list):
-                                        feature_text = "\n".join(feature["text"])
-                                    else:
-                                        feature_text = str(feature["text"])
+                                # If text is a list, join with newlines
+                                if isinstance(feature["text"], list):
+                                    feature_text = "\n".join(feature["text"])
+                                else:
+                                    feature_text = str(feature["text"])
 
-                                    text_label = tk.Label(scrollable_frame, text=feature_text, font=("Consolas", 10), wraplength=300, justify="left")
-                                    text_label.pack(anchor="w", padx=(20, 10), pady=(0, 5))
+                                text_label = tk.Label(scrollable_frame, text=feature_text, font=("Consolas", 10), wraplength=300, justify="left")
+                                text_label.pack(anchor="w", padx=(20, 10), pady=(0, 5))
 
             else:
                 # For other sections, print them in the same old way
@@ -806,20 +925,7 @@ class CharacterUI:
         listbox.event_generate("<<ListboxSelect>>")
     
     def open_single_background_window(self, background_name):
-        # Load JSON data
-        path = os.path.join(os.path.dirname(__file__), 'data.json')
-        with open(path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-
-        background_data = data.get("background", [])  # Assuming backgrounds are stored under the "background" key
-        background_name_lower = background_name.lower()
-
-        # Try to find the background in the list
-        selected_background = None
-        for background in background_data:
-            if background_name_lower in background.get("name", "").lower():
-                selected_background = background
-                break
+        selected_background = self.rules.get("background", background_name)
 
         if not selected_background:
             messagebox.showinfo("Background Not Found", f"No background info found for '{background_name}'")
@@ -837,71 +943,10 @@ class CharacterUI:
         scrollbar.pack(side='right', fill='y')
         text_widget.configure(yscrollcommand=scrollbar.set, state='normal')
 
-        def print_json_to_text(widget, obj, indent=0, in_text_block=False):
-            spacing = '    ' * indent
-            bullet = "•"
-
-            if isinstance(obj, dict):
-                keys = list(obj.keys())
-                i = 0
-                while i < len(keys):
-                    key = keys[i]
-                    value = obj[key]
-
-                    # Special case: "Name" followed by "Text"
-                    if key.lower() == "name" and i + 1 < len(keys) and keys[i + 1].lower() == "text":
-                        name_value = value
-                        text_value = obj[keys[i + 1]]
-                        widget.insert('end', f"\n{name_value}\n", 'bold')
-                        if isinstance(text_value, str):
-                            widget.insert('end', f"{text_value.strip()}\n\n")
-                        else:
-                            print_json_to_text(widget, text_value, indent + 1, in_text_block=True)
-                        i += 2
-                        continue
-
-                    if key.lower() in ["name", "text"]:
-                        i += 1
-                        continue
-
-                    display_key = key.replace('_', ' ').capitalize()
-                    widget.insert('end', f"{display_key}:\n", 'bold')
-                    print_json_to_text(widget, value, indent + 1, in_text_block)
-                    i += 1
-
-                if indent == 1:
-                    widget.insert('end', '\n')
-
-            elif isinstance(obj, list):
-                for item in obj:
-                    if isinstance(item, (dict, list)):
-                        print_json_to_text(widget, item, indent, in_text_block)
-                    else:
-                        widget.insert('end', f"{item}\n")
-                widget.insert('end', '\n')
-
-            else:
-                widget.insert('end', f"{obj}\n")
-
-        # Call the function to print the selected background data to the text widget
-        print_json_to_text(text_widget, selected_background)
-        text_widget.config(state='disabled')
+        show_rendered_text(text_widget, self.rules.rendered(selected_background))
 
     def open_single_class_window(self, class_name):
-        # Load JSON data
-        path = os.path.join(os.path.dirname(__file__), 'data.json')
-        with open(path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-
-        class_data = data.get("class", [])
-        class_name_lower = class_name.lower()
-
-        # Try to find the class in the list
-        selected_class = None
-        for cls in class_data:
-            if class_name_lower in cls.get("name", "").lower():
-                selected_class = cls
-                break
+        selected_class = self.rules.get("class", class_name)
 
         if not selected_class:
             messagebox.showinfo("Class Not Found", f"No class info found for '{class_name}'")
@@ -919,70 +964,10 @@ class CharacterUI:
         scrollbar.pack(side='right', fill='y')
         text_widget.configure(yscrollcommand=scrollbar.set, state='normal')
 
-        def print_json_to_text(widget, obj, indent=0, in_text_block=False):
-            spacing = '    ' * indent
-            bullet = "•"
-
-            if isinstance(obj, dict):
-                keys = list(obj.keys())
-                i = 0
-                while i < len(keys):
-                    key = keys[i]
-                    value = obj[key]
-
-                    # Special case: "Name" followed by "Text"
-                    if key.lower() == "name" and i + 1 < len(keys) and keys[i + 1].lower() == "text":
-                        name_value = value
-                        text_value = obj[keys[i + 1]]
-                        widget.insert('end', f"\n{name_value}\n", 'bold')
-                        if isinstance(text_value, str):
-                            widget.insert('end', f"{text_value.strip()}\n\n")
-                        else:
-                            print_json_to_text(widget, text_value, indent + 1, in_text_block=True)
-                        i += 2
-                        continue
-
-                    if key.lower() in ["name", "text"]:
-                        i += 1
-                        continue
-
-                    display_key = key.replace('_', ' ').capitalize()
-                    widget.insert('end', f"{display_key}:\n", 'bold')
-                    print_json_to_text(widget, value, indent + 1, in_text_block)
-                    i += 1
-
-                if indent == 1:
-                    widget.insert('end', '\n')
-
-            elif isinstance(obj, list):
-                for item in obj:
-                    if isinstance(item, (dict, list)):
-                        print_json_to_text(widget, item, indent, in_text_block)
-                    else:
-                        widget.insert('end', f"{item}\n")
-                widget.insert('end', '\n')
-
-            else:
-                widget.insert('end', f"{obj}\n")
-
-        print_json_to_text(text_widget, selected_class)
-        text_widget.config(state='disabled')
+        show_rendered_text(text_widget, self.rules.rendered(selected_class))
 
     def open_single_race_window(self, race_name):
-        # Load JSON data
-        path = os.path.join(os.path.dirname(__file__), 'data.json')
-        with open(path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-
-        race_data = data.get("race", [])  # Assuming races are stored under the "race" key
-        race_name_lower = race_name.lower()
-
-        # Try to find the race in the list
-        selected_race = None
-        for race in race_data:
-            if race_name_lower in race.get("name", "").lower():
-                selected_race = race
-                break
+        selected_race = self.rules.get("race", race_name)
 
         if not selected_race:
             messagebox.showinfo("Race Not Found", f"No race info found for '{race_name}'")
@@ -1000,116 +985,55 @@ class CharacterUI:
         scrollbar.pack(side='right', fill='y')
         text_widget.configure(yscrollcommand=scrollbar.set, state='normal')
 
-        def print_json_to_text(widget, obj, indent=0, in_text_block=False):
-            spacing = '    ' * indent
-            bullet = "•"
-
-            if isinstance(obj, dict):
-                keys = list(obj.keys())
-                i = 0
-                while i < len(keys):
-                    key = keys[i]
-                    value = obj[key]
-
-                    # Special case: "Name" followed by "Text"
-                    if key.lower() == "name" and i + 1 < len(keys) and keys[i + 1].lower() == "text":
-                        name_value = value
-                        text_value = obj[keys[i + 1]]
-                        widget.insert('end', f"\n{name_value}\n", 'bold')
-                        if isinstance(text_value, str):
-                            widget.insert('end', f"{text_value.strip()}\n\n")
-                        else:
-                            print_json_to_text(widget, text_value, indent + 1, in_text_block=True)
-                        i += 2
-                        continue
-
-                    if key.lower() in ["name", "text"]:
-                        i += 1
-                        continue
-
-                    display_key = key.replace('_', ' ').capitalize()
-                    widget.insert('end', f"{display_key}:\n", 'bold')
-                    print_json_to_text(widget, value, indent + 1, in_text_block)
-                    i += 1
-
-                if indent == 1:
-                    widget.insert('end', '\n')
-
-            elif isinstance(obj, list):
-                for item in obj:
-                    if isinstance(item, (dict, list)):
-                        print_json_to_text(widget, item, indent, in_text_block)
-                    else:
-                        widget.insert('end', f"{item}\n")
-                widget.insert('end', '\n')
-
-            else:
-                widget.insert('end', f"{obj}\n")
-
-        # Call the function to print the selected race data to the text widget
-        print_json_to_text(text_widget, selected_race)
-        text_widget.config(state='disabled')
+        show_rendered_text(text_widget, self.rules.rendered(selected_race))
 
     
+    def refresh_inventory(self):
+        # Only update the inventory table when its panel is open
+        if self.inventory_notebook is not None and self.inventory_notebook.winfo_exists():
+            self.update_inventory_display(self.inventory_notebook)
+
     def update_inventory_display(self, notebook):
         """Update the inventory display table."""
-        for widget in notebook.winfo_children():
-            widget.destroy()
-
-        inventory_frame = tk.Frame(notebook)
-        inventory_frame.pack(fill='both', expand=True)
-
-        # Table headers
-        headers = ["Item", "Quantity", "Equipped"]
-        for col_num, header in enumerate(headers):
-            header_label = tk.Label(inventory_frame, text=header, font=("Arial", 10, "bold"))
-            header_label.grid(row=0, column=col_num, sticky="w", padx=10, pady=5)
-
-        for idx, (item, data) in enumerate(self.inventory_items.items()):
-            item_label = tk.Label(inventory_frame, text=item, fg="blue", cursor="hand2")
-            item_label.grid(row=idx+1, column=0, padx=10, pady=5, sticky="w")
-            item_label.bind("<Button-1>", lambda e, item_name=item: self.show_inventory_item_info(item_name))
-
-            qty_label = tk.Label(inventory_frame, text=str(data["quantity"]))
-            qty_label.grid(row=idx+1, column=1, padx=10, pady=5)
-
-            # Determine if it's an armor item
-            is_armor = "armor" in item.lower()
-
-            if is_armor:
-                equip_var = tk.BooleanVar(value=data["equipped"])
-
-                def toggle_equipped(item_name=item, var=equip_var):
-                    self.inventory_items[item_name]["equipped"] = var.get()
-                    armor_AC = self.extract_armor_ac(item_name)["base_ac"]
-                    print(f"Armor AC for {item_name}: {armor_AC}")
-                    AC = armor_AC
-                    if self.extract_armor_ac(item_name)["adds_dex"]:
-                        AC += (self.stat_vars["Dexterity"].get() - 10) // 2
-                    self.ac.set(AC if var.get() else self.max_values["AC"].get())
-
-                equip_check = ttk.Checkbutton(inventory_frame, variable=equip_var, command=toggle_equipped)
-                equip_check.grid(row=idx+1, column=2, padx=10, pady=5)
-            else:
-                equipped_label = tk.Label(inventory_frame, text="Yes" if data["equipped"] else "No")
-                equipped_label.grid(row=idx+1, column=2, padx=10, pady=5)
-
-        notebook.add(inventory_frame, text="Inventory")
-
-    def extract_armor_ac(self, item_name: str):
+        # Keyed by item name: only added, removed and changed rows touch widgets
+        armor = self.get_armor_table()
+        rows = [(item, (item, str(data["quantity"]),
+                        # Armor and shields that count towards AC get a checkbox, everything else a Yes/No label
+                        bool(data["equipped"]) if item in armor else ("Yes" if data["equipped"] else "No")))
+                for item, data in self.model.inventory.items()]
+        table = getattr(self, 'inventory_table', None)
+        if table is None or not table.winfo_exists() or table.master is not notebook:
+            for widget in notebook.winfo_children():
+                widget.destroy()
+            table = self.inventory_table = KeyedRowTable(notebook, ["Item", "Quantity", "Equipped"],
+                                                         link_columns=["Item"],
+                                                         on_click=self.show_inventory_item_info,
+                                                         on_toggle=self.toggle_equipped)
+            table.pack(fill='both', expand=True)
+            notebook.add(table, text="Inventory")
+        table.set_rows(rows)
+
+    def toggle_equipped(self, item_name, column, equipped):
+        self.store.set_item(item_name, self.model.inventory[item_name]["quantity"], equipped)
+        self.recompute_ac()
+
+    def get_armor_table(self):
         path = os.path.join(os.path.dirname(__file__), "Items.csv")
-        with open(path, newline='', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                if row["Name"] == item_name:
-                    if "armor" in row["Type"].lower():
-                        AC = row["Damage"]
-                        base_ac = int(re.search(r'\d+', AC).group())
-                        adds_dex = bool(re.search(r'\+\s*Dex', AC, re.IGNORECASE))
-                        return {'base_ac': base_ac, 'adds_dex': adds_dex}
-        return {'base_ac': None, 'adds_dex': False}
-
+        return load_armor_table(path)
 
+    def extract_armor_ac(self, item_name: str):
+        armor = self.get_armor_table().get(item_name)
+        if armor is None:
+            return {'base_ac': None, 'adds_dex': False, 'dex_cap': None, 'bonus': 0}
+        return armor
+
+    def recompute_ac(self):
+        """Sets AC from all equipped inventory items, falling back to Base AC when no armor is worn."""
+        equipped = [item for item, data in self.model.inventory.items() if data.get("equipped")]
+        dex_mod = self.model.modifier("Dexterity")
+        AC = self.get_armor_table().compute_ac(equipped, dex_mod, self.max_values["AC"].get())
+        print(f"AC from equipped items: {AC}")
+        self.ac.set(AC)
 
     def show_inventory_item_info(self, item_name):
         path = os.path.join(os.path.dirname(__file__), "Items.csv")
@@ -1118,12 +1042,10 @@ class CharacterUI:
             messagebox.showerror("Error", "Items.csv not found.")
             return
 
-        with open(path, newline='', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                if row["Name"] == item_name:
-                    self.show_full_item_info(row)
-                    return
+        row = load_browse_table(path, ITEM_SORT_KEYS).by_name.get(item_name)
+        if row is not None:
+            self.show_full_item_info(row)
+            return
 
         messagebox.showinfo("Item Info", f"No detailed info found for: {item_name}")
 
@@ -1141,9 +1063,10 @@ class CharacterUI:
         ttk.Button(self.inventory_frame, text="Add Item", command=self.open_add_item_window).grid(row=0, column=0)
         ttk.Button(self.inventory_frame, text="Delete Item", command=self.delete_item).grid(row=0, column=1)
         ttk.Button(self.inventory_frame, text="Save Inventory", command=self.save_to_csv).grid(row=0, column=2)
+        ttk.Button(self.inventory_frame, text="Recompute AC", command=self.recompute_ac).grid(row=0, column=3)
 
         self.inventory_notebook = ttk.Notebook(self.inventory_frame)
-        self.inventory_notebook.grid(row=1, column=0, columnspan=3, sticky="nsew", padx=5, pady=5)
+        self.inventory_notebook.grid(row=1, column=0, columnspan=4, sticky="nsew", padx=5, pady=5)
 
         self.inventory_frame.rowconfigure(1, weight=1)
         self.inventory_frame.columnconfigure(0, weight=1)
@@ -1156,36 +1079,6 @@ class CharacterUI:
         self.root.rowconfigure(0, weight=1)
 
 
-        
-        self.inventory_items.clear()
-        try:
-            with open(self.csv_path, newline='', encoding='utf-8') as csvfile:
-                reader = csv.reader(csvfile)
-                for row in reader:
-                    if len(row) >= 3 and row[0] == "Inventory":
-                        item = row[1].strip()
-                        try:
-                            qty = int(row[2].strip())
-                        except ValueError:
-                            qty = 1
-
-                        # Handle equipped flag if present
-                        equipped = False
-                        if len(row) >= 4:
-                            equipped_str = row[3].strip().lower()
-                            equipped = equipped_str in ("true", "1", "yes")
-
-                        self.inventory_items[item] = {
-                            "quantity": qty,
-                            "equipped": equipped
-                        }
-
-        except FileNotFoundError:
-            print("Character CSV file not found.")
-
-        self.update_inventory_display(self.inventory_notebook)
-
-
 
     def open_add_item_window(self):
         path = os.path.join(os.path.dirname(__file__), "Items.csv")
@@ -1193,11 +1086,10 @@ class CharacterUI:
             messagebox.showerror("Error", "Items.csv not found.")
             return
 
-        with open(path, newline='', encoding='utf-8') as csvfile:
-            reader = list(csv.DictReader(csvfile))
-            item_rows = reader
-            item_names = [row["Name"] for row in item_rows]
-            item_data_by_name = {row["Name"]: row for row in item_rows}
+        # Shared with the Items panel: parsed rows, name lookup and the autocomplete index
+        item_table = load_browse_table(path, ITEM_SORT_KEYS)
+        item_data_by_name = item_table.by_name
+        autocomplete = item_table.autocomplete
 
         win = tk.Toplevel(self.root)
         win.title("Add Item to Inventory")
@@ -1222,12 +1114,21 @@ class CharacterUI:
         description_label = tk.Label(win, text="Custom Item Description (optional):")
         description_entry = tk.Entry(win)
 
+        shown_suggestions = []
+
         def update_suggestions(*_):
-            search = item_name_var.get().lower()
-            suggestion_listbox.delete(0, tk.END)
-            for name in item_names:
-                if search in name.lower():
-                    suggestion_listbox.insert(tk.END, name)
+            suggestions = autocomplete.complete(item_name_var.get(), limit=MAX_ITEM_SUGGESTIONS)
+            # Only touch the listbox from the first line that differs
+            keep = 0
+            for old_name, new_name in zip(shown_suggestions, suggestions):
+                if old_name != new_name:
+                    break
+                keep += 1
+            if keep < len(shown_suggestions):
+                suggestion_listbox.delete(keep, tk.END)
+            if keep < len(suggestions):
+                suggestion_listbox.insert(tk.END, *suggestions[keep:])
+            shown_suggestions[:] = suggestions
             check_custom_item()
 
         def check_custom_item():
@@ -1277,21 +1178,18 @@ class CharacterUI:
 
             equip = equipped_var.get()
             is_known = item in item_data_by_name
-            description = description_entry.get().strip() if not is_known else item_data_by_name[item].get("Description", "")
 
             # Store item
-            if item in self.inventory_items:
-                self.inventory_items[item]["quantity"] += qty
+            current = self.model.inventory.get(item)
+            if current:
+                quantity, equipped = current["quantity"] + qty, current["equipped"]
                 if is_known and ("armor" in item_data_by_name[item]["Type"].lower() or "weapon" in item_data_by_name[item]["Type"].lower()):
-                    self.inventory_items[item]["equipped"] = self.inventory_items[item]["equipped"] or equip
+                    equipped = equipped or equip
             else:
-                self.inventory_items[item] = {
-                    "quantity": qty,
-                    "equipped": equip if is_known else False,
-                    "description": description
-                }
+                quantity, equipped = qty, equip if is_known else False
 
-            self.update_inventory_display(self.inventory_notebook)
+            self.store.set_item(item, quantity, equipped)
+            self.refresh_inventory()
             win.destroy()
 
         add_btn = tk.Button(win, text="Add Item", command=add_item_to_inventory)
@@ -1311,21 +1209,22 @@ class CharacterUI:
 
             try:
                 qty = int(qty_var.get())
-                if item_name in self.inventory_items:
-                    item_data = self.inventory_items[item_name]
+                if item_name in self.model.inventory:
+                    item_data = self.model.inventory[item_name]
+                    equipped = item_data.get("equipped", False)
 
                     # Check if item is equipped and handle accordingly
-                    if item_data.get("equipped", False):
+                    if equipped:
                         if messagebox.askyesno("Confirm", f"Item {item_name} is equipped. Do you want to unequip it before deleting?"):
-                            self.inventory_items[item_name]["equipped"] = False
+                            equipped = False
 
                     # Decrease quantity or delete item entirely
                     if item_data["quantity"] > qty:
-                        self.inventory_items[item_name]["quantity"] -= qty
+                        self.store.set_item(item_name, item_data["quantity"] - qty, equipped)
                     else:
-                        del self.inventory_items[item_name]  # Delete the item entirely
+                        self.store.remove_item(item_name)  # Delete the item entirely
 
-                    self.update_inventory_display(self.inventory_notebook)
+                    self.refresh_inventory()
                     delete_window.destroy()
                 else:
                     messagebox.showerror("Error", "Item not found.")
@@ -1343,7 +1242,7 @@ class CharacterUI:
         listbox.grid(row=1, column=0, columnspan=2, padx=10, pady=5)
 
         # Populate the listbox with inventory items and quantities
-        for item, data in self.inventory_items.items():
+        for item, data in self.model.inventory.items():
             listbox.insert(tk.END, f"{item} (Qty: {data['quantity']})")
 
         # Label and input for quantity to delete
@@ -1364,12 +1263,7 @@ class CharacterUI:
             self.class_frame.destroy()
             return
 
-        # Load the JSON file
-        path = os.path.join(os.path.dirname(__file__), 'data.json')
-        with open(path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-
-        class_data = data.get("class", [])
+        class_data = self.rules.section("class")
 
         # Create the class frame
         self.class_frame = tk.Frame(self.root, width=500)
@@ -1393,63 +1287,7 @@ class CharacterUI:
 
         # Function to print class info
         def print_class_info(index):
-            text_widget.configure(state='normal')
-            text_widget.delete('1.0', 'end')
-            cls = class_data[index]
-            print_json_to_text(text_widget, cls)
-            text_widget.configure(state='disabled')
-
-        # Function to pretty-print the JSON
-        def print_json_to_text(widget, obj, indent=0, in_text_block=False):
-            spacing = '    ' * indent
-            bullet = "•"
-
-            if isinstance(obj, dict):
-                keys = list(obj.keys())
-                i = 0
-                while i < len(keys):
-                    key = keys[i]
-                    value = obj[key]
-
-                    # Special handling for "Name" followed by "Text"
-                    if key.lower() == "name" and i + 1 < len(keys) and keys[i + 1].lower() == "text":
-                        name_value = value
-                        text_value = obj[keys[i + 1]]
-
-                        widget.insert('end', f"\n{name_value}\n", 'bold')  # Bold class section title
-                        if isinstance(text_value, str):
-                            widget.insert('end', f"{text_value.strip()}\n\n")
-                        else:
-                            print_json_to_text(widget, text_value, indent + 1, in_text_block=True)
-
-                        i += 2  # Skip "Text" since we've already handled it
-                        continue
-
-                    # Skip standalone "Name" or "Text"
-                    if key.lower() in ["name", "text"]:
-                        i += 1
-                        continue
-
-                    display_key = key.replace('_', ' ').capitalize()
-                    widget.insert('end', f"{display_key}:\n", 'bold')
-                    print_json_to_text(widget, value, indent + 1, in_text_block=in_text_block)
-                    i += 1
-
-                if indent == 1:
-                    widget.insert('end', '\n')
-
-            elif isinstance(obj, list):
-                for item in obj:
-                    if isinstance(item, (dict, list)):
-                        print_json_to_text(widget, item, indent, in_text_block)
-                    else:
-                        widget.insert('end', f"{item}\n")
-                widget.insert('end', '\n')
-
-            else:
-                widget.insert('end', f"{obj}\n")
-
-
+            show_rendered_text(text_widget, self.rules.rendered(class_data[index]))
 
         # Populate the listbox
         for idx, cls in enumerate(class_data):
@@ -1488,52 +1326,76 @@ class CharacterUI:
         search_entry = tk.Entry(search_frame)
         search_entry.pack(side='left', fill='x', expand=True, padx=(5, 10))
 
-        tree = ttk.Treeview(self.bestiary_frame, show='headings')
-        tree.pack(fill='both', expand=True)
-
-        with open(path, newline='', encoding='utf-8') as csvfile:
-            reader = list(csv.DictReader(csvfile))
-            all_headers = reader[0].keys()
-            visible_cols = ["Name", "Type", "CR", "AC", "HP"]
-            rows = reader
-
-        tree["columns"] = visible_cols
-        for col in visible_cols:
-            tree.heading(col, text=col, command=lambda _col=col: self.sort_treeview(tree, _col, False))
-            col_widths = {"Name": 150, "Type": 100, "CR": 50, "AC": 50, "HP": 60}
-            tree.column(col, anchor="w", width=col_widths.get(col, 100), stretch=False)
+        table = load_browse_table(path, BESTIARY_SORT_KEYS)
+        rows = table.rows
+        visible_cols = ["Name", "Type", "CR", "AC", "HP"]
+        col_widths = {"Name": 150, "Type": 100, "CR": 50, "AC": 50, "HP": 60}
 
+        # Only the rows on screen exist as Tk items; scrolling pages them in from `rows`
+        view = VirtualTreeview(self.bestiary_frame, rows, visible_cols, col_widths,
+                               on_row_click=self.show_full_monster_info,
+                               on_heading_click=lambda _col: self.sort_treeview(view, table, _col, False))
+        view.pack(fill='both', expand=True)
 
-        def populate_tree(filtered):
-            tree.delete(*tree.get_children())
-            for row in filtered:
-                values = [row[col] for col in visible_cols]
-                tree.insert("", "end", values=values, tags=(row["Name"],))
-
-        populate_tree(rows)
+        search = IncrementalSearch(table.name_index)
 
         def on_search(*_):
-            search_text = search_entry.get().lower()
-            filtered = [row for row in rows if search_text in row["Name"].lower()]
-            populate_tree(filtered)
-
-        def on_item_click(event):
-            item_id = tree.identify_row(event.y)
-            if not item_id:
-                return
-            name = tree.item(item_id)["values"][0]
-            for row in rows:
-                if row["Name"] == name:
-                    self.show_full_monster_info(row)
-                    break
+            view.set_matches(search.search(search_entry.get()))
 
-        tree.bind("<ButtonRelease-1>", on_item_click)
         search_entry.bind("<KeyRelease>", on_search)
+        ttk.Button(search_frame, text="Build Encounter", command=lambda: self.open_encounter_builder(path)).pack(side='left')
 
         # Ensure layout expands correctly
         self.root.columnconfigure(2, weight=1)
         self.root.rowconfigure(0, weight=1)
 
+    def open_encounter_builder(self, path):
+        import encounter_builder
+        win = tk.Toplevel(self.root)
+        win.title("Encounter Builder")
+
+        form = ttk.Frame(win)
+        form.pack(fill='x', padx=10, pady=10)
+        party_size = tk.IntVar(value=4)
+        party_level = tk.IntVar(value=self.model.get_value("Level", 1))
+        difficulty = tk.StringVar(value="medium")
+        max_monsters = tk.IntVar(value=6)
+        monster_type = tk.StringVar()
+        environment = tk.StringVar()
+        fields = [("Party size", ttk.Spinbox(form, from_=1, to=10, textvariable=party_size, width=5)),
+                  ("Party level", ttk.Spinbox(form, from_=1, to=20, textvariable=party_level, width=5)),
+                  ("Difficulty", ttk.Combobox(form, textvariable=difficulty, state="readonly", width=8,
+                                              values=encounter_builder.DIFFICULTIES)),
+                  ("Max monsters", ttk.Spinbox(form, from_=1, to=15, textvariable=max_monsters, width=5)),
+                  ("Type", ttk.Entry(form, textvariable=monster_type, width=12)),
+                  ("Environment", ttk.Entry(form, textvariable=environment, width=12))]
+        for i, (label, widget) in enumerate(fields):
+            ttk.Label(form, text=label).grid(row=i // 2, column=(i % 2) * 2, sticky="w", padx=(0, 5), pady=2)
+            widget.grid(row=i // 2, column=(i % 2) * 2 + 1, sticky="w", padx=(0, 15), pady=2)
+
+        budget_label = ttk.Label(win)
+        budget_label.pack(anchor="w", padx=10)
+        results = tk.Listbox(win, width=90, height=20)
+        results.pack(fill='both', expand=True, padx=10, pady=10)
+
+        def build():
+            try:
+                size, level, most = party_size.get(), party_level.get(), max_monsters.get()
+            except tk.TclError:
+                return
+            table = load_challenge_table(path)
+            low, high = encounter_builder.xp_budget(size, level, difficulty.get())
+            suggestions = encounter_builder.build_encounters(table, size, level, difficulty.get(), most,
+                                                            monster_type=monster_type.get(),
+                                                            environment=environment.get())
+            budget_label.config(text=f"Budget: {low:.0f} to {high:.0f} adjusted XP, {len(suggestions)} suggestions")
+            results.delete(0, tk.END)
+            for suggestion in suggestions:
+                results.insert(tk.END, encounter_builder.describe(suggestion))
+
+        ttk.Button(form, text="Suggest", command=build).grid(row=3, column=0, columnspan=4, pady=(5, 0))
+        build()
+
 
     
     def open_items(self):
@@ -1561,61 +1423,30 @@ class CharacterUI:
         search_entry = tk.Entry(search_frame)
         search_entry.pack(side='left', fill='x', expand=True, padx=(5, 10))
 
-        tree = ttk.Treeview(self.item_frame, show='headings')
-        tree.pack(fill='both', expand=True)
-
-        with open(path, newline='', encoding='utf-8') as csvfile:
-            reader = list(csv.DictReader(csvfile))
-            all_headers = reader[0].keys()
-            visible_cols = ["Name", "Rarity", "Type", "Value", "Weight"]
-            rows = reader
-
-        tree["columns"] = visible_cols
-        for col in visible_cols:
-            tree.heading(col, text=col, command=lambda _col=col: self.sort_treeview(tree, _col, False))
-            tree.column(col, anchor="w", stretch=True) 
-            # restricks size of columns to fit the frame
-            col_widths = {"Name": 150, "Rarity": 100, "Type": 100, "Value": 50, "Weight": 50}
-            tree.column(col, anchor="w", width=col_widths.get(col, 100), stretch=False)
+        table = load_browse_table(path, ITEM_SORT_KEYS)
+        rows = table.rows
+        visible_cols = ["Name", "Rarity", "Type", "Value", "Weight"]
+        # restricks size of columns to fit the frame
+        col_widths = {"Name": 150, "Rarity": 100, "Type": 100, "Value": 50, "Weight": 50}
 
-        def populate_tree(filtered):
-            tree.delete(*tree.get_children())
-            for row in filtered:
-                values = [row[col] for col in visible_cols]
-                tree.insert("", "end", values=values, tags=(row["Name"],))
+        view = VirtualTreeview(self.item_frame, rows, visible_cols, col_widths,
+                               on_row_click=self.show_full_item_info,
+                               on_heading_click=lambda _col: self.sort_treeview(view, table, _col, False))
+        view.pack(fill='both', expand=True)
 
-        populate_tree(rows)
+        search = IncrementalSearch(table.name_index)
 
         def on_search(*_):
-            search_text = search_entry.get().lower()
-            filtered = [row for row in rows if search_text in row["Name"].lower()]
-            populate_tree(filtered)
-
-        def on_item_click(event):
-            item_id = tree.identify_row(event.y)
-            if not item_id:
-                return
-            name = tree.item(item_id)["values"][0]
-            for row in rows:
-                if row["Name"] == name:
-                    self.show_full_item_info(row)
-                    break
+            view.set_matches(search.search(search_entry.get()))
 
-        tree.bind("<ButtonRelease-1>", on_item_click)
         search_entry.bind("<KeyRelease>", on_search)
 
 
-    def sort_treeview(self, tree, col, reverse):
-        data = [(tree.set(k, col), k) for k in tree.get_children("")]
-        try:
-            data.sort(key=lambda t: float(t[0]) if t[0].replace('.', '', 1).isdigit() else t[0].lower(), reverse=reverse)
-        except Exception:
-            data.sort(key=lambda t: t[0].lower(), reverse=reverse)
-
-        for index, (_, k) in enumerate(data):
-            tree.move(k, "", index)
+    def sort_treeview(self, view, table, col, reverse):
+        # Sort keys are typed and precomputed per table, and each order is cached
+        view.set_sort_order(table.sort_order(col, reverse))
 
-        tree.heading(col, command=lambda: self.sort_treeview(tree, col, not reverse))
+        view.tree.heading(col, command=lambda: self.sort_treeview(view, table, col, not reverse))
 
     def show_full_monster_info(self, monster_data):
         win = tk.Toplevel(root)
@@ -1623,9 +1454,34 @@ class CharacterUI:
         text = tk.Text(win, wrap=tk.WORD, width=80, height=30)
         for key, value in monster_data.items():
             text.insert(tk.END, f"{key}: {value}\n")
+        # Damage clauses of every monster are parsed once and cached with the Bestiary
+        clauses = load_damage_table(os.path.join(os.path.dirname(__file__), "Bestiary.csv")).get(monster_data["Name"])
+        text.insert(tk.END, self.damage_lines(clauses))
         text.config(state=tk.DISABLED)
         text.pack(padx=10, pady=10)
 
+        self.add_damage_chart(win, clauses)
+        if self.dice_engine():
+            result_label = ttk.Label(win, justify=tk.LEFT)
+            ttk.Button(win, text="Simulate Fight",
+                       command=lambda: self.simulate_fight(monster_data, clauses, result_label)).pack(pady=5)
+            result_label.pack(padx=10, pady=(0, 10))
+
+    def simulate_fight(self, monster_data, clauses, label):
+        # Thousands of duels against the monster with the sheet as it is now
+        import simulator
+        character = simulator.CharacterProfile(self.model, self.spell_compendium)
+        result = simulator.simulate(character, simulator.MonsterProfile(monster_data, clauses))
+        rounds = result["rounds_to_kill_mean"]
+        lines = [f"Won {result['win_rate']:.1%}, lost {result['loss_rate']:.1%}, "
+                 f"draw {result['draw_rate']:.1%} of {result['encounters']} fights"]
+        if rounds is not None:
+            lines.append(f"Rounds to kill: {rounds:.1f} on average, {result['rounds_to_kill_p90']:.0f} at worst (p90)")
+        lines.append(f"Spell points spent: {result['spell_points_spent_mean']:.1f}, "
+                     f"HP lost: {result['hp_lost_mean']:.1f}")
+        lines += [f"  {spell}: {count:.2f} casts per fight" for spell, count in result["casts_per_fight"].items()]
+        label.config(text="\n".join(lines))
+
     def show_full_item_info(self, item_data):
         win = tk.Toplevel(root)
         win.title(item_data["Name"])
@@ -1740,36 +1596,16 @@ class CharacterUI:
             btn.grid(row=i, column=0, padx=10, pady=5)
 
     def show_class_spells(self, class_name):
-        filename = f"{class_name.capitalize()}_Spells.csv"
-        path = os.path.join(os.path.dirname(__file__), filename)
+        class_spells = self.spell_compendium.class_spells_by_level(class_name)
 
-        if not os.path.exists(path):
-            print(f"{filename} not found at {path}")
+        if not class_spells:
+            print(f"No spells found for {class_name.capitalize()}")
             return
 
         spells_by_level = {}
-
-        def level_to_int(level_str):
-            """Converts level like '1st', '2nd', '3rd', etc. to int, Cantrip -> 0"""
-            level_str = level_str.strip().lower()
-            if level_str == "cantrip" or level_str == "0":
-                return 0
-            match = re.match(r"(\d+)(st|nd|rd|th)?", level_str)
-            return int(match.group(1)) if match else 99  # fallback for unknowns
-
-        with open(path, newline='', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                raw_level = row["Level"].strip()
-                spell_name = row["Name"].strip()
-
-                level_int = level_to_int(raw_level)
-                level_key = "Cantrips" if level_int == 0 else f"Level {level_int}"
-
-                if level_key not in spells_by_level:
-                    spells_by_level[level_key] = []
-
-                spells_by_level[level_key].append(spell_name)
+        for level_int, names in class_spells.items():
+            level_key = "Cantrips" if level_int == 0 else f"Level {level_int}"
+            spells_by_level[level_key] = names
 
         # New window for class spells
         spells_window = tk.Toplevel(root)
@@ -1812,6 +1648,11 @@ class CharacterUI:
             notebook.add(frame, text=title)
 
             for idx, spell_name in enumerate(spells):
+                # Show the compendium's spelling of the name when the spell is known
+                # (not before warm_up has loaded it, so startup doesn't wait on it)
+                spell_data = self.spell_compendium.get(spell_name) if self.spell_compendium.loaded else None
+                if spell_data:
+                    spell_name = spell_data["Name"].strip()
                 btn = ttk.Button(frame, text=spell_name, width=25,
                                 command=lambda spell=spell_name: self.show_spell(spell,level))
                 btn.grid(row=idx // 2, column=idx % 2, padx=5, pady=5)
@@ -1820,219 +1661,66 @@ class CharacterUI:
         spell_name = self.spell_entry.get().strip()
         level = self.spell_level_var.get()
         if spell_name:
-            if level not in self.spells:
-                self.spells[level] = []
-            self.spells[level].append(spell_name)
+            # One journal line instead of appending and re-sorting the whole CSV
+            self.store.add_spell(level, spell_name)
             self.spell_entry.delete(0, tk.END)
             self.update_spell_display(self.spell_notebook)
 
-            # Append the new spell as [level, spell_name]
-            if self.csv_path:
-                with open(self.csv_path, 'a', newline='', encoding='utf-8') as file:
-                    writer = csv.writer(file)
-                    writer.writerow([level, spell_name])
-
-                self.sort_csv_spells_by_level()
-
-
-    def sort_csv_spells_by_level(self):
-        if not self.csv_path:
-            return
-
-        with open(self.csv_path, 'r', newline='', encoding='utf-8') as file:
-            reader = csv.reader(file)
-            rows = list(reader)
-
-        # Split rows into stats and spells
-        stats_rows = [row for row in rows if not row[0].isdigit()]
-        spell_rows = [row for row in rows if row[0].isdigit()]
-
-        # Sort spell rows by level (as integers), then spell name
-        spell_rows.sort(key=lambda row: (int(row[0]), row[1].lower()))
-
-        # Write stats + sorted spells back to file
-        with open(self.csv_path, 'w', newline='', encoding='utf-8') as file:
-            writer = csv.writer(file)
-            writer.writerows(stats_rows + spell_rows)
-
     def delete_spell(self):
         spell_name = self.spell_entry.get().strip()
         level = self.spell_level_var.get()
-        path = os.path.join(os.path.dirname(__file__), 'character_data.csv')
         if spell_name:
             try:
-                # Open the character_data.csv file
-                with open(path, newline='', encoding='utf-8') as csvfile:
-                    reader = csv.reader(csvfile)
-                    rows = list(reader)
-
-                # Find the row corresponding to the spell level (e.g., 0 for Cantrips, 1 for Level 1 spells)
-                found = False
-                for row in rows:
-                    if row[0] == str(level):
-                        if spell_name in row:
-                            row.remove(spell_name)
-                            found = True
-                        break 
-
-                if not found:
-                    raise ValueError(f"Spell '{spell_name}' not found at level {level}.")
-
-                # Write the updated data back to the CSV
-                with open(path, mode='w', newline='', encoding='utf-8') as csvfile:
-                    writer = csv.writer(csvfile)
-                    writer.writerows(rows)
+                self.store.remove_spell(level, spell_name)
 
                 # Clear the entry field and update the display
                 self.spell_entry.delete(0, tk.END)
                 self.update_spell_display(self.spell_notebook)
-                self.save_to_csv()  # Persist the changes
 
             except (ValueError, KeyError) as e:
                 messagebox.showerror("Error", str(e))
 
     def save_to_csv(self):
-        spells_by_level_from_csv = self.load_spells_from_csv()
-        self.spells = spells_by_level_from_csv
         if not self.csv_path:
             return
 
-        with open(self.csv_path, 'w', newline='') as file:
-            writer = csv.writer(file)
-
-            # Save stats
-            for key, var in self.stat_vars.items():
-                writer.writerow([key, var.get()])
-            
-            # Save key stats
-            writer.writerow(["Level", self.level.get()])
-            writer.writerow(["EXP", self.exp.get()])
-            writer.writerow(["HP", self.hp.get()])
-            writer.writerow(["Temp HP", self.temp_hp.get()])
-            writer.writerow(["AC", self.ac.get()])
-            writer.writerow(["Speed", self.speed.get()])
-            writer.writerow(["Spell Points", self.spell_points.get()])
-            writer.writerow(["Actions", self.actions.get()])
-            writer.writerow(["Sorcery Points", self.sorcery_points.get()])
-
-            # Save max values
-            for key, max_var in self.max_values.items():
-                writer.writerow([f"Max {key}", max_var.get()])
-                
-            # Save character info
-            character_info = {
-                "Race": "Half-Elf",
-                "Class": "Sorcerer (Draconic Bloodline)",
-                "Background": "Sage",
-                "Armor Proficiencies": "None",
-                "Weapon Proficiencies": "Daggers, slings, quarterstaffs, light crossbows",
-                "Tool Proficiencies": "None",
-                "Saving Throws": "Constitution, Charisma",
-                "Skills": "Arcana, Insight, Persuasion, History",
-                "Spellcasting Ability": "Charisma",
-                "Spell Save DC": "8 + Proficiency + CHA mod",
-                "Spell Attack Bonus": "Proficiency + CHA mod",
-                "Features": "Draconic Resilience: HP increase, AC = 13 + Dex mod if unarmored",
-                "Languages": "Common, Elvish, Draconic"
-            }
-
-            # Save character info
-            for key, value in self.character_info_data.items():
-                writer.writerow(["Info", key, value])
-
-            
-            # Save spells
-            for level, spells in self.spells.items():
-                for spell in spells:
-                    writer.writerow([f"{level}", spell])
-
-            # Save inventory
-            for item, data in self.inventory_items.items():
-                writer.writerow(["Inventory", item, data["quantity"], data.get("equipped", False)])
-
+        # The model is already up to date; hand it to the background saver,
+        # which serializes only the sections that changed, off the UI thread
+        self.saver.request()
 
+    def on_close(self):
+        # Let a queued save finish before the window goes away
+        self.saver.stop(timeout=5)
+        self.store.close()
+        perf.dump_on_exit()
+        self.root.destroy()
 
     def load_from_csv(self):
-        if not os.path.exists(self.csv_path):
-            return  # If the file doesn't exist, skip loading
-        self.character_info_data = {}
-        self.spells.clear()
-        self.inventory_items.clear()
-
-        with open(self.csv_path, 'r') as file:
-            reader = csv.reader(file)
-            current_level = None
-            for row in reader:
-                if len(row) >= 3 and row[0] == "Inventory":
-                    item = row[1].strip()
-                    try:
-                        qty = int(row[2].strip())
-                    except ValueError:
-                        qty = 1
-
-                    # Handle equipped flag if present
-                    equipped = False
-                    if len(row) >= 4:
-                        equipped_str = row[3].strip().lower()
-                        equipped = equipped_str in ("true", "1", "yes")
-
-                    self.inventory_items[item] = {
-                        "quantity": qty,
-                        "equipped": equipped
-                    }
-                    
-                if len(row) >= 3 and row[0] == "Info":
-                    self.character_info_data[row[1]] = row[2]
-
-                if len(row) != 2:
-                    continue
-
-                key, value = row
-
-                if key.startswith("Spell Level"):
-                    try:
-                        level = int(key.split()[-1])
-                        current_level = level
-                        self.spells[current_level] = []
-                        continue
-                    except ValueError:
-                        pass
-
-                try:
-                    value = int(value)
-                    if key in self.stat_vars:
-                        self.stat_vars[key].set(value)
-                    elif key == "Level":
-                        self.level.set(value)
-                    elif key == "EXP":
-                        self.exp.set(value)
-                    elif key == "HP":
-                        self.hp.set(value)
-                    elif key == "Temp HP":
-                        self.temp_hp.set(value)
-                    elif key == "AC":
-                        self.ac.set(value)
-                    elif key == "Speed":
-                        self.speed.set(value)
-                    elif key == "Spell Points":
-                        self.spell_points.set(value)
-                    elif key == "Actions":
-                        self.actions.set(value)
-                    elif key == "Sorcery Points":
-                        self.sorcery_points.set(value)
-                    elif key.startswith("Max "):
-                        stat_name = key.split("Max ")[-1]
-                        if stat_name in self.max_values:
-                            self.max_values[stat_name].set(value)
-                    elif current_level is not None:
-                        self.spells[current_level].append(value)
-                except ValueError:
-                    pass
+        # Snapshot plus any edits journaled since the last save
+        model = self.store.load()
+        for key, var in self.value_vars.items():
+            value = model.get_value(key)
+            if value is not None:
+                var.set(value)
+            else:
+                self.store.set_value(key, var.get())  # not in the file yet: keep the default
 
         self.update_spell_display(self.main_spell_notebook)
-        self.update_inventory_display(self.inventory_notebook)
+        self.refresh_inventory()
 
 if __name__ == '__main__':
+    perf.instrument_tk()  # no-op unless DND_PERF=1 or --perf
+    startup = perf.StartupProfile(START_TIME, detailed="--profile-startup" in sys.argv)
+    startup.mark("imports")
     root = tk.Tk()
-    app = CharacterUI(root)
+    startup.mark("Tk()")
+    app = CharacterUI(root, startup)
+
+    def on_first_map(event):
+        if event.widget is root and not startup.painted:
+            root.update_idletasks()
+            startup.first_paint()
+            print_env_info()
+            root.after_idle(app.warm_up)
+    root.bind("<Map>", on_first_map, add="+")
     root.mainloop()
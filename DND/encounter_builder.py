@@ -0,0 +1,175 @@
+"""Usage: python encounter_builder.py --party-size 4 --party-level 5 --difficulty hard [--max-monsters 6] [--type undead] [--environment forest]"""
+import argparse
+import bisect
+import heapq
+import os
+import random
+import sys
+
+from cli import discard_stdout
+from compendium import DATA_DIR, load_challenge_table
+
+# Dungeon Master's Guide rules: the party's thresholds set the XP budget and the
+# monsters' XP is multiplied by the encounter multiplier for their number
+# XP thresholds per character: easy, medium, hard, deadly
+XP_THRESHOLDS = {
+    1: (25, 50, 75, 100), 2: (50, 100, 150, 200), 3: (75, 150, 225, 400), 4: (125, 250, 375, 500),
+    5: (250, 500, 750, 1100), 6: (300, 600, 900, 1400), 7: (350, 750, 1100, 1700),
+    8: (450, 900, 1400, 2100), 9: (550, 1100, 1600, 2400), 10: (600, 1200, 1900, 2800),
+    11: (800, 1600, 2400, 3600), 12: (1000, 2000, 3000, 4500), 13: (1100, 2200, 3400, 5100),
+    14: (1250, 2500, 3800, 5700), 15: (1400, 2800, 4300, 6400), 16: (1600, 3200, 4800, 7200),
+    17: (2000, 3900, 5900, 8800), 18: (2100, 4200, 6300, 9500), 19: (2400, 4900, 7300, 10900),
+    20: (2800, 5700, 8500, 12700),
+}
+DIFFICULTIES = ("easy", "medium", "hard", "deadly")
+DEADLY_CEILING = 1.5  # a "deadly" group may go up to 1.5x the deadly threshold
+MAX_KINDS = 3         # different monsters in one group
+
+# Encounter multipliers, from one monster up; small parties use the next
+# one up, parties of six or more the next one down
+MULTIPLIERS = (0.5, 1, 1.5, 2, 2.5, 3, 4, 5)
+_GROUP_SIZES = (1, 2, 3, 7, 11, 15)  # smallest group of each multiplier, from MULTIPLIERS[1] on
+
+
+def encounter_multiplier(monsters, party_size):
+    index = bisect.bisect_right(_GROUP_SIZES, monsters)
+    if party_size < 3:
+        index += 1
+    elif party_size >= 6:
+        index -= 1
+    return MULTIPLIERS[index]
+
+
+def xp_budget(party_size, party_level, difficulty):
+    """(lowest, highest) adjusted XP of a group of the given difficulty."""
+    thresholds = XP_THRESHOLDS[min(max(party_level, 1), 20)]
+    index = DIFFICULTIES.index(difficulty)
+    low = thresholds[index] * party_size
+    high = thresholds[index + 1] * party_size if index + 1 < len(thresholds) else low * DEADLY_CEILING
+    return low, high
+
+
+def build_encounters(table, party_size, party_level, difficulty="medium", max_monsters=6, limit=20,
+                     monster_type="", environment="", seed=None, max_kinds=None):
+    """Ranked monster groups for the party, closest to the middle of the XP budget first.
+
+    Each suggestion is a dict with "monsters" ([(name, count)]), "xp" (raw),
+    "adjusted_xp" and "multiplier". Groups are built from XP values, with
+    at most max_kinds different ones; each value is filled with one monster
+    of that XP, picked at random (repeatable with seed) among those matching
+    the type and environment."""
+    low, high = xp_budget(party_size, party_level, difficulty)
+    target = (low + high) / 2
+    max_kinds = max_kinds or MAX_KINDS
+    monster_type, environment = monster_type.lower(), environment.lower()
+    multipliers = [encounter_multiplier(count, party_size) for count in range(max_monsters + 1)]
+    top_multiplier = max(multipliers[1:], default=1)
+    groups = {}  # xp -> [row, ...]
+    # A lone monster facing six or more characters counts for half its XP
+    for position in table.xp_range(1, high / min(multipliers[1:], default=1)):
+        row = table.rows[position]
+        if monster_type and monster_type not in row.get("Type", "").lower():
+            continue
+        if environment and environment not in row.get("Environment", "").lower():
+            continue
+        groups.setdefault(table.xp[position], []).append(row)
+    values = sorted(groups, reverse=True)
+    negated = [-value for value in values]  # ascending, for bisect
+
+    best = []  # heap of (-distance, -monsters, combo, raw, adjusted), worst on top
+    combo = []  # [(xp value, count), ...], values strictly decreasing
+
+    def consider(count, raw):
+        adjusted = raw * multipliers[count]
+        if low <= adjusted <= high:
+            entry = (-abs(adjusted - target), -count, tuple(combo), raw, adjusted)
+            if len(best) < limit:
+                heapq.heappush(best, entry)
+            elif entry > best[0]:
+                heapq.heapreplace(best, entry)
+
+    # Walks the distinct XP values highest first, pruning every branch that
+    # must overshoot or can no longer reach the budget
+    def search(start, count, raw):
+        if len(combo) == max_kinds - 1:
+            # The last kind: for each count of it, the XP values that keep the
+            # group inside the budget are a run of the sorted values, found by
+            # bisecting for both ends (consider() makes the exact check). Once
+            # `limit` groups are kept, only closer ones to the target can get in
+            top, bottom = high, low
+            if len(best) == limit:
+                top, bottom = min(high, target - best[0][0]), max(low, target + best[0][0])
+            for extra in range(1, max_monsters - count + 1):
+                total = count + extra
+                highest = (top / multipliers[total] - raw) / extra + 1e-9
+                lowest = (bottom / multipliers[total] - raw) / extra - 1e-9
+                first = max(start, bisect.bisect_left(negated, -highest))
+                for candidate in range(first, bisect.bisect_right(negated, -lowest)):
+                    combo.append((values[candidate], extra))
+                    consider(total, raw + values[candidate] * extra)
+                    combo.pop()
+            return
+        for index in range(start, len(values)):
+            value = values[index]
+            # Filling every slot left with this value (or a smaller one) can't reach the budget
+            if (raw + value * (max_monsters - count)) * top_multiplier < low:
+                break
+            for extra in range(1, max_monsters - count + 1):
+                total = count + extra
+                new_raw = raw + value * extra
+                if new_raw * multipliers[total] > high:
+                    break  # more of this monster only overshoots further
+                combo.append((value, extra))
+                consider(total, new_raw)
+                if total < max_monsters:
+                    search(index + 1, total, new_raw)
+                combo.pop()
+
+    search(0, 0, 0)
+
+    rng = random.Random(seed)
+    suggestions = []
+    for _, negative_count, kinds, raw, adjusted in sorted(best, reverse=True):
+        suggestions.append({
+            "monsters": [(rng.choice(groups[value])["Name"], extra) for value, extra in kinds],
+            "xp": raw,
+            "adjusted_xp": adjusted,
+            "multiplier": multipliers[-negative_count],
+        })
+    return suggestions
+
+
+def describe(suggestion):
+    monsters = ", ".join(f"{count} x {name}" if count > 1 else name for name, count in suggestion["monsters"])
+    return f"{monsters}  ({suggestion['xp']} XP, adjusted {suggestion['adjusted_xp']:.0f})"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Suggests Bestiary monster groups for a party.")
+    parser.add_argument("--party-size", type=int, default=4)
+    parser.add_argument("--party-level", type=int, default=1)
+    parser.add_argument("--difficulty", choices=DIFFICULTIES, default="medium")
+    parser.add_argument("--max-monsters", type=int, default=6)
+    parser.add_argument("--limit", type=int, default=20, help="suggestions to show")
+    parser.add_argument("--type", default="", help="only monsters whose Type contains this")
+    parser.add_argument("--environment", default="", help="only monsters whose Environment contains this")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--data-dir", default=DATA_DIR, help="folder with Bestiary.csv")
+    args = parser.parse_args(argv)
+
+    table = load_challenge_table(os.path.join(args.data_dir, "Bestiary.csv"))
+    low, high = xp_budget(args.party_size, args.party_level, args.difficulty)
+    try:
+        print(f"{args.difficulty.capitalize()} for {args.party_size} characters of level {args.party_level}: "
+              f"{low:.0f} to {high:.0f} adjusted XP")
+        for suggestion in build_encounters(table, args.party_size, args.party_level, args.difficulty,
+                                           args.max_monsters, args.limit, args.type, args.environment, args.seed):
+            print(describe(suggestion), flush=True)
+    except BrokenPipeError:
+        discard_stdout()
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
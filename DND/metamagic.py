@@ -0,0 +1,247 @@
+"""Sorcery point cost and expected damage of each metamagic option on each known spell and slot level."""
+import re
+
+from character_model import STATS
+
+TARGET_AC = 13    # the reference target: a typical mid-CR monster
+TARGET_SAVE = 2   # its saving throw bonus
+
+# name -> (short description, rules text); shown in the Metamagic Options window
+ALL_METAMAGIC = {
+    "Careful Spell": ["Protect allies from your area spells.",
+                      "Protect chosen creatures from effects of your area spells, making them auto-succeed on saves and avoid half damage."],
+    "Distant Spell": ["Double spell range or extend touch.",
+                      "Spend 1 point to double range or cast touch spells from 30 feet."],
+    "Empowered Spell": ["Reroll damage dice.",
+                        "Spend 1 point to reroll a number of damage dice equal to your Charisma modifier."],
+    "Extended Spell": ["Double duration.",
+                       "Spend 1 point to double spell duration up to 24 hours."],
+    "Heightened Spell": ["Disadvantage on save.",
+                         "Spend 3 points to give a creature disadvantage on its first saving throw against your spell."],
+    "Quickened Spell": ["Cast as bonus action.",
+                        "Spend 2 points to change a spell's casting time from 1 action to 1 bonus action."],
+    "Seeking Spell": ["Reroll missed spell attack.",
+                      "Spend 2 points to reroll a missed spell attack roll."],
+    "Subtle Spell": ["No components.",
+                     "Spend 1 point to cast a spell without verbal or somatic components."],
+    "Transmuted Spell": ["Change damage type.",
+                         "Spend 1 point to change a spell's elemental damage type (acid, fire, etc.)."],
+    "Twinned Spell": ["Target a second creature.",
+                      "Spend Sorcery Points equal to the spell's level to target a second creature."]
+}
+
+# Sorcery points per option; Twinned Spell costs the spell's level instead
+METAMAGIC_COSTS = {
+    "Careful Spell": 1, "Distant Spell": 1, "Empowered Spell": 1, "Extended Spell": 1,
+    "Heightened Spell": 3, "Quickened Spell": 2, "Seeking Spell": 2, "Subtle Spell": 1,
+    "Transmuted Spell": 1,
+}
+TRANSMUTABLE_TYPES = {"acid", "cold", "fire", "lightning", "poison", "thunder"}
+
+_AREA_RE = re.compile(r"\d+-foot(?:-radius| radius)?[ -](?:cone|cube|line|sphere|cylinder|square|radius|emanation)"
+                      r"|\beach creature\b|\bany number of\b", re.IGNORECASE)
+# More than one target, now or when upcast: not a Twinned Spell candidate
+_MORE_TARGETS_RE = re.compile(r"\badditional (?:creature|target|dart|ray|beam)"
+                              r"|\b(?:up to )?(?:two|three|four|five|six) (?:[a-z]+ )?(?:creatures|targets|darts|rays|beams)\b",
+                              re.IGNORECASE)
+_SAVE_TEXT_RE = re.compile(r"saving throw", re.IGNORECASE)
+_ATTACK_TEXT_RE = re.compile(r"spell attack", re.IGNORECASE)
+_TIMED_RE = re.compile(r"\b(?:minute|hour|day)s?\b", re.IGNORECASE)
+
+
+class MetamagicEffect:
+    """One metamagic option on one spell cast with one slot level."""
+
+    __slots__ = ("metamagic", "spell", "level", "cost", "expected", "gain")
+
+    def __init__(self, metamagic, spell, level, cost, expected, gain):
+        self.metamagic = metamagic
+        self.spell = spell
+        self.level = level        # slot level, 0 for cantrips
+        self.cost = cost          # sorcery points
+        self.expected = expected  # expected damage of the cast with the option
+        self.gain = gain          # expected damage added by the option
+
+    def __repr__(self):
+        return f"MetamagicEffect({self.metamagic!r}, {self.spell!r}, {self.level}, {self.cost}, {self.expected:.1f})"
+
+    def describe(self):
+        text = f"{self.metamagic} ({self.cost} sorcery point{'s' if self.cost != 1 else ''})"
+        if self.gain:
+            text += f": {self.expected:.1f} expected damage (+{self.gain:.1f})"
+        return text
+
+
+def hit_chance(bonus, target_ac, rerolls=0):
+    # A natural 1 always misses, a natural 20 always hits; each reroll retries a miss
+    hit = min(max((21 - target_ac + bonus) / 20, 0.05), 0.95)
+    return 1 - (1 - hit) ** (rerolls + 1)
+
+
+def fail_chance(dc, save_bonus, disadvantage=False):
+    fail = min(max((dc - 1 - save_bonus) / 20, 0.0), 1.0)
+    return 1 - (1 - fail) ** 2 if disadvantage else fail
+
+
+def _dice_sides(clauses):
+    # Sides of every damage die the clauses roll ([8, 8, 8] for 3d8)
+    return [sides for clause in clauses if not clause.alternative
+            for sign, count, sides in clause.dice_terms if sides and sign > 0
+            for _ in range(count * clause.projectiles)]
+
+
+def empowered_gain(sides, rerolls):
+    """Expected damage added by rerolling up to `rerolls` of the dice with
+    these sides, taking those furthest below their average.
+
+    A die showing f below its average a gains a - f in expectation when
+    rerolled. The gain is the sum of the `rerolls` largest shortfalls: for
+    each shortfall t, the number of dice at least t short follows a
+    Poisson binomial distribution, and E[min(that number, rerolls)] is
+    added for each step up to t."""
+    if not sides or rerolls <= 0:
+        return 0.0
+    shortfalls = sorted({(s + 1) / 2 - face for s in set(sides) for face in range(1, s + 1) if face < (s + 1) / 2})
+    gain, previous = 0.0, 0.0
+    for shortfall in shortfalls:
+        # P(count of dice at least `shortfall` short == k), one die at a time
+        counts = [1.0]
+        for s in sides:
+            p = sum(1 for face in range(1, s + 1) if (s + 1) / 2 - face >= shortfall) / s
+            counts = [a * (1 - p) + b * p for a, b in zip(counts + [0.0], [0.0] + counts)]
+        gain += (shortfall - previous) * sum(min(k, rerolls) * p for k, p in enumerate(counts))
+        previous = shortfall
+    return gain
+
+
+def cast_damage(clauses, attack_bonus, save_dc, target_ac=TARGET_AC, target_save=TARGET_SAVE,
+                seeking=False, heightened=False):
+    """Expected damage of one cast against the target (alternatives left out).
+    Seeking Spell rerolls a single missed attack roll: one ray of Scorching
+    Ray, not all three."""
+    total = 0.0
+    for clause in clauses:
+        if clause.alternative:
+            continue
+        mean = clause.mean
+        if clause.kind == "attack":
+            dice_mean = mean - clause.bonus * clause.projectiles  # what a critical hit adds
+            hit = hit_chance(attack_bonus, target_ac)
+            crit = hit_chance(-100, target_ac)  # natural 20s only
+            total += hit * mean + crit * dice_mean
+            if seeking:
+                seeking = False
+                total += ((hit_chance(attack_bonus, target_ac, rerolls=1) - hit) * mean
+                          + (hit_chance(-100, target_ac, rerolls=1) - crit) * dice_mean) / clause.projectiles
+        elif clause.kind == "save":
+            fail = fail_chance(save_dc, target_save, heightened)
+            total += mean * (fail + (1 - fail) * (0.5 if clause.on_save == "half" else 0.0))
+        else:
+            total += mean
+    return total
+
+
+def applicable_metamagic(spell, clauses):
+    """Names of the options that can be used on a spell row with these damage clauses."""
+    text = spell.get("Text", "")
+    spell_range = spell.get("Range", "").lower()
+    area = bool(_AREA_RE.search(text)) or "(" in spell_range
+    saves = bool(_SAVE_TEXT_RE.search(text)) or any(clause.kind == "save" for clause in clauses)
+    options = []
+    if saves and area:
+        options.append("Careful Spell")
+    if not spell_range.startswith("self"):
+        options.append("Distant Spell")
+    if clauses:
+        options.append("Empowered Spell")
+    if _TIMED_RE.search(spell.get("Duration", "")):
+        options.append("Extended Spell")
+    if saves:
+        options.append("Heightened Spell")
+    if spell.get("Casting Time", "").lower() in ("action", "1 action"):
+        options.append("Quickened Spell")
+    if any(clause.kind == "attack" for clause in clauses) or _ATTACK_TEXT_RE.search(text):
+        options.append("Seeking Spell")
+    if re.search(r"\b[VS]\b", spell.get("Components", "")):
+        options.append("Subtle Spell")
+    if any(clause.damage_type in TRANSMUTABLE_TYPES for clause in clauses):
+        options.append("Transmuted Spell")
+    if not area and not spell_range.startswith("self") \
+            and not _MORE_TARGETS_RE.search(text + " " + spell.get("At Higher Levels", "")):
+        options.append("Twinned Spell")
+    return options
+
+
+class MetamagicTable:
+    """{spell name: {slot level: {metamagic name: MetamagicEffect}}} for a character's known spells."""
+
+    def __init__(self, model, spells, target_ac=TARGET_AC, target_save=TARGET_SAVE):
+        self.effects = {}
+        self.base = {}  # (spell name, slot level) -> expected damage without metamagic
+        rerolls = max(model.modifier("Charisma"), 1)
+        attack_bonus, save_dc = model.spell_attack_bonus(), model.spell_save_dc()
+        max_level = model.max_spell_level()
+        character_level = model.resources.get("Level", 1)
+        for spell_level, names in model.spells.items():
+            for name in names:
+                spell = spells.get(name)
+                if spell is None:
+                    continue
+                upcast = spells.upcast(name)
+                cantrip = upcast.cantrip or spell_level == 0
+                if cantrip:
+                    slots = {0: upcast.at(character_level) if upcast.cantrip else []}
+                else:
+                    slots = {slot: upcast.levels.get(slot, []) for slot in range(spell_level, max_level + 1)}
+                options = applicable_metamagic(spell, upcast.at(character_level if cantrip else spell_level))
+                by_slot = self.effects.setdefault(spell["Name"], {})
+                for slot, clauses in slots.items():
+                    base = cast_damage(clauses, attack_bonus, save_dc, target_ac, target_save)
+                    self.base[(spell["Name"], slot)] = base
+                    effects = by_slot[slot] = {}
+                    for option in options:
+                        # Options that change no damage keep the base (a range, a duration, components ...)
+                        if option == "Twinned Spell":
+                            cost, expected = max(slot, 1), 2 * base
+                        elif option == "Empowered Spell":
+                            cost = METAMAGIC_COSTS[option]
+                            # The rerolled dice only count when the cast lands
+                            mean = sum(clause.mean for clause in clauses if not clause.alternative)
+                            landed = base / mean if mean else 0.0
+                            expected = base + empowered_gain(_dice_sides(clauses), rerolls) * landed
+                        elif option == "Heightened Spell":
+                            cost = METAMAGIC_COSTS[option]
+                            expected = cast_damage(clauses, attack_bonus, save_dc, target_ac, target_save,
+                                                   heightened=True)
+                        elif option == "Seeking Spell":
+                            cost = METAMAGIC_COSTS[option]
+                            expected = cast_damage(clauses, attack_bonus, save_dc, target_ac, target_save,
+                                                   seeking=True)
+                        else:
+                            cost, expected = METAMAGIC_COSTS[option], base
+                        effects[option] = MetamagicEffect(option, spell["Name"], slot, cost, expected,
+                                                          expected - base)
+
+    def get(self, spell_name, level):
+        """{metamagic name: MetamagicEffect} for a spell cast at a slot level
+        (0 for cantrips); empty when the spell isn't known or the slot is too high."""
+        return self.effects.get(spell_name, {}).get(level, {})
+
+
+def table_key(model):
+    """Everything the table depends on: stats, level, spellcasting ability and known spells."""
+    return (tuple(model.stats.get(stat) for stat in STATS), model.resources.get("Level", 1),
+            model.spellcasting_ability(),
+            tuple(sorted((level, tuple(sorted(names))) for level, names in model.spells.items())))
+
+
+_last_table = (None, None, None)  # (SpellCompendium, table_key, MetamagicTable)
+
+
+def metamagic_table(model, spells):
+    """The MetamagicTable for the model, rebuilt only when table_key() or the compendium changes."""
+    global _last_table
+    key = table_key(model)
+    if _last_table[0] is not spells or _last_table[1] != key:
+        _last_table = (spells, key, MetamagicTable(model, spells))
+    return _last_table[2]
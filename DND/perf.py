@@ -0,0 +1,206 @@
+import functools
+import json
+import math
+import os
+import sys
+import threading
+import time
+
+ENV_VAR = "DND_PERF"      # DND_PERF=1 turns timing on
+DUMP_ENV_VAR = "DND_PERF_DUMP"  # file the timings are written to when the app closes
+FLAG = "--perf"           # same as DND_PERF=1, on the command line
+
+ENABLED = os.environ.get(ENV_VAR, "") not in ("", "0") or FLAG in sys.argv
+
+BUCKETS_PER_OCTAVE = 8  # histogram resolution: 8 buckets per doubling, ~9% wide
+
+
+class Histogram:
+    """Log-bucketed latency histogram; percentiles are read from the buckets."""
+
+    __slots__ = ("count", "total", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = {}  # bucket index -> count
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        micros = max(seconds * 1e6, 1.0)
+        bucket = int(math.log2(micros) * BUCKETS_PER_OCTAVE)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def percentile(self, fraction):
+        """Upper edge of the bucket holding the given fraction of samples, in seconds."""
+        if not self.count:
+            return 0.0
+        wanted = fraction * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= wanted:
+                return min(2 ** ((bucket + 1) / BUCKETS_PER_OCTAVE) / 1e6, self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "total_ms": self.total * 1000,
+            "p50_ms": self.percentile(0.5) * 1000,
+            "p95_ms": self.percentile(0.95) * 1000,
+            "max_ms": self.max * 1000,
+        }
+
+
+_histograms = {}  # handler name -> Histogram
+_lock = threading.Lock()  # the background saver records from its own thread
+
+
+def record(name, seconds):
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = Histogram()
+        histogram.add(seconds)
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+
+
+def snapshot():
+    """{handler name: summary dict}, slowest p95 first."""
+    with _lock:
+        summaries = {name: histogram.summary() for name, histogram in _histograms.items()}
+    return dict(sorted(summaries.items(), key=lambda item: -item[1]["p95_ms"]))
+
+
+def dump(path):
+    """Writes every handler's summary and raw buckets to a JSON file."""
+    with _lock:
+        handlers = {name: dict(histogram.summary(), buckets=sorted(histogram.buckets.items()))
+                    for name, histogram in _histograms.items()}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({"bucket_us": f"2 ** (index / {BUCKETS_PER_OCTAVE})", "handlers": handlers}, f, indent=2)
+
+
+def timed(name=None):
+    """Decorator that records how long each call takes. When timing is off
+    the function is returned untouched, so it costs nothing."""
+    def decorate(func):
+        if not ENABLED:
+            return func
+        label = name or f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(label, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+def untimed(func):
+    """Marks a Tk callback that should not show up in the timings (the
+    Performance window's own refresh)."""
+    func._perf_skip = True
+    return func
+
+
+def _unwrap_after(func):
+    # Misc.after() registers a local "callit" that calls the real callback
+    if getattr(func, "__qualname__", "").endswith("after.<locals>.callit") and func.__closure__:
+        cells = dict(zip(func.__code__.co_freevars, func.__closure__))
+        if "func" in cells:
+            return cells["func"].cell_contents
+    return func
+
+
+def handler_name(func):
+    # Bound methods and functions by qualified name; lambdas and nested
+    # functions also get their line number, since many share a name
+    target = getattr(func, "__func__", func)
+    name = getattr(target, "__qualname__", None) or repr(target)
+    if "<" in name and hasattr(target, "__code__"):
+        name = f"{name}:{target.__code__.co_firstlineno}"
+    return name
+
+
+def instrument_tk():
+    """Times every Tk callback (commands, bindings, variable traces, after())
+    by wrapping tkinter.CallWrapper. Does nothing when timing is off."""
+    if not ENABLED:
+        return
+    import tkinter
+    if getattr(tkinter.CallWrapper, "_perf_timed", False):
+        return
+
+    class TimedCallWrapper(tkinter.CallWrapper):
+        _perf_timed = True
+
+        def __init__(self, func, subst, widget):
+            super().__init__(func, subst, widget)
+            func = _unwrap_after(func)
+            self.name = None if getattr(func, "_perf_skip", False) else "tk:" + handler_name(func)
+
+        def __call__(self, *args):
+            if self.name is None:
+                return super().__call__(*args)
+            start = time.perf_counter()
+            try:
+                return super().__call__(*args)
+            finally:
+                record(self.name, time.perf_counter() - start)
+
+    tkinter.CallWrapper = TimedCallWrapper
+
+
+def dump_on_exit():
+    """Writes the timings to $DND_PERF_DUMP, if set."""
+    path = os.environ.get(DUMP_ENV_VAR)
+    if ENABLED and path:
+        dump(path)
+
+
+class StartupProfile:
+    """Startup phase timings, from process start to the first paint of the
+    main window. With detailed=True (--profile-startup) the phases and the
+    slowest functions under cProfile are printed as well."""
+
+    def __init__(self, start_time=None, detailed=False):
+        self.start = self.last = time.perf_counter() if start_time is None else start_time
+        self.phases = []   # (phase, seconds since the previous mark)
+        self.painted = False
+        self.profiler = None
+        if detailed:
+            import cProfile
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def first_paint(self):
+        self.mark("first paint")
+        self.painted = True
+        print(f"Time to first paint: {(self.last - self.start) * 1000:.0f} ms")
+        if self.profiler is None:
+            return
+        self.profiler.disable()
+        print("Startup breakdown:")
+        for phase, seconds in self.phases:
+            print(f"  {phase:<24} {seconds * 1000:8.1f} ms")
+        import pstats
+        pstats.Stats(self.profiler, stream=sys.stdout).sort_stats("cumulative").print_stats(25)
+        self.profiler = None
@@ -0,0 +1,158 @@
+import json
+import os
+
+import perf
+from compendium import DATA_DIR, normalize_name
+
+RULES_FILE = "data.json"
+RULES_SECTIONS = ("race", "class", "background")
+
+_stores = {}  # absolute path -> RulesStore
+
+
+class RenderedEntry:
+    """Plain text of a rules entry plus the character ranges to show in bold."""
+
+    __slots__ = ("text", "tag_ranges")
+
+    def __init__(self, text, tag_ranges):
+        self.text = text
+        self.tag_ranges = tag_ranges  # {tag: [(start, end), ...]} as character offsets
+
+
+def render_entry(obj):
+    """Flattens a data.json entry into a RenderedEntry.
+
+    Layout: a "name" directly followed by "text" becomes a bold title over
+    its text, other keys become bold "Key:" headings over their values,
+    and list items go one per line.
+    """
+    pieces = []
+    bold = []
+    offset = 0
+
+    def emit(text, is_bold=False):
+        nonlocal offset
+        pieces.append(text)
+        if is_bold:
+            bold.append((offset, offset + len(text)))
+        offset += len(text)
+
+    def walk(obj, indent=0):
+        if isinstance(obj, dict):
+            keys = list(obj.keys())
+            i = 0
+            while i < len(keys):
+                key = keys[i]
+                value = obj[key]
+
+                # Special case: "Name" followed by "Text"
+                if key.lower() == "name" and i + 1 < len(keys) and keys[i + 1].lower() == "text":
+                    text_value = obj[keys[i + 1]]
+                    emit(f"\n{value}\n", True)
+                    if isinstance(text_value, str):
+                        emit(f"{text_value.strip()}\n\n")
+                    else:
+                        walk(text_value, indent + 1)
+                    i += 2
+                    continue
+
+                if key.lower() in ["name", "text"]:
+                    i += 1
+                    continue
+
+                display_key = key.replace('_', ' ').capitalize()
+                emit(f"{display_key}:\n", True)
+                walk(value, indent + 1)
+                i += 1
+
+            if indent == 1:
+                emit('\n')
+
+        elif isinstance(obj, list):
+            for item in obj:
+                if isinstance(item, (dict, list)):
+                    walk(item, indent)
+                else:
+                    emit(f"{item}\n")
+            emit('\n')
+
+        else:
+            emit(f"{obj}\n")
+
+    walk(obj)
+    return RenderedEntry("".join(pieces), {"bold": bold})
+
+
+class RulesStore:
+    """data.json parsed once, with a name index per section.
+
+    Lookups keep the old matching rule (the requested name may be any part
+    of the entry's name) but an exact name match wins, and the answer for
+    each (section, name) pair is remembered.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._data = None
+        self._keys = {}      # section -> [normalized entry name, ...]
+        self._by_name = {}   # section -> {normalized entry name: entry}
+        self._matches = {}   # (section, normalized query) -> [entry, ...]
+        self._rendered = {}  # id(entry) -> (entry, RenderedEntry)
+
+    @perf.timed()
+    def load(self):
+        if self._data is None:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self._data = json.load(f)
+            except FileNotFoundError:
+                print(f"{os.path.basename(self.path)} not found.")
+                self._data = {}
+            for section in RULES_SECTIONS:
+                entries = self._data.get(section, [])
+                self._keys[section] = [normalize_name(entry.get("name", "")) for entry in entries]
+                by_name = {}
+                for key, entry in zip(self._keys[section], entries):
+                    by_name.setdefault(key, entry)
+                self._by_name[section] = by_name
+        return self
+
+    def section(self, section):
+        """All entries of a section ("race", "class", "background") in file order."""
+        return self.load()._data.get(section, [])
+
+    def find_all(self, section, name):
+        """Entries whose name contains `name`, an exact match first."""
+        query = normalize_name(name)
+        cache_key = (section, query)
+        if cache_key not in self._matches:
+            self.load()
+            entries = self.section(section)
+            matches = [entry for key, entry in zip(self._keys.get(section, []), entries) if query in key]
+            exact = self._by_name.get(section, {}).get(query)
+            if exact is not None:
+                matches.remove(exact)
+                matches.insert(0, exact)
+            self._matches[cache_key] = matches
+        return self._matches[cache_key]
+
+    def get(self, section, name):
+        matches = self.find_all(section, name)
+        return matches[0] if matches else None
+
+    def rendered(self, entry):
+        """render_entry(entry), computed once per entry."""
+        cached = self._rendered.get(id(entry))
+        if cached is None or cached[0] is not entry:
+            cached = (entry, render_entry(entry))
+            self._rendered[id(entry)] = cached
+        return cached[1]
+
+
+def get_rules_store(path=None):
+    """The process-wide RulesStore for data.json (or another rules file)."""
+    path = os.path.abspath(path or os.path.join(DATA_DIR, RULES_FILE))
+    if path not in _stores:
+        _stores[path] = RulesStore(path)
+    return _stores[path]
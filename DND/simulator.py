@@ -0,0 +1,381 @@
+"""Usage: python simulator.py MONSTER [MONSTER ...] [--character FILE] [--encounters 20000] [--rested] [--workers N] [--format table|jsonl]"""
+import argparse
+import json
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from character_model import CharacterModel, SPELL_POINT_COSTS, STATS
+from compendium import DATA_DIR, SPELL_LEVELS, BESTIARY_SORT_KEYS, SpellCompendium, load_browse_table, load_damage_table
+
+ENCOUNTERS = 20000  # fights per monster
+MAX_ROUNDS = 20     # fights still going after this many rounds are draws
+
+_NUMBER_WORDS = {"two": 2, "three": 3, "four": 4, "five": 5, "six": 6}
+_MULTIATTACK_RE = re.compile(r"makes (\w+) (?:[\w' ]+ )?attacks")
+_RECHARGE_RE = re.compile(r"\(Recharge (\d)(?:[–-]6)?\)")
+_PER_DAY_RE = re.compile(r"\(\d+/Day")
+_SAVE_ABBREVIATIONS = {stat[:3]: stat for stat in STATS}
+
+
+def _leading_int(text, default=0):
+    match = re.match(r"\s*(\d+)", text or "")
+    return int(match.group(1)) if match else default
+
+
+def _damage_types(text):
+    # "fire; bludgeoning, piercing, and slashing from nonmagical attacks": spells are magical
+    return {damage_type for part in (text or "").lower().split(";") if "nonmagical" not in part
+            for damage_type in re.findall(r"[a-z]+", part)}
+
+
+class Attack:
+    """One way of dealing damage: a roll to hit or a saving throw, and the dice it deals."""
+
+    __slots__ = ("name", "kind", "bonus", "dc", "ability", "half", "parts")
+
+    def __init__(self, name, kind, bonus, dc, ability, half, parts):
+        self.name = name
+        self.kind = kind        # "attack", "save" or None (always hits)
+        self.bonus = bonus      # to hit
+        self.dc = dc            # save DC
+        self.ability = ability  # saving throw ability
+        self.half = half        # a successful save halves the damage
+        self.parts = parts      # [(DiceExpression, damage multiplier), ...]
+
+    def expected(self, target_ac, target_saves):
+        damage = sum(expression.mean * multiplier for expression, multiplier in self.parts)
+        if self.kind == "attack":
+            hit = min(max((21 - target_ac + self.bonus) / 20, 0.05), 0.95)
+            # A natural 20 rolls the dice twice
+            dice = sum((expression.mean - expression.modifier) * multiplier for expression, multiplier in self.parts)
+            return hit * damage + 0.05 * dice
+        if self.kind == "save":
+            success = min(max((21 - self.dc + target_saves.get(self.ability, 0)) / 20, 0.0), 1.0)
+            return damage * (1 - success * (0.5 if self.half else 1.0))
+        return damage
+
+    def roll(self, n, rng, target_ac, target_saves):
+        """Damage dealt in n independent uses, as an int64 array."""
+        if self.kind == "attack":
+            d20 = rng.integers(1, 21, size=n)
+            crit = d20 == 20
+            hit = crit | ((d20 != 1) & (d20 + self.bonus >= target_ac))
+            return np.where(hit, self._damage(n, rng, crit), 0)
+        damage = self._damage(n, rng)
+        if self.kind == "save":
+            saved = rng.integers(1, 21, size=n) + target_saves.get(self.ability, 0) >= self.dc
+            damage = np.where(saved, damage // 2 if self.half else 0, damage)
+        return damage
+
+    def _damage(self, n, rng, crit=None):
+        total = np.zeros(n, dtype=np.int64)
+        for expression, multiplier in self.parts:
+            rolled = expression.roll(n, rng)
+            if crit is not None and crit.any():
+                rolled += np.where(crit, expression.roll(n, rng) - expression.modifier, 0)
+            total += (np.maximum(rolled, 0) * multiplier).astype(np.int64)
+        return total
+
+
+def attacks_from_clauses(name, clauses, multipliers=None, bonus=None, dc=None):
+    """Attacks for a set of damage clauses: one per attack roll / saving throw,
+    so each ray of Scorching Ray hits, misses and crits on its own.
+
+    Clauses that are alternatives ("..., or 9 (3d4 + 2) ...") are left out.
+    bonus and dc override the clauses' own (the caster's spell attack and
+    save DC for spells)."""
+    multipliers = multipliers or {}
+    groups = {}
+    for clause in clauses:
+        if clause.alternative:
+            continue
+        for projectile in range(clause.projectiles):
+            key = (clause.kind, clause.save_ability, projectile)
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = Attack(
+                    name, clause.kind,
+                    bonus if bonus is not None else (clause.attack_bonus or 0),
+                    dc if dc is not None else (clause.save_dc or 10),
+                    clause.save_ability, clause.on_save == "half", [])
+            group.parts.append((clause.projectile_expression(), multipliers.get(clause.damage_type, 1.0)))
+    return list(groups.values())
+
+
+class MonsterProfile:
+    """What the simulation needs from a Bestiary row."""
+
+    __slots__ = ("name", "cr", "ac", "hp", "initiative", "saves", "multipliers",
+                 "multiattack", "attacks", "save_actions")
+
+    def __init__(self, row, clauses):
+        self.name = row["Name"]
+        self.cr = row.get("CR", "").split(" ")[0]
+        self.ac = _leading_int(row.get("AC"), 10)
+        self.hp = max(_leading_int(row.get("HP"), 1), 1)
+        scores = {stat: _leading_int(row.get(stat), 10) for stat in STATS}
+        self.initiative = (scores["Dexterity"] - 10) // 2
+        self.saves = {stat: (score - 10) // 2 for stat, score in scores.items()}
+        for abbreviation, bonus in re.findall(r"(\w{3})\w*\s*([+-]\d+)", row.get("Saving Throws", "")):
+            stat = _SAVE_ABBREVIATIONS.get(abbreviation.capitalize())
+            if stat:
+                self.saves[stat] = int(bonus)
+        self.multipliers = {}  # damage type -> 0 / 0.5 / 2
+        for field, multiplier in (("Damage Vulnerabilities", 2.0), ("Damage Resistances", 0.5),
+                                  ("Damage Immunities", 0.0)):
+            for damage_type in _damage_types(row.get(field)):
+                self.multipliers[damage_type] = multiplier
+
+        match = _MULTIATTACK_RE.search(row.get("Actions", ""))
+        self.multiattack = _NUMBER_WORDS.get(match.group(1).lower(), 1) if match else 1
+        # Attack actions and save actions ("Fire Breath (Recharge 5–6)") of the Actions field,
+        # with the chance they come back each round (1 at will, 0 for x/Day)
+        self.attacks = []
+        self.save_actions = []
+        by_action = {}
+        for clause in clauses:
+            if clause.field == "Actions":
+                by_action.setdefault(clause.action, []).append(clause)
+        for action, action_clauses in by_action.items():
+            for attack in attacks_from_clauses(action or "Action", action_clauses):
+                if attack.kind == "save":
+                    recharge = _RECHARGE_RE.search(action or "")
+                    if recharge:
+                        chance = (7 - int(recharge.group(1))) / 6
+                    else:
+                        chance = 0.0 if _PER_DAY_RE.search(action or "") else 1.0
+                    self.save_actions.append((attack, chance))
+                else:
+                    self.attacks.append(attack)
+
+
+class CharacterProfile:
+    """What the simulation needs from the character sheet, with the damage
+    of every known spell at every slot level worked out in advance."""
+
+    __slots__ = ("name", "hp", "ac", "initiative", "saves", "spell_points",
+                 "spell_attack", "spell_dc", "spells")
+
+    def __init__(self, model, spells, rested=False):
+        values = model.max_values if rested else model.resources
+        self.name = model.info.get("Name") or model.info.get("Class", "Character")
+        self.hp = max(values.get("HP", 1) + model.resources.get("Temp HP", 0), 1)
+        self.ac = model.resources.get("AC", 10)
+        self.initiative = model.modifier("Dexterity")
+        self.saves = model.save_bonuses()
+        self.spell_points = values.get("Spell Points", 0)
+        self.spell_attack = model.spell_attack_bonus()
+        self.spell_dc = model.spell_save_dc()
+        # (label, spell point cost, damage clauses) for every known damaging
+        # spell at every slot level the character can cast and pay for
+        self.spells = []
+        max_points = max(model.max_values.get("Spell Points", 0), self.spell_points)
+        max_level = model.max_spell_level()
+        for level, names in sorted(model.spells.items()):
+            for spell_name in names:
+                upcast = spells.upcast(spell_name)
+                if not upcast:
+                    continue
+                if upcast.cantrip:
+                    self.spells.append((spell_name, 0, upcast.at(model.resources.get("Level", 1))))
+                    continue
+                for slot, clauses in upcast.levels.items():
+                    cost = SPELL_POINT_COSTS[SPELL_LEVELS[slot]]
+                    if slot <= max_level and cost <= max_points and clauses:
+                        self.spells.append((f"{spell_name} ({SPELL_LEVELS[slot]})", cost, clauses))
+
+
+def spell_options(character, monster):
+    """The character's casting choices against a monster, best first:
+    [(label, cost, [Attack, ...], expected damage)]. A choice is dropped
+    when another one deals at least as much for no more spell points."""
+    options = []
+    for label, cost, clauses in character.spells:
+        attacks = attacks_from_clauses(label, clauses, monster.multipliers,
+                                       bonus=character.spell_attack, dc=character.spell_dc)
+        expected = sum(attack.expected(monster.ac, monster.saves) for attack in attacks)
+        if expected > 0:
+            options.append((label, cost, attacks, expected))
+    options.sort(key=lambda option: (-option[3], option[1]))
+    frontier = []
+    for option in options:
+        if all(option[1] < kept[1] for kept in frontier):
+            frontier.append(option)
+    return frontier
+
+
+def simulate(character, monster, encounters=ENCOUNTERS, max_rounds=MAX_ROUNDS, seed=None):
+    """Fights `encounters` duels of the character against a monster; returns a summary dict."""
+    # All duels are rolled together as NumPy arrays, one round at a time. The
+    # character casts the best spell it can still pay for; bonus actions,
+    # reactions, legendary actions, conditions and healing are left out
+    rng = np.random.default_rng(seed)
+    n = encounters
+    options = spell_options(character, monster)
+    costs = np.array([option[1] for option in options], dtype=np.int64)
+    casts = np.zeros(len(options), dtype=np.int64)
+
+    # The monster's routine: best single attack times its multiattack, or an at-will save action
+    routine, routine_expected, repeats = None, 0.0, 1
+    for attack in monster.attacks:
+        expected = monster.multiattack * attack.expected(character.ac, character.saves)
+        if expected > routine_expected:
+            routine, routine_expected, repeats = attack, expected, monster.multiattack
+    special, special_expected, recharge = None, 0.0, 0.0
+    for attack, chance in monster.save_actions:
+        expected = attack.expected(character.ac, character.saves)
+        if chance == 1.0 and expected > routine_expected:
+            routine, routine_expected, repeats = attack, expected, 1
+        elif chance < 1.0 and expected > max(special_expected, routine_expected):
+            special, special_expected, recharge = attack, expected, chance
+
+    character_hp = np.full(n, character.hp, dtype=np.int64)
+    monster_hp = np.full(n, monster.hp, dtype=np.int64)
+    points = np.full(n, character.spell_points, dtype=np.int64)
+    rounds = np.zeros(n, dtype=np.int64)
+    outcome = np.zeros(n, dtype=np.int8)  # 1 won, -1 lost, 0 still going / draw
+    special_ready = np.ones(n, dtype=bool)
+    character_first = (rng.integers(1, 21, size=n) + character.initiative
+                       >= rng.integers(1, 21, size=n) + monster.initiative)
+
+    def character_turn(idx):
+        if not idx.size or not options:
+            return
+        affordable = costs[None, :] <= points[idx, None]
+        choice = np.where(affordable.any(axis=1), affordable.argmax(axis=1), -1)
+        for k, (label, cost, attacks, _) in enumerate(options):
+            chosen = idx[choice == k]
+            if not chosen.size:
+                continue
+            for attack in attacks:
+                monster_hp[chosen] -= attack.roll(chosen.size, rng, monster.ac, monster.saves)
+            points[chosen] -= cost
+            casts[k] += chosen.size
+        outcome[idx[monster_hp[idx] <= 0]] = 1
+
+    def monster_turn(idx):
+        if not idx.size:
+            return
+        use_special = np.zeros(idx.size, dtype=bool)
+        if special is not None:
+            if recharge:
+                waiting = idx[~special_ready[idx]]
+                special_ready[waiting] = rng.random(waiting.size) < recharge
+            use_special = special_ready[idx]
+            users = idx[use_special]
+            character_hp[users] -= special.roll(users.size, rng, character.ac, character.saves)
+            special_ready[users] = False
+        others = idx[~use_special]
+        if routine is not None and others.size:
+            for _ in range(repeats):
+                character_hp[others] -= routine.roll(others.size, rng, character.ac, character.saves)
+        outcome[idx[character_hp[idx] <= 0]] = -1
+
+    active = np.arange(n)
+    for round_number in range(1, max_rounds + 1):
+        if not active.size:
+            break
+        rounds[active] = round_number
+        character_turn(active[character_first[active]])
+        active = active[outcome[active] == 0]
+        monster_turn(active)
+        active = active[outcome[active] == 0]
+        character_turn(active[~character_first[active]])
+        active = active[outcome[active] == 0]
+
+    won = outcome == 1
+    won_rounds = rounds[won]
+    return {
+        "monster": monster.name,
+        "cr": monster.cr,
+        "encounters": n,
+        "rounds_simulated": int(rounds.sum()),
+        "win_rate": float(won.mean()),
+        "loss_rate": float((outcome == -1).mean()),
+        "draw_rate": float((outcome == 0).mean()),
+        "rounds_to_kill_mean": float(won_rounds.mean()) if won_rounds.size else None,
+        "rounds_to_kill_p50": float(np.percentile(won_rounds, 50)) if won_rounds.size else None,
+        "rounds_to_kill_p90": float(np.percentile(won_rounds, 90)) if won_rounds.size else None,
+        "spell_points_spent_mean": float((character.spell_points - points).mean()),
+        "hp_lost_mean": float((character.hp - np.maximum(character_hp, 0)).mean()),
+        "casts_per_fight": {option[0]: float(count / n) for option, count in zip(options, casts) if count},
+    }
+
+
+# Bestiary data for the current process, filled in by init_worker
+_monster_rows = None
+_monster_damage = None
+
+
+def init_worker(data_dir):
+    """Loads the Bestiary and its damage table once per process (both come from the disk cache)."""
+    global _monster_rows, _monster_damage
+    path = os.path.join(data_dir, "Bestiary.csv")
+    _monster_rows = load_browse_table(path, BESTIARY_SORT_KEYS).by_name
+    _monster_damage = load_damage_table(path)
+
+
+def monster_profile(name):
+    row = _monster_rows.get(name)
+    return MonsterProfile(row, _monster_damage.get(name)) if row else None
+
+
+def simulate_monster(task):
+    character, name, encounters, max_rounds, seed = task
+    monster = monster_profile(name)
+    if monster is None:
+        return {"monster": name, "error": "unknown monster"}
+    return simulate(character, monster, encounters, max_rounds, seed)
+
+
+def simulate_many(character, names, encounters=ENCOUNTERS, max_rounds=MAX_ROUNDS, seed=0,
+                  data_dir=DATA_DIR, workers=None):
+    """Yields one summary per monster name, in order; monsters are spread over a process pool."""
+    tasks = [(character, name, encounters, max_rounds, seed + index) for index, name in enumerate(names)]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(tasks) < 2:
+        init_worker(data_dir)
+        yield from map(simulate_monster, tasks)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(data_dir,)) as pool:
+        yield from pool.map(simulate_monster, tasks)
+
+
+def format_row(result):
+    if "error" in result:
+        return f"{result['monster']:<36} {result['error']}"
+    rounds = result["rounds_to_kill_mean"]
+    return (f"{result['monster']:<36} {result['cr']:>5} {result['win_rate'] * 100:6.1f}% "
+            f"{rounds if rounds is not None else float('nan'):7.2f} {result['spell_points_spent_mean']:7.1f} "
+            f"{result['hp_lost_mean']:7.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monte Carlo fights between the character and Bestiary monsters.")
+    parser.add_argument("monsters", nargs="+", help="Bestiary names")
+    parser.add_argument("--character", default=os.path.join(DATA_DIR, "character_data.csv"))
+    parser.add_argument("--encounters", type=int, default=ENCOUNTERS, help="fights per monster")
+    parser.add_argument("--max-rounds", type=int, default=MAX_ROUNDS)
+    parser.add_argument("--rested", action="store_true", help="start with full HP and spell points")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="processes to use (default: one per CPU)")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="folder with Bestiary.csv and the *_Spells.csv files")
+    parser.add_argument("--format", choices=("table", "jsonl"), default="table")
+    args = parser.parse_args(argv)
+
+    model = CharacterModel.from_csv(args.character)
+    character = CharacterProfile(model, SpellCompendium(args.data_dir), rested=args.rested)
+    if args.format == "table":
+        print(f"{'Monster':<36} {'CR':>5} {'Win':>7} {'Rounds':>7} {'Points':>7} {'HP lost':>7}")
+    for result in simulate_many(character, args.monsters, args.encounters, args.max_rounds, args.seed,
+                                args.data_dir, args.workers):
+        print(format_row(result) if args.format == "table" else json.dumps(result), flush=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""Plans how to spend spell points and sorcery points for the most expected damage or casts."""
+import functools
+
+from character_model import SPELL_POINT_COSTS
+from compendium import SPELL_LEVELS
+
+OBJECTIVES = ("damage", "casts")
+SORCERY_MAX_LEVEL = 5      # highest slot sorcery points can create
+ONCE_PER_REST_LEVEL = 6    # spell point slots from this level up: once each per long rest
+
+
+class CastOption:
+    """The best spell to cast with a slot of one level."""
+
+    __slots__ = ("spell", "level", "cost", "expected")
+
+    def __init__(self, spell, level, cost, expected):
+        self.spell = spell
+        self.level = level        # slot level, 0 for cantrips
+        self.cost = cost
+        self.expected = expected  # expected damage of one cast
+
+    def __repr__(self):
+        return f"CastOption({self.spell!r}, {SPELL_LEVELS[self.level]}, {self.expected:.1f})"
+
+
+def expected_damage(clauses):
+    # Alternatives ("... or 3d8 necrotic damage") don't add to the clause before them
+    return sum(clause.mean for clause in clauses if not clause.alternative)
+
+
+def cast_options(model, spells):
+    """{slot level: CastOption} for the character's known spells, up to the
+    highest slot the character can cast. A level where no known spell
+    deals damage still gets an option (worth 0) if a spell can use it."""
+    # All spells of a level cost the same, so only the best one per level matters
+    options = {}
+    max_level = model.max_spell_level()
+    character_level = model.resources.get("Level", 1)
+    for spell_level, names in model.spells.items():
+        for name in names:
+            upcast = spells.upcast(name)
+            if upcast is None:
+                continue
+            if upcast.cantrip or spell_level == 0:
+                slots = {0: upcast.at(character_level) if upcast.cantrip else []}
+            else:
+                slots = {slot: upcast.levels.get(slot, []) for slot in range(spell_level, max_level + 1)}
+            for slot, clauses in slots.items():
+                expected = expected_damage(clauses)
+                best = options.get(slot)
+                if best is None or expected > best.expected:
+                    options[slot] = CastOption(name, slot, SPELL_POINT_COSTS[SPELL_LEVELS[slot]], expected)
+    return options
+
+
+def plan_casting(options, spell_points, sorcery_points=0, objective="damage", turns=None):
+    """The casts that make the most of the points.
+
+    objective "damage" maximizes total expected damage, "casts" the number
+    of leveled spells cast (ties go to more damage). With `turns`, at most
+    that many spells are cast and turns without a leveled spell cast the
+    best cantrip; without it cantrips are left out.
+
+    Returns {"casts": [(spell, slot level, "spell points" / "sorcery points" / "cantrip"), ...]
+    strongest first, "expected_damage", "spell_points_left", "sorcery_points_left"}.
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Unknown objective {objective!r}; expected one of {OBJECTIVES}")
+    cantrip = options.get(0)
+    cantrip_damage = cantrip.expected if cantrip and turns is not None else 0.0
+    # Highest level first; the order of the casts doesn't change the total,
+    # so the program only looks at plans in this order
+    leveled = sorted((option for level, option in options.items() if level > 0),
+                     key=lambda option: -option.level)
+
+    def score(damage, casts):
+        return (damage, casts) if objective == "damage" else (casts, damage)
+
+    def add(a, b):
+        return (a[0] + b[0], a[1] + b[1])
+
+    @functools.lru_cache(maxsize=None)
+    def spend_points(index, points, turns_left):
+        """(score, cast?) for spending spell points on leveled[index:]; cast?
+        says whether the best plan casts leveled[index] (else it moves on)."""
+        if index == len(leveled) or turns_left == 0:
+            # Done: the turns left cast the cantrip
+            return score(cantrip_damage * (turns_left or 0), 0), False
+        option = leveled[index]
+        result = (spend_points(index + 1, points, turns_left)[0], False)
+        if option.cost <= points:
+            # 6th level and up: once per long rest, so move on after one cast
+            rest, _ = spend_points(index + (option.level >= ONCE_PER_REST_LEVEL), points - option.cost,
+                                   turns_left - 1 if turns_left is not None else None)
+            total = add(rest, score(option.expected, 1))
+            if total > result[0]:
+                result = (total, True)
+        return result
+
+    # Sorcery points only buy 1st-5th level slots; each way of spending them
+    # is combined with the best use of the spell points for the turns left
+    sorcery_options = [option for option in leveled if option.level <= SORCERY_MAX_LEVEL]
+    best = None  # (score, sorcery casts)
+
+    def spend_sorcery(index, sorcery, bought):
+        nonlocal best
+        turns_left = turns - len(bought) if turns is not None else None
+        if turns_left is None or turns_left >= 0:
+            total = spend_points(0, spell_points, turns_left)[0]
+            for option in bought:
+                total = add(total, score(option.expected, 1))
+            if best is None or total > best[0]:
+                best = (total, list(bought))
+        if turns_left == 0:
+            return
+        for i in range(index, len(sorcery_options)):
+            option = sorcery_options[i]
+            if option.cost <= sorcery:
+                bought.append(option)
+                spend_sorcery(i, sorcery - option.cost, bought)
+                bought.pop()
+
+    spend_sorcery(0, sorcery_points, [])
+    bought = best[1]
+
+    casts = [(option.spell, option.level, "sorcery points") for option in bought]
+    index, points = 0, spell_points
+    turns_left = turns - len(bought) if turns is not None else None
+    while index < len(leveled) and turns_left != 0:
+        option = leveled[index]
+        if spend_points(index, points, turns_left)[1]:
+            casts.append((option.spell, option.level, "spell points"))
+            points -= option.cost
+            index += option.level >= ONCE_PER_REST_LEVEL
+            turns_left = turns_left - 1 if turns_left is not None else None
+        else:
+            index += 1
+    if turns is not None and cantrip:
+        casts += [(cantrip.spell, 0, "cantrip")] * (turns - len(casts))
+    casts.sort(key=lambda cast: -options[cast[1]].expected)
+    return {
+        "casts": casts,
+        "expected_damage": sum(options[level].expected for _, level, _ in casts),
+        "spell_points_left": points,
+        "sorcery_points_left": sorcery_points - sum(option.cost for option in bought),
+    }
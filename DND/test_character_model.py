@@ -0,0 +1,33 @@
+import os
+
+from character_model import CHECKS, CharacterModel, CheckTable
+
+
+def sample_model():
+    return CharacterModel.from_csv(os.path.join(os.path.dirname(__file__), "character_data.csv"))
+
+
+def test_check_table_constitution_change():
+    # Constitution has no skills, so only its save changes (no header line to redraw)
+    table = CheckTable(sample_model())
+    assert ("stat", "Constitution") not in table.lines
+    assert table.set_score("Constitution", 18) == [("save", "Constitution")]
+    assert table.lines[("save", "Constitution")] == (4 + 2, True)
+
+
+def test_check_table_dexterity_change():
+    table = CheckTable(sample_model())
+    changed = table.set_score("Dexterity", 18)
+    assert changed == [("stat", "Dexterity"), ("save", "Dexterity")] + [("skill", skill) for skill in CHECKS["Dexterity"]]
+    assert table.set_score("Dexterity", 19) == []  # same modifier
+
+
+def test_check_table_level_matches_model():
+    model = sample_model()
+    table = CheckTable(model)
+    table.set_level(9)
+    model.resources["Level"] = 9
+    assert table.lines[("spell", "Spell Save DC")] == (model.spell_save_dc(), False)
+    assert table.lines[("spell", "Spell Attack Bonus")] == (model.spell_attack_bonus(), False)
+    for stat, bonus in model.save_bonuses().items():
+        assert table.lines[("save", stat)][0] == bonus
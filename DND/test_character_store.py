@@ -0,0 +1,137 @@
+import os
+import shutil
+
+import pytest
+
+from character_store import CharacterStore, WriteBehindSaver, read_character_csv
+
+SAMPLE = os.path.join(os.path.dirname(__file__), "character_data.csv")
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = str(tmp_path / "character_data.csv")
+    shutil.copy(SAMPLE, path)
+    return path
+
+
+def read_bytes(path):
+    with open(path, 'rb') as file:
+        return file.read()
+
+
+def edit_sheet(store):
+    store.set_value("HP", 12)
+    store.set_info("Name", "Tester")
+    store.add_spell(1, "Shield")
+    store.set_item("Rope", 2)
+
+
+def check_edits(model):
+    assert model.get_value("HP") == 12
+    assert model.info["Name"] == "Tester"
+    assert "Shield" in model.spells[1]
+    assert model.inventory["Rope"] == {"quantity": 2, "equipped": False}
+
+
+def test_replay_after_crash(csv_path):
+    store = CharacterStore(csv_path)
+    store.load()
+    edit_sheet(store)
+    # The session ends without a snapshot: the CSV is untouched, the journal has the edits
+    assert read_bytes(csv_path) == read_bytes(SAMPLE)
+    recovered = CharacterStore(csv_path)
+    check_edits(recovered.load())
+    assert recovered.unsaved and recovered.journal_entries == 4
+
+
+def test_torn_last_line_is_dropped(csv_path):
+    store = CharacterStore(csv_path)
+    store.load()
+    store.set_value("HP", 12)
+    store.close()
+    good_size = os.path.getsize(store.journal_path)
+    with open(store.journal_path, 'a', encoding='utf-8') as journal:
+        journal.write('{"op": "value", "key": "HP", "val')
+
+    recovered = CharacterStore(csv_path)
+    assert recovered.load().get_value("HP") == 12
+    assert os.path.getsize(recovered.journal_path) == good_size
+    # New entries start on a clean line
+    recovered.set_value("HP", 7)
+    recovered.close()
+    assert CharacterStore(csv_path).load().get_value("HP") == 7
+
+
+def test_rotated_journals_replay_until_written(csv_path):
+    store = CharacterStore(csv_path)
+    store.load()
+    store.set_value("HP", 12)
+    rows, moved = store.prepare_snapshot()
+    assert moved == [store.journal_path + ".1"] and not os.path.exists(store.journal_path)
+    store.set_value("HP", 9)  # lands in a new live journal, after the moved one
+    store.close()
+
+    # The snapshot was never written: the moved journal is replayed first, then the live one
+    assert CharacterStore(csv_path).load().get_value("HP") == 9
+
+    store.write_snapshot(rows, moved)
+    assert not os.path.exists(moved[0])
+    assert read_character_csv(csv_path).get_value("HP") == 12
+    assert CharacterStore(csv_path).load().get_value("HP") == 9
+
+
+def test_compact_folds_journal_into_csv(csv_path):
+    store = CharacterStore(csv_path)
+    store.load()
+    edit_sheet(store)
+    store.compact()
+    assert not os.path.exists(store.journal_path)
+    assert store._rotated_journals() == []
+    check_edits(read_character_csv(csv_path))
+
+
+def test_save_load_round_trip_is_byte_identical(csv_path):
+    store = CharacterStore(csv_path)
+    hp = store.load().get_value("HP")
+    store.set_value("HP", hp + 1)
+    store.set_value("HP", hp)
+    store.compact()
+    assert read_bytes(csv_path) == read_bytes(SAMPLE)
+
+
+def test_saver_coalesces_edits_into_one_write(csv_path):
+    store = CharacterStore(csv_path)
+    store.load()
+    writes = []
+    write_snapshot = store.write_snapshot
+    store.write_snapshot = lambda rows, moved: (writes.append(rows), write_snapshot(rows, moved))
+    saver = WriteBehindSaver(store, delay=60)
+    for hp in (10, 11, 12):
+        store.set_value("HP", hp)
+        assert saver.request()
+    saver.stop(timeout=5)
+
+    assert len(writes) == 1
+    assert read_character_csv(csv_path).get_value("HP") == 12
+    assert store.saver is None and store._rotated_journals() == []
+
+
+def test_saver_keeps_journals_when_the_write_fails(csv_path, capsys):
+    store = CharacterStore(csv_path)
+    store.load()
+
+    def fail(rows, moved):
+        raise OSError("disk full")
+
+    store.write_snapshot = fail
+    saver = WriteBehindSaver(store, delay=0)
+    store.set_value("HP", 12)
+    saver.request()
+    saver.stop(timeout=5)
+
+    assert isinstance(saver.error, OSError) and store.unsaved
+    assert "disk full" in capsys.readouterr().out
+    assert read_bytes(csv_path) == read_bytes(SAMPLE)
+    # Nothing is lost: the moved journal is still replayed
+    assert CharacterStore(csv_path).load().get_value("HP") == 12
@@ -0,0 +1,75 @@
+import glob
+import os
+
+import pytest
+
+from compendium import (DATA_DIR, BESTIARY_SORT_KEYS, Autocomplete, BrowseTable, IncrementalSearch, NameIndex,
+                        load_armor_table, load_csv_rows, normalize_name)
+
+
+@pytest.fixture(scope="module")
+def monster_names():
+    return [row["Name"] for row in load_csv_rows(os.path.join(DATA_DIR, "Bestiary.csv"))]
+
+
+def full_scan(names, query):
+    query = normalize_name(query)
+    return [idx for idx, name in enumerate(names) if query in normalize_name(name)]
+
+
+@pytest.mark.parametrize("first", (False, True))
+def test_sort_order_keeps_ties_in_row_order(first):
+    rows = load_csv_rows(os.path.join(DATA_DIR, "Bestiary.csv"))
+    table = BrowseTable(rows, BESTIARY_SORT_KEYS)
+    for col in ("CR", "Type", "Size"):
+        keys = table.sort_keys.get(col) or [row[col].strip().lower() for row in rows]
+        for reverse in (first, not first):
+            expected = sorted(range(len(rows)), key=keys.__getitem__, reverse=reverse)
+            assert table.sort_order(col, reverse) == expected, (col, reverse)
+        # Equal keys stay in row order either way
+        descending = table.sort_order(col, True)
+        ties = [idx for idx in descending if keys[idx] == keys[descending[0]]]
+        assert ties == sorted(ties)
+
+
+def test_name_index_matches_full_scan(monster_names):
+    index = NameIndex(monster_names)
+    assert index.postings["dra"] >= set(full_scan(monster_names, "dragon"))
+    for query in ("", "a", "dr", "DRA", "dragon", "red dragon", "young red", " (", "-", "zzzq"):
+        assert index.search(query) == full_scan(monster_names, query), query
+
+
+def test_incremental_search_matches_full_scan(monster_names):
+    search = IncrementalSearch(NameIndex(monster_names))
+    typed = ["a", "an", "anc", "anci", "ancient", "ancient ", "ancient r", "ancient red"]
+    backspaced = ["ancient re", "ancient", "anc", "a", ""]
+    pasted = ["young red dragon", "red", "the red dragon", "goblin", "hobgoblin captain", "zzzq", "zzzqx"]
+    for query in typed + backspaced + pasted:
+        assert search.search(query) == full_scan(monster_names, query), query
+
+
+def test_autocomplete_ranking():
+    # Exact name, then names starting with the query, then a later word, then any substring
+    items = Autocomplete([row["Name"] for row in load_csv_rows(os.path.join(DATA_DIR, "Items.csv"))])
+    assert items.complete("rope") == ["Rope", "Rope of Climbing", "Rope of Entanglement", "Rope of Mending",
+                                      "Silk Rope (50 feet)", "Propeller Helm"]
+    assert items.complete("shield", limit=3) == ["Shield", "Shield Guardian Amulet", "Shield of Expression"]
+    assert items.complete("plate")[:8] == ["Plate Armor", "Plate Armor of Etherealness (*)",
+                                           "Plate of Knight's Fellowship", "Dwarven Plate",
+                                           "Obsidian Flint Dragon Plate", "Half Plate Armor",
+                                           "Breastplate", "Breastplate of Balance"]
+    spells = Autocomplete(sorted({row["Name"] for path in glob.glob(os.path.join(DATA_DIR, "*_Spells.csv"))
+                                  for row in load_csv_rows(path)}))
+    assert spells.complete("missile") == ["Jim's Magic Missile", "Magic Missile"]
+    assert spells.complete("fire", limit=7) == ["Fire Bolt", "Fire Shield", "Fire Storm", "Fireball",
+                                                "Faerie Fire", "Wall of Fire", "Delayed Blast Fireball"]
+
+
+def test_armor_table_covers_equippable_armor():
+    # The inventory shows an equip checkbox for every item in the table
+    armor = load_armor_table(os.path.join(DATA_DIR, "Items.csv"))
+    assert all(name in armor for name in ("Shield", "Chain Mail", "Plate Armor", "Breastplate", "Leather Armor"))
+    assert "Rope" not in armor
+    assert armor.compute_ac(["Chain Mail", "Shield", "Rope"], 3, 10) == 18
+    assert armor.compute_ac(["Breastplate"], 3, 10) == 16
+    assert armor.compute_ac(["Shield"], 3, 13) == 15
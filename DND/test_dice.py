@@ -0,0 +1,69 @@
+import itertools
+from fractions import Fraction
+
+import numpy as np
+import pytest
+
+from dice import compile_dice
+
+EXPRESSIONS = ("2d6", "1d4 - 1", "d20", "3d4 + 2", "1d8 + 1d6 + 3", "2d6 - 1d4", "1d10 - 2d4 - 1")
+
+
+def enumerate_totals(expression):
+    # {total: exact probability}, from every combination of faces
+    faces = [range(1, sides + 1) for count, sides, _ in expression.dice for _ in range(count)]
+    signs = [sign for count, _, sign in expression.dice for _ in range(count)]
+    outcomes = {}
+    for roll in itertools.product(*faces):
+        total = expression.modifier + sum(sign * face for sign, face in zip(signs, roll))
+        outcomes[total] = outcomes.get(total, 0) + 1
+    combinations = sum(outcomes.values())
+    return {total: Fraction(count, combinations) for total, count in sorted(outcomes.items())}
+
+
+def brute_percentile(exact, q):
+    cumulative = 0
+    for total, p in exact.items():
+        cumulative += p
+        if cumulative >= Fraction(q, 100):
+            return total
+
+
+def test_two_d_six():
+    expression = compile_dice("2d6")
+    low, probs = expression.distribution()
+    assert probs[7 - low] == pytest.approx(6 / 36)
+    assert expression.probability_at_least(7) == pytest.approx(21 / 36)
+
+
+def test_one_d_four_minus_one():
+    expression = compile_dice("1d4 - 1")
+    assert (expression.min, expression.max, expression.mean) == (0, 3, 1.5)
+    assert expression.distribution()[1] == pytest.approx([0.25] * 4)
+
+
+@pytest.mark.parametrize("text", EXPRESSIONS)
+def test_distribution_matches_enumeration(text):
+    expression = compile_dice(text)
+    exact = enumerate_totals(expression)
+    low, probs = expression.distribution()
+    assert (low, low + len(probs) - 1) == (min(exact), max(exact)) == (expression.min, expression.max)
+    assert probs == pytest.approx([float(exact.get(total, 0)) for total in range(low, low + len(probs))])
+    mean = sum(total * p for total, p in exact.items())
+    assert expression.mean == pytest.approx(float(mean))
+    assert expression.variance == pytest.approx(float(sum((total - mean) ** 2 * p for total, p in exact.items())))
+    for q in (1, 10, 25, 50, 75, 90, 99, 100):
+        assert expression.percentile(q) == brute_percentile(exact, q), q
+
+
+def test_rolls_stay_in_range():
+    expression = compile_dice("2d6 - 1d4")
+    rolls = expression.roll(100000, np.random.default_rng(0))
+    assert rolls.min() == expression.min and rolls.max() == expression.max
+    assert rolls.mean() == pytest.approx(expression.mean, abs=0.05)
+
+
+@pytest.mark.parametrize("text", ("", "1d8 3", "2d0", "fire"))
+def test_invalid_expressions(text):
+    with pytest.raises(ValueError):
+        compile_dice(text)
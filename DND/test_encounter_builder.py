@@ -0,0 +1,57 @@
+import itertools
+
+import pytest
+
+from compendium import ChallengeTable, parse_challenge
+from encounter_builder import DIFFICULTIES, build_encounters, encounter_multiplier, xp_budget
+
+CHALLENGES = ("0 (XP 0 or 10; PB +2)", "1/8 (XP 25; PB +2)", "1/4 (XP 50; PB +2)", "1/2 (XP 100; PB +2)",
+              "1 (XP 200; PB +2)", "2 (XP 450; PB +2)", "3 (XP 700; PB +2)", "4 (XP 1.100; PB +2)",
+              "5 (XP 1.800, or 2.300 in lair; PB +3)", "8 (XP 3.900; PB +3)", "None (XP 0)")
+
+
+@pytest.fixture(scope="module")
+def table():
+    return ChallengeTable([{"Name": f"Monster {idx}", "CR": cr} for idx, cr in enumerate(CHALLENGES)])
+
+
+def exhaustive(table, party_size, party_level, difficulty, max_monsters, limit, max_kinds=3):
+    # Every group of up to max_kinds XP values, ranked like build_encounters
+    low, high = xp_budget(party_size, party_level, difficulty)
+    target = (low + high) / 2
+    values = sorted({xp for xp in table.xp if xp}, reverse=True)
+    found = []
+    for kinds in range(1, max_kinds + 1):
+        for chosen in itertools.combinations(values, kinds):
+            for counts in itertools.product(range(1, max_monsters + 1), repeat=kinds):
+                total = sum(counts)
+                raw = sum(value * count for value, count in zip(chosen, counts))
+                adjusted = raw * encounter_multiplier(total, party_size)
+                if total <= max_monsters and low <= adjusted <= high:
+                    found.append((-abs(adjusted - target), -total, tuple(zip(chosen, counts)), raw, adjusted))
+    return [(combo, raw, adjusted) for _, _, combo, raw, adjusted in sorted(found, reverse=True)[:limit]]
+
+
+def test_parse_challenge_xp():
+    assert parse_challenge("0 (XP 0 or 10; PB +2)") == (0.0, 10)
+    assert parse_challenge("0 (PB +2)") == (0.0, 10)
+    assert parse_challenge("5 (XP 1.800, or 2.300 in lair; PB +3)") == (5.0, 1800)
+    assert parse_challenge("None (XP 0)") == (None, 0)
+
+
+def test_budget_and_multiplier():
+    assert xp_budget(4, 5, "medium") == (2000, 3000)
+    assert xp_budget(4, 5, "deadly") == (4400, 6600)
+    assert [encounter_multiplier(count, 4) for count in (1, 2, 3, 6, 7, 11, 15)] == [1, 1.5, 2, 2, 2.5, 3, 4]
+    assert (encounter_multiplier(1, 2), encounter_multiplier(1, 6)) == (1.5, 0.5)
+
+
+@pytest.mark.parametrize("party_size", (2, 4, 6))
+@pytest.mark.parametrize("party_level", (1, 3, 5, 8))
+@pytest.mark.parametrize("difficulty", DIFFICULTIES)
+def test_search_matches_exhaustive_enumeration(table, party_size, party_level, difficulty):
+    for max_monsters in (1, 3, 5):
+        suggestions = build_encounters(table, party_size, party_level, difficulty, max_monsters, limit=15, seed=0)
+        found = [(tuple((table.xp[int(name.split()[1])], count) for name, count in suggestion["monsters"]),
+                  suggestion["xp"], suggestion["adjusted_xp"]) for suggestion in suggestions]
+        assert found == exhaustive(table, party_size, party_level, difficulty, max_monsters, 15), max_monsters
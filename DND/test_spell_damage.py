@@ -0,0 +1,73 @@
+import os
+
+import numpy as np
+import pytest
+
+from character_model import CharacterModel
+from compendium import SPELL_LEVELS, SpellCompendium
+from metamagic import TARGET_SAVE, cast_damage, fail_chance
+from simulator import CharacterProfile, attacks_from_clauses
+from spell_planner import cast_options, expected_damage, plan_casting
+
+
+@pytest.fixture(scope="module")
+def spells():
+    return SpellCompendium().load()
+
+
+def sorcerer(level, spells_by_level, spell_points=0, sorcery_points=0):
+    model = CharacterModel()
+    model.stats.update({"Dexterity": 14, "Charisma": 16})
+    model.resources.update({"Level": level, "HP": 40, "Spell Points": spell_points,
+                            "Sorcery Points": sorcery_points})
+    model.max_values.update({"HP": 40, "Spell Points": spell_points})
+    model.info["Class"] = "Sorcerer"
+    model.spells.update(spells_by_level)
+    return model
+
+
+def test_magic_missile_simulated_mean_per_slot(spells):
+    character = CharacterProfile(sorcerer(17, {1: ["Magic Missile"]}, spell_points=133), spells)
+    rng = np.random.default_rng(0)
+    slots = {label: clauses for label, _, clauses in character.spells}
+    assert len(slots) == 9
+    for slot in range(1, 10):
+        label = f"Magic Missile ({SPELL_LEVELS[slot]})"
+        attacks = attacks_from_clauses(label, slots[label])
+        expected = 3 * 3.5 + 3.5 * (slot - 1)
+        assert sum(attack.expected(13, {}) for attack in attacks) == pytest.approx(expected)
+        rolled = sum(attack.roll(200000, rng, 13, {}) for attack in attacks)
+        assert rolled.mean() == pytest.approx(expected, rel=0.01)
+
+
+def test_scorching_ray_rolls_each_ray(spells):
+    clauses = spells.upcast("Scorching Ray").at(2)
+    assert [(clause.dice, clause.projectiles, clause.mean) for clause in clauses] == [("2d6", 3, 21.0)]
+    attacks = attacks_from_clauses("Scorching Ray", clauses, bonus=5)
+    assert [[expression.text for expression, _ in attack.parts] for attack in attacks] == [["2d6"]] * 3
+    rng = np.random.default_rng(0)
+    rolled = sum(attack.roll(200000, rng, 13, {}) for attack in attacks)
+    # Every ray hits 65% of the time on its own: no damage at all only when the three miss
+    assert (rolled == 0).mean() == pytest.approx(0.35 ** 3, abs=0.005)
+
+
+def test_toll_the_dead_takes_one_die(spells):
+    # "it instead takes 1d12 necrotic damage" replaces the 1d8, it doesn't add to it
+    clauses = spells.upcast("Toll the Dead").at(1)
+    assert [clause.alternative for clause in clauses] == [False, True]
+    assert expected_damage(clauses) == pytest.approx(4.5)
+    assert cast_damage(clauses, 5, 13) == pytest.approx(4.5 * fail_chance(13, TARGET_SAVE))
+    character = CharacterProfile(sorcerer(1, {0: ["Toll the Dead"]}), spells)
+    assert [len(attacks_from_clauses(label, clauses)) for label, _, clauses in character.spells] == [1]
+
+
+def test_plan_for_sample_sheet(spells):
+    # The sheet knows Magic Missile, Scorching Ray and Dissonant Whispers, among others
+    model = CharacterModel.from_csv(os.path.join(os.path.dirname(__file__), "character_data.csv"))
+    options = cast_options(model, spells)
+    assert options[1].expected == pytest.approx(10.5)  # 3 darts of 1d4 + 1, or 3d6
+    assert (options[2].spell, options[2].expected) == ("Scorching Ray", pytest.approx(21.0))
+    plan = plan_casting(options, 12, 6)
+    assert [(spell, level) for spell, level, _ in plan["casts"]] == [("Scorching Ray", 2)] * 6
+    assert plan["expected_damage"] == pytest.approx(126.0)
+    assert (plan["spell_points_left"], plan["sorcery_points_left"]) == (0, 0)
@@ -0,0 +1,400 @@
+import tkinter as tk
+from tkinter import ttk
+
+
+def show_rendered_text(widget, rendered):
+    """Replaces the contents of a Text widget with a RenderedEntry: one insert
+    for the text, then one tag_add call per tag for all of its ranges."""
+    widget.configure(state='normal')
+    widget.delete('1.0', 'end')
+    widget.insert('1.0', rendered.text)
+    for tag, ranges in rendered.tag_ranges.items():
+        indices = []
+        for start, end in ranges:
+            indices.append(f"1.0 + {start} chars")
+            indices.append(f"1.0 + {end} chars")
+        if indices:
+            widget.tag_add(tag, *indices)
+    widget.configure(state='disabled')
+
+
+class VirtualTreeview(ttk.Frame):
+    """A Treeview over a list of row dicts that only keeps the rows currently
+    on screen (plus a small overscan) as real Tk items.
+
+    A fixed pool of "slot" items is reused while scrolling: moving the view
+    just rewrites the values of the slots whose row changed. `order` is the
+    list of row indices being browsed, i.e. the current sort order restricted
+    to the current search matches.
+    """
+
+    OVERSCAN = 2
+    DEFAULT_ROW_HEIGHT = 20
+
+    def __init__(self, master, rows, columns, col_widths=None, on_row_click=None, on_heading_click=None):
+        super().__init__(master)
+        self.rows = rows
+        self.columns = columns
+        self.on_row_click = on_row_click
+        self.sort_order = None   # permutation of all row indices, None = file order
+        self.matches = None      # sorted row indices matching the search, None = all rows
+        self.order = list(range(len(rows)))
+        self.offset = 0
+        self.visible = 1
+        self.slots = []          # iids of the pooled Tk items
+        self.slot_rows = {}      # slot iid -> row index it currently shows
+        self.attached = set()    # slots currently shown in the tree
+        self.selected_row = None
+
+        col_widths = col_widths or {}
+        self.tree = ttk.Treeview(self, show='headings', columns=columns, height=1, selectmode='browse')
+        for col in columns:
+            command = (lambda _col=col: on_heading_click(_col)) if on_heading_click else ""
+            self.tree.heading(col, text=col, command=command)
+            self.tree.column(col, anchor="w", width=col_widths.get(col, 100), stretch=False)
+
+        self.scrollbar = ttk.Scrollbar(self, orient='vertical', command=self.yview)
+        self.scrollbar.pack(side='right', fill='y')
+        self.tree.pack(side='left', fill='both', expand=True)
+
+        self.tree.bind("<Configure>", self._on_resize)
+        self.tree.bind("<ButtonRelease-1>", self._on_click)
+        self.tree.bind("<MouseWheel>", self._on_mousewheel)
+        self.tree.bind("<Button-4>", lambda e: self.scroll(-3))
+        self.tree.bind("<Button-5>", lambda e: self.scroll(3))
+        self.tree.bind("<Prior>", lambda e: self.scroll(-self.visible))
+        self.tree.bind("<Next>", lambda e: self.scroll(self.visible))
+
+        self._resize_pool(20)
+        self.refresh()
+
+    # --- data ---------------------------------------------------------------
+
+    def set_sort_order(self, sort_order):
+        self.sort_order = sort_order
+        self._rebuild_order()
+
+    def set_matches(self, matches):
+        self.matches = matches
+        self.offset = 0
+        self._rebuild_order()
+
+    def _rebuild_order(self):
+        if self.sort_order is None:
+            self.order = list(range(len(self.rows))) if self.matches is None else list(self.matches)
+        elif self.matches is None:
+            self.order = list(self.sort_order)
+        else:
+            keep = set(self.matches)
+            self.order = [idx for idx in self.sort_order if idx in keep]
+        self.refresh()
+
+    # --- scrolling ----------------------------------------------------------
+
+    def scroll(self, amount):
+        self.offset += amount
+        self.refresh()
+        return "break"
+
+    def yview(self, *args):
+        # Called by the scrollbar with ("moveto", fraction) or ("scroll", n, "units"/"pages")
+        if args[0] == "moveto":
+            self.offset = int(float(args[1]) * len(self.order))
+            self.refresh()
+        elif args[0] == "scroll":
+            step = self.visible if args[2] == "pages" else 1
+            self.scroll(int(args[1]) * step)
+
+    def _on_mousewheel(self, event):
+        return self.scroll(-3 if event.delta > 0 else 3)
+
+    # --- rendering ----------------------------------------------------------
+
+    def _row_metrics(self):
+        # (row height, y of the first row) measured from a shown slot; the
+        # heading is assumed to be about one row tall until something is drawn
+        for slot in self.slots:
+            bbox = self.tree.bbox(slot) if slot in self.attached else ""
+            if bbox:
+                return bbox[3], bbox[1]
+        return self.DEFAULT_ROW_HEIGHT, self.DEFAULT_ROW_HEIGHT + 4
+
+    def _on_resize(self, event):
+        row_height, header = self._row_metrics()
+        self.visible = max(1, (event.height - header) // row_height)
+        self._resize_pool(self.visible + self.OVERSCAN)
+        self.refresh()
+
+    def _resize_pool(self, size):
+        while len(self.slots) < size:
+            slot = f"slot{len(self.slots)}"
+            self.tree.insert("", "end", iid=slot)
+            self.slots.append(slot)
+            self.attached.add(slot)
+        while len(self.slots) > size:
+            slot = self.slots.pop()
+            self.tree.delete(slot)
+            self.slot_rows.pop(slot, None)
+            self.attached.discard(slot)
+
+    def refresh(self):
+        total = len(self.order)
+        self.offset = max(0, min(self.offset, total - self.visible))
+        window = self.order[self.offset:self.offset + len(self.slots)]
+
+        selected_slot = None
+        for position, slot in enumerate(self.slots):
+            if position < len(window):
+                row_idx = window[position]
+                if self.slot_rows.get(slot) != row_idx:
+                    row = self.rows[row_idx]
+                    self.tree.item(slot, values=[row[col] for col in self.columns], tags=(row["Name"],))
+                    self.slot_rows[slot] = row_idx
+                if slot not in self.attached:
+                    self.tree.move(slot, "", position)
+                    self.attached.add(slot)
+                if row_idx == self.selected_row:
+                    selected_slot = slot
+            elif slot in self.attached:
+                self.tree.detach(slot)
+                self.attached.discard(slot)
+                self.slot_rows.pop(slot, None)
+
+        self.tree.selection_set((selected_slot,) if selected_slot else ())
+        self.tree.yview_moveto(0)
+        if total:
+            self.scrollbar.set(self.offset / total, min(1.0, (self.offset + self.visible) / total))
+        else:
+            self.scrollbar.set(0, 1)
+
+    def _on_click(self, event):
+        slot = self.tree.identify_row(event.y)
+        if not slot or slot not in self.slot_rows:
+            return
+        self.selected_row = self.slot_rows[slot]
+        if self.on_row_click:
+            self.on_row_click(self.rows[self.selected_row])
+
+
+class _TableRow:
+    """The widgets of one KeyedRowTable row and the values they show."""
+
+    __slots__ = ("key", "position", "cells", "values", "check_vars")
+
+    def __init__(self):
+        self.key = None
+        self.position = None
+        self.cells = []       # one widget per column
+        self.values = []      # value shown by each cell
+        self.check_vars = {}  # column -> BooleanVar of a Checkbutton cell
+
+
+class KeyedRowTable(ttk.Frame):
+    """A grid of widget rows keyed by an id (an item name), for editable lists.
+
+    set_rows() takes [(key, values), ...] and diffs them against what is on
+    screen: a row keeps its widgets while its key stays visible, only cells
+    whose value changed are reconfigured, widgets are created only for rows
+    that come into view and destroyed only when fewer rows are needed.
+    Only the rows that fit on screen get widgets at all, so the list can
+    hold thousands of entries; scrolling reuses the rows that leave the
+    view for the ones that come in.
+
+    A str value is shown as a label (a link in `link_columns`, calling
+    on_click(key)), a bool as a Checkbutton calling on_toggle(key, column, value).
+    """
+
+    DEFAULT_ROW_HEIGHT = 30
+
+    def __init__(self, master, columns, link_columns=(), on_click=None, on_toggle=None, width=450, height=400):
+        super().__init__(master)
+        self.columns = columns
+        self.link_columns = set(link_columns)
+        self.on_click = on_click
+        self.on_toggle = on_toggle
+        self.keys = []           # row keys in display order
+        self.values = {}         # key -> tuple of cell values
+        self.offset = 0
+        self.visible = 1
+        self.row_height = self.DEFAULT_ROW_HEIGHT
+        self.rows = {}           # key -> _TableRow currently on screen
+
+        # The body keeps the size it is given, so the rows on screen follow
+        # the panel's height instead of the panel growing with the rows
+        self.body = ttk.Frame(self, width=width, height=height)
+        self.body.grid_propagate(False)
+        self.scrollbar = ttk.Scrollbar(self, orient='vertical', command=self.yview)
+        self.scrollbar.pack(side='right', fill='y')
+        self.body.pack(side='left', fill='both', expand=True)
+        for col_num, header in enumerate(columns):
+            tk.Label(self.body, text=header, font=("Arial", 10, "bold")).grid(row=0, column=col_num, sticky="w",
+                                                                            padx=10, pady=5)
+
+        self.body.bind("<Configure>", self._on_resize)
+        self._bind_scrolling(self.body)
+
+    # --- data ---------------------------------------------------------------
+
+    def set_rows(self, rows):
+        self.keys = [key for key, _ in rows]
+        self.values = {key: tuple(values) for key, values in rows}
+        self.refresh()
+
+    # --- scrolling ----------------------------------------------------------
+
+    def _bind_scrolling(self, widget):
+        widget.bind("<MouseWheel>", lambda e: self.scroll(-3 if e.delta > 0 else 3))
+        widget.bind("<Button-4>", lambda e: self.scroll(-3))
+        widget.bind("<Button-5>", lambda e: self.scroll(3))
+
+    def scroll(self, amount):
+        self.offset += amount
+        self.refresh()
+        return "break"
+
+    def yview(self, *args):
+        if args[0] == "moveto":
+            self.offset = int(float(args[1]) * len(self.keys))
+            self.refresh()
+        elif args[0] == "scroll":
+            step = self.visible if args[2] == "pages" else 1
+            self.scroll(int(args[1]) * step)
+
+    def _on_resize(self, event):
+        for row in self.rows.values():
+            if row.cells:
+                self.row_height = max(row.cells[0].winfo_reqheight() + 10, 1)  # + pady
+                break
+        visible = max(1, event.height // self.row_height - 1)  # less the header
+        if visible != self.visible:
+            self.visible = visible
+            self.refresh()
+
+    # --- rendering ----------------------------------------------------------
+
+    def refresh(self):
+        total = len(self.keys)
+        self.offset = max(0, min(self.offset, total - self.visible))
+        window = self.keys[self.offset:self.offset + self.visible]
+
+        # Rows whose key scrolled away or was removed are reused for new keys
+        shown = set(window)
+        spare = [self.rows.pop(key) for key in list(self.rows) if key not in shown]
+        for position, key in enumerate(window):
+            row = self.rows.get(key)
+            if row is None:
+                row = spare.pop() if spare else self._new_row()
+                row.key = key
+                self.rows[key] = row
+            self._update_row(row, self.values[key])
+            if row.position != position:
+                for col_num, cell in enumerate(row.cells):
+                    cell.grid(row=position + 1, column=col_num, padx=10, pady=5, sticky="w")
+                row.position = position
+        for row in spare:
+            for cell in row.cells:
+                cell.destroy()
+
+        if total:
+            self.scrollbar.set(self.offset / total, min(1.0, (self.offset + self.visible) / total))
+        else:
+            self.scrollbar.set(0, 1)
+
+    def _new_row(self):
+        row = _TableRow()
+        row.cells = [None] * len(self.columns)
+        row.values = [None] * len(self.columns)
+        return row
+
+    def _update_row(self, row, values):
+        for col_num, value in enumerate(values):
+            if row.values[col_num] == value and row.cells[col_num] is not None:
+                continue
+            cell = row.cells[col_num]
+            if cell is not None and isinstance(value, bool) != (col_num in row.check_vars):
+                # The cell changes between a label and a Checkbutton
+                cell.destroy()
+                row.check_vars.pop(col_num, None)
+                cell = row.cells[col_num] = None
+                row.position = None  # grid the new cell
+            if isinstance(value, bool):
+                if cell is None:
+                    var = row.check_vars[col_num] = tk.BooleanVar()
+                    cell = ttk.Checkbutton(self.body, variable=var,
+                                           command=lambda row=row, col_num=col_num: self._on_toggle(row, col_num))
+                row.check_vars[col_num].set(value)
+            else:
+                if cell is None:
+                    link = self.columns[col_num] in self.link_columns
+                    cell = tk.Label(self.body, fg="blue" if link else None, cursor="hand2" if link else "")
+                    if link:
+                        cell.bind("<Button-1>", lambda e, row=row: self.on_click and self.on_click(row.key))
+                cell.config(text=value)
+            if row.cells[col_num] is None:
+                row.cells[col_num] = cell
+                self._bind_scrolling(cell)
+            row.values[col_num] = value
+
+    def _on_toggle(self, row, col_num):
+        value = row.check_vars[col_num].get()
+        row.values[col_num] = value
+        self.values[row.key] = self.values[row.key][:col_num] + (value,) + self.values[row.key][col_num + 1:]
+        if self.on_toggle:
+            self.on_toggle(row.key, self.columns[col_num], value)
+
+
+class DiceChart(ttk.Frame):
+    """Expected value and a bar chart of the exact distribution of a dice
+    expression (see dice.DiceExpression). With several expressions a
+    dropdown picks the one shown."""
+
+    WIDTH = 380
+    HEIGHT = 110
+    PAD = 10
+    MAX_BARS = 120  # wider distributions are drawn with totals grouped into bars
+
+    def __init__(self, master, expressions, title="Damage"):
+        super().__init__(master)
+        self.expressions = expressions
+        self.title = title
+
+        if len(expressions) > 1:
+            self.choice = tk.StringVar(value=expressions[0].text)
+            picker = ttk.Combobox(self, textvariable=self.choice, state="readonly",
+                                  values=[expression.text for expression in expressions])
+            picker.pack(anchor="w")
+            picker.bind("<<ComboboxSelected>>", lambda e: self.show(expressions[picker.current()]))
+        self.summary = ttk.Label(self)
+        self.summary.pack(anchor="w")
+        self.canvas = tk.Canvas(self, width=self.WIDTH, height=self.HEIGHT, bg="white", highlightthickness=0)
+        self.canvas.pack(fill="x")
+        self.show(expressions[0])
+
+    def show(self, expression):
+        low, probs = expression.distribution()
+        self.summary.config(text=f"{self.title} {expression.text}: average {expression.mean:.1f}, "
+                                 f"range {expression.min}-{expression.max}, "
+                                 f"80% between {expression.percentile(10)} and {expression.percentile(90)}")
+
+        # Group neighbouring totals when there are more of them than bars
+        group = max(1, -(-len(probs) // self.MAX_BARS))
+        bars = [float(sum(probs[i:i + group])) for i in range(0, len(probs), group)]
+        tallest = max(bars) or 1.0
+
+        canvas = self.canvas
+        canvas.delete("all")
+        left, right = self.PAD, self.WIDTH - self.PAD
+        top, bottom = self.PAD, self.HEIGHT - 2 * self.PAD
+        width = (right - left) / len(bars)
+        for index, probability in enumerate(bars):
+            x = left + index * width
+            height = (bottom - top) * probability / tallest
+            canvas.create_rectangle(x, bottom - height, x + max(width - 1, 1), bottom, fill="#4a78b5", width=0)
+
+        # Mean marker and the lowest / highest totals under the axis
+        if expression.max > expression.min:
+            x = left + (expression.mean - low + 0.5) / group * width
+            canvas.create_line(x, top, x, bottom, fill="#c0392b", dash=(3, 2))
+        canvas.create_line(left, bottom, right, bottom)
+        canvas.create_text(left, bottom + 2, text=str(expression.min), anchor="nw")
+        canvas.create_text(right, bottom + 2, text=str(expression.max), anchor="ne")